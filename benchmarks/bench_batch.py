@@ -0,0 +1,89 @@
+"""
+Batched multi-shard execution on one CPU bee: shards/s by shard count and size.
+
+Each assignment runs --rounds Cannon rounds (C += A @ B per round) on one
+SystolicEngine, with no mesh in between, so only compute is measured.
+
+one-at-a-time: one assignment per shard, one addmm per round (the old path)
+batched:       all shards stacked into one assignment, one baddbmm per round
+processes P:   batched, with the matmuls split over a P-process pool
+
+Results are checked against torch.bmm.
+
+    python benchmarks/bench_batch.py --sizes 64 128 256 --shards 1 4 16 64 --processes 2 4
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker"))
+
+from systolic import SystolicEngine, usable_cores
+
+def make_engine(processes=0):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SystolicEngine(processes=processes)
+
+def one_at_a_time(engine, As, Bs, rounds):
+    results = []
+    for a, b in zip(As, Bs):
+        engine.load_shard({"A": a, "B": b})
+        for _ in range(rounds):
+            engine.step()
+        results.append(engine.local_C.clone())
+    return torch.stack(results)
+
+def batched(engine, As, Bs, rounds):
+    engine.load_shard({"shards": [{"A": a, "B": b} for a, b in zip(As, Bs)]})
+    for _ in range(rounds):
+        engine.step()
+    return engine.local_C.clone()
+
+def measure(run, engine, As, Bs, rounds, min_seconds):
+    run(engine, As, Bs, rounds) # warm-up (and pool start-up)
+    reps, start = 0, time.perf_counter()
+    while True:
+        C = run(engine, As, Bs, rounds)
+        reps += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return len(As) * reps / elapsed, C
+
+def main(sizes, shard_counts, rounds, process_counts, min_seconds):
+    engines = {"one-at-a-time": make_engine(), "batched": make_engine()}
+    for processes in process_counts:
+        engines[f"processes {processes}"] = make_engine(processes)
+    runs = {name: (one_at_a_time if name == "one-at-a-time" else batched) for name in engines}
+
+    print(f"usable cores: {usable_cores()}, torch threads: {torch.get_num_threads()}, rounds per assignment: {rounds}")
+    print(f"{'size':>6} {'shards':>7} {'mode':<15} {'shards/s':>10} {'speedup':>8}")
+    for size in sizes:
+        for count in shard_counts:
+            torch.manual_seed(0)
+            As = [torch.randn(size, size) for _ in range(count)]
+            Bs = [torch.randn(size, size) for _ in range(count)]
+            exact = rounds * torch.bmm(torch.stack(As), torch.stack(Bs))
+            baseline = None
+            for name, engine in engines.items():
+                rate, C = measure(runs[name], engine, As, Bs, rounds, min_seconds)
+                assert torch.allclose(C, exact, rtol=1e-3, atol=1e-3 * size), f"{name}: wrong result"
+                baseline = baseline or rate
+                print(f"{size:>6} {count:>7} {name:<15} {rate:>10.1f} {rate / baseline:>7.2f}x")
+    for engine in engines.values():
+        engine.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--rounds", type=int, default=4, help="Cannon rounds per assignment (the torus side q)")
+    parser.add_argument("--processes", type=int, nargs="*", default=[], help="Also run with a compute pool of this many processes")
+    parser.add_argument("--min-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+    main(args.sizes, args.shards, args.rounds, args.processes, args.min_seconds)
@@ -0,0 +1,70 @@
+"""
+Chunked upload benchmark against the local stand-in receiver.
+
+1. Fresh upload of a random export-sized file.
+2. Resubmit after modifying a few regions (only changed chunks are sent).
+3. Interrupted upload, then a resume.
+
+    python benchmarks/bench_chunked_upload.py --size-mb 256 --streams 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sdk"))
+
+from uploader import ChunkedUploader, CHUNK_SIZE
+from upload_receiver import UploadReceiver
+
+def report(label, result):
+    mb = 1024 * 1024
+    print(f"{label:<12} sent {result['sentBytes'] / mb:>8.1f} MB  skipped {result['skippedBytes'] / mb:>8.1f} MB  "
+          f"{result['seconds']:>6.2f}s  {result['throughputMBs']:>7.1f} MB/s  -> {result['ack'].get('type')}")
+
+async def main(size_mb, streams, chunk_size, edits):
+    with tempfile.TemporaryDirectory() as tmp:
+        receiver = UploadReceiver(os.path.join(tmp, "store"))
+        port = await receiver.start()
+        uri = f"ws://localhost:{port}"
+
+        path = os.path.join(tmp, "model.gbex")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size_mb * 1024 * 1024))
+
+        report("fresh", await ChunkedUploader(uri, path, chunk_size=chunk_size, streams=streams).upload())
+
+        # Lightly modified model: a few scattered edits
+        with open(path, "r+b") as f:
+            for i in range(edits):
+                f.seek((i * 7919 * 1024 * 1024) % (size_mb * 1024 * 1024))
+                f.write(os.urandom(4096))
+        report("resubmit", await ChunkedUploader(uri, path, chunk_size=chunk_size, streams=streams).upload())
+
+        # Interrupted upload of a new model, then resume
+        with open(path, "wb") as f:
+            f.write(os.urandom(size_mb * 1024 * 1024))
+        interrupted = ChunkedUploader(uri, path, chunk_size=chunk_size, streams=streams)
+        task = asyncio.create_task(interrupted.upload())
+        while interrupted.sent_bytes < size_mb * 1024 * 1024 // 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        print(f"{'interrupted':<12} after {interrupted.sent_bytes / (1024 * 1024):.1f} MB")
+        report("resume", await ChunkedUploader(uri, path, chunk_size=chunk_size, streams=streams).upload())
+
+        await receiver.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_SIZE // (1024 * 1024))
+    parser.add_argument("--edits", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.size_mb, args.streams, args.chunk_mb * 1024 * 1024, args.edits))
@@ -0,0 +1,179 @@
+"""
+Torus collectives against gather-to-one: all-reduce time and per-host traffic.
+
+An R x C torus of BitchatMesh nodes in one event loop on localhost, wired
+like the Queen wires bees (EAST/WEST/NORTH/SOUTH, wrapping around). Each
+node holds a tensor; every node needs the sum.
+
+star: every node sends its tensor straight to one root, which sums and
+      sends the result back (the Lead/Queen pattern): the root sends
+      (n-1) N bytes, and receives as much.
+ring: collective.ring_all_reduce (2-D torus reduce-scatter / all-gather):
+      no node sends more than about 2N bytes, at any torus size.
+tree: collective.tree_reduce with broadcast (small tensors).
+
+Reported: median time and the most bytes any single node sent (the
+root's uplink for star). All results are checked against the exact sum.
+In one process on one machine every byte is copied by the same CPUs, so
+times mostly show overhead; the uplink column is what grows with the grid.
+
+    python benchmarks/bench_collective.py --tori 2x2 3x3 4x4 --sizes 1024 262144 4194304
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+import torch
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker"))
+
+from collective import Collective
+from mesh import BitchatMesh, MAX_MESSAGE_BYTES
+
+SETTLE_SEC = 0.005
+
+class Node:
+    def __init__(self, i, j):
+        self.coords = (i, j)
+        self.mesh = BitchatMesh(f"node-{i}-{j}", self.handle)
+        self.collective = Collective(self.mesh)
+
+    async def handle(self, data):
+        if data['type'] == 'COLLECTIVE':
+            self.collective.handle_message(data)
+
+    def sent_bytes(self):
+        return sum(link.sent_bytes for link in self.mesh.links.values())
+
+async def build_torus(rows, cols):
+    nodes = {(i, j): Node(i, j) for i in range(rows) for j in range(cols)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        ports = {coords: await node.mesh.start_server() for coords, node in nodes.items()}
+        for (i, j), node in nodes.items():
+            for direction, (di, dj) in {"NORTH": (-1, 0), "SOUTH": (1, 0), "EAST": (0, 1), "WEST": (0, -1)}.items():
+                await node.mesh.connect_to(direction, "127.0.0.1", ports[((i + di) % rows, (j + dj) % cols)])
+        while not all(link.ws for node in nodes.values() for link in node.mesh.links.values()):
+            await asyncio.sleep(SETTLE_SEC)
+    return nodes
+
+async def close_torus(nodes):
+    # Every link stops before any server goes away: a link whose peer is
+    # already gone waits out the websockets close timeout
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(node.mesh.close() for node in nodes.values()))
+        for node in nodes.values():
+            node.mesh.server.close()
+
+class Star:
+    """Gather-to-one: a root server sums everyone's tensor and sends the total back."""
+    async def start(self, count):
+        self.count = count
+        self.server = await websockets.serve(self._handle, "127.0.0.1", 0, max_size=MAX_MESSAGE_BYTES, compression=None)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.clients = [
+            await websockets.connect(f"ws://127.0.0.1:{self.port}", max_size=MAX_MESSAGE_BYTES, compression=None)
+            for _ in range(count - 1)
+        ]
+        self.root_bytes = 0
+
+    async def _handle(self, ws):
+        async for message in ws:
+            self.total.add_(torch.frombuffer(bytearray(message), dtype=torch.float32))
+            self.arrived += 1
+            if self.arrived == self.count - 1:
+                self.done.set()
+            await self.done.wait()
+            result = memoryview(self.total.view(torch.uint8).numpy())
+            await ws.send(result)
+            self.root_bytes += result.nbytes
+
+    async def all_reduce(self, tensors):
+        self.total = tensors[0].clone()
+        self.arrived = 0
+        self.done = asyncio.Event()
+
+        async def client(ws, tensor):
+            await ws.send(memoryview(tensor.view(torch.uint8).numpy()))
+            return torch.frombuffer(bytearray(await ws.recv()), dtype=torch.float32)
+
+        results = await asyncio.gather(*(client(ws, t) for ws, t in zip(self.clients, tensors[1:])))
+        await self.done.wait()
+        return [self.total.clone(), *results]
+
+    async def close(self):
+        for ws in self.clients:
+            await ws.close()
+        self.server.close()
+
+async def measure(run, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        results = await run()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), results
+
+async def main(tori, sizes, repeats):
+    print(f"{'torus':>6} {'floats':>9} {'mode':<5} {'ms':>9} {'max node MB':>12} {'vs star':>8}")
+    for rows, cols in tori:
+        nodes = await build_torus(rows, cols)
+        star = Star()
+        await star.start(len(nodes))
+        shape = (rows, cols)
+        for size in sizes:
+            torch.manual_seed(size)
+            tensors = {coords: torch.randn(size) for coords in nodes}
+            exact = torch.stack(list(tensors.values())).sum(0)
+            ops = iter(range(10 ** 9))
+
+            async def ring():
+                key = f"ring-{next(ops)}"
+                return await asyncio.gather(*(
+                    node.collective.ring_all_reduce(tensors[c], key, c, shape) for c, node in nodes.items()
+                ))
+
+            async def tree():
+                key = f"tree-{next(ops)}"
+                return await asyncio.gather(*(
+                    node.collective.tree_reduce(tensors[c], key, c, shape) for c, node in nodes.items()
+                ))
+
+            async def gather_to_one():
+                return await star.all_reduce(list(tensors.values()))
+
+            modes = {"star": gather_to_one, "ring": ring}
+            if size * 4 <= 1024 * 1024:
+                modes["tree"] = tree
+            star_ms = None
+            for name, run in modes.items():
+                before = star.root_bytes if name == "star" else [node.sent_bytes() for node in nodes.values()]
+                seconds, results = await measure(run, repeats)
+                if name == "star":
+                    busiest = (star.root_bytes - before) / repeats
+                else:
+                    busiest = max(node.sent_bytes() - b for node, b in zip(nodes.values(), before)) / repeats
+                for result in results:
+                    assert torch.allclose(result, exact, rtol=1e-4, atol=1e-4 * len(nodes)), f"{name}: wrong sum"
+                star_ms = star_ms or seconds
+                print(f"{rows}x{cols:<4} {size:>9} {name:<5} {seconds * 1000:>9.2f} {busiest / 1e6:>12.3f} {star_ms / seconds:>7.2f}x")
+        await star.close()
+        await close_torus(nodes)
+
+def torus(text):
+    rows, cols = text.lower().split("x")
+    return int(rows), int(cols)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tori", type=torus, nargs="+", default=[(2, 2), (3, 3), (4, 4)])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 262144, 4194304], help="float32 elements per node")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.tori, args.sizes, args.repeats))
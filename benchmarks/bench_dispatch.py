@@ -0,0 +1,100 @@
+"""
+Queen message loop microbenchmark: messages/s through WorkerBee's receive path.
+
+legacy:   the old loop - race recv() against the stop event on every message,
+          then run the handler inline before reading the next one.
+dispatch: one long-lived reader feeding the Dispatcher's per-class workers.
+
+Handlers simulate a little awaitable work (--handler-ms) so the effect of
+concurrent handling shows up next to the raw per-message overhead.
+
+    python benchmarks/bench_dispatch.py --messages 20000 --handler-ms 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker"))
+
+from dispatch import Dispatcher
+
+TYPES = ["APPEND_ENTRIES", "NEIGHBOR_UPDATE", "SHARD_ASSIGNMENT", "RESULT_SIGNATURE"]
+
+class FakeSocket:
+    """Async message source shaped like a websockets connection."""
+    def __init__(self, count):
+        self.messages = [{"type": TYPES[i % len(TYPES)], "seq": i} for i in range(count)]
+        self.index = 0
+
+    async def recv(self):
+        await asyncio.sleep(0)
+        if self.index >= len(self.messages):
+            raise ConnectionError("closed")
+        message = self.messages[self.index]
+        self.index += 1
+        return message
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.recv()
+        except ConnectionError:
+            raise StopAsyncIteration
+
+def make_handlers(delay):
+    async def handler(data):
+        if delay:
+            await asyncio.sleep(delay)
+    return {msg_type: handler for msg_type in TYPES}
+
+async def run_legacy(count, delay):
+    ws = FakeSocket(count)
+    handlers = make_handlers(delay)
+    stop_event = asyncio.Event()
+    start = time.perf_counter()
+    while not stop_event.is_set():
+        recv_task = asyncio.create_task(ws.recv())
+        stop_task = asyncio.create_task(stop_event.wait())
+        done, pending = await asyncio.wait([recv_task, stop_task], return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if recv_task not in done:
+            break
+        try:
+            data = recv_task.result()
+        except ConnectionError:
+            break
+        await handlers[data['type']](data)
+    return time.perf_counter() - start
+
+async def run_dispatch(count, delay, workers):
+    ws = FakeSocket(count)
+    dispatcher = Dispatcher(make_handlers(delay), control_workers=workers, data_workers=workers)
+    start = time.perf_counter()
+    dispatcher.start()
+    async for data in ws:
+        await dispatcher.submit(data)
+    await dispatcher.join()
+    elapsed = time.perf_counter() - start
+    await dispatcher.stop()
+    return elapsed
+
+async def main(count, handler_ms, workers):
+    delay = handler_ms / 1000
+    print(f"{'loop':<10} {'messages':>9} {'seconds':>8} {'msg/s':>10}")
+    for label, coro in (("legacy", run_legacy(count, delay)), ("dispatch", run_dispatch(count, delay, workers))):
+        elapsed = await coro
+        print(f"{label:<10} {count:>9} {elapsed:>8.3f} {count / elapsed:>10.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--handler-ms", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.handler_ms, args.workers))
@@ -0,0 +1,148 @@
+"""
+Multi-Prince election simulation: idle CPU per Prince and time to a new leader.
+
+All Princes run in-process; the transport delivers REQUEST_VOTE /
+APPEND_ENTRIES straight to the peer's RaftConsensus after --latency-ms.
+A stand-in Queen sends AppendEntries every 100 ms until it is killed.
+
+idle:      process CPU per Prince while the Queen is healthy, for the
+           timer-driven election timer vs the old 50 ms polling loop.
+failover:  Queen killed; time until exactly one Prince leads.
+partition: one Prince cut off for a while; its term must not move.
+
+    python benchmarks/bench_election.py --princes 5 --trials 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker"))
+
+from raft_manager import RaftConsensus, RaftState
+
+QUEEN_HEARTBEAT_SEC = 0.1
+
+class Cluster:
+    def __init__(self, n, latency):
+        self.latency = latency
+        self.down = set() # unreachable Princes
+        self.nodes = [RaftConsensus(f"prince-{k}") for k in range(n)]
+        bees = {node.bee_id: {"role": "PRINCE", "ip": "sim", "p2pPort": k} for k, node in enumerate(self.nodes)}
+        for node in self.nodes:
+            node.shadow_state = {"grid": [], "beeCount": n, "bees": bees}
+        self.promoted = []
+        self.queen = None
+
+    def transport(self, sender):
+        async def send(peer, message, timeout):
+            target = self.nodes[peer['p2pPort']]
+            await asyncio.sleep(self.latency)
+            if sender.bee_id in self.down or target.bee_id in self.down:
+                return None
+            if message['type'] == 'REQUEST_VOTE':
+                return target.process_request_vote(message)
+            return target.process_append_entries(message)
+        return send
+
+    def start(self, polling=False):
+        for node in self.nodes:
+            async def promote(node=node):
+                self.promoted.append((time.perf_counter(), node.bee_id, node.current_term))
+            if polling:
+                asyncio.create_task(legacy_poll(node))
+            else:
+                node.start_election_timer(self.transport(node), promote)
+        self.queen = asyncio.create_task(self._queen())
+
+    async def _queen(self):
+        while True:
+            for node in self.nodes:
+                if node.bee_id not in self.down:
+                    node.process_append_entries({
+                        "type": "APPEND_ENTRIES", "term": 1, "leaderId": "QUEEN",
+                        "prevLogIndex": 0, "prevLogTerm": 0, "entries": [], "leaderCommit": 0
+                    })
+            await asyncio.sleep(QUEEN_HEARTBEAT_SEC)
+
+    def stop(self):
+        if self.queen:
+            self.queen.cancel()
+        for node in self.nodes:
+            node.stop_election_timer()
+
+async def legacy_poll(node):
+    # The old run_election_loop: wake every 50 ms and compare timestamps
+    while True:
+        await asyncio.sleep(0.05)
+        if node.state == RaftState.LEADER:
+            continue
+        if time.time() - node.last_heartbeat > node.election_timeout:
+            pass
+
+async def idle_cpu(n, seconds, polling):
+    cluster = Cluster(n, 0.0)
+    cluster.start(polling=polling)
+    await asyncio.sleep(0.2)
+    cpu = time.process_time()
+    await asyncio.sleep(seconds)
+    used = time.process_time() - cpu
+    cluster.stop()
+    for task in asyncio.all_tasks() - {asyncio.current_task()}:
+        task.cancel()
+    return used / seconds / n * 100
+
+async def failover(n, latency):
+    cluster = Cluster(n, latency)
+    cluster.start()
+    await asyncio.sleep(0.5)
+    cluster.queen.cancel()
+    killed = time.perf_counter()
+    while not cluster.promoted:
+        await asyncio.sleep(0.001)
+    # Let any competing candidate finish before checking for a split brain
+    await asyncio.sleep(0.5)
+    leaders = [node for node in cluster.nodes if node.state == RaftState.LEADER]
+    terms = [term for _, _, term in cluster.promoted]
+    cluster.stop()
+    return cluster.promoted[0][0] - killed, len(leaders), len(terms) == len(set(terms))
+
+async def partition(n, seconds):
+    cluster = Cluster(n, 0.0005)
+    cluster.start()
+    await asyncio.sleep(0.3)
+    isolated = cluster.nodes[-1]
+    cluster.down.add(isolated.bee_id)
+    await asyncio.sleep(seconds)
+    term = isolated.current_term
+    cluster.stop()
+    return term, isolated.elections_started
+
+async def main(n, trials, latency_ms, idle_sec):
+    with contextlib.redirect_stdout(io.StringIO()):
+        timer_cpu = await idle_cpu(n, idle_sec, polling=False)
+        polling_cpu = await idle_cpu(n, idle_sec, polling=True)
+        results = [await failover(n, latency_ms / 1000) for _ in range(trials)]
+        term, started = await partition(n, 2.0)
+
+    print(f"princes: {n}, link latency: {latency_ms} ms")
+    print(f"idle CPU per prince   timer {timer_cpu:6.3f}%   polling {polling_cpu:6.3f}%")
+    times = sorted(seconds * 1000 for seconds, _, _ in results)
+    print(f"time to new leader    p50 {statistics.median(times):6.1f} ms   max {times[-1]:6.1f} ms   ({trials} trials)")
+    print(f"single leader         {sum(1 for _, leaders, _ in results if leaders == 1)}/{trials} trials, "
+          f"one promotion per term: {all(unique for _, _, unique in results)}")
+    print(f"partitioned prince    term {term} after 2s, {started} real elections started")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--princes", type=int, default=5)
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--idle-sec", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.princes, args.trials, args.latency_ms, args.idle_sec))
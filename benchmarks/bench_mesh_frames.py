@@ -0,0 +1,65 @@
+"""
+Pulse transport benchmark: JSON/base64 vs binary tensor frames.
+
+Two BitchatMesh instances on localhost; one pulses a float32 block WEST,
+the other rebuilds the tensor in its message handler. Reports MB/s and
+per-pulse latency (send -> tensor ready on the receiver).
+
+    python benchmarks/bench_mesh_frames.py --sizes 1 4 16 64 256
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from worker.mesh import BitchatMesh
+from worker.systolic import encode_tensor, decode_tensor
+
+async def bench(size_mb, repeat, mode):
+    received = asyncio.Queue()
+
+    async def on_message(data):
+        tensor = decode_tensor(data['payload'])
+        await received.put(tensor.numel())
+
+    receiver = BitchatMesh("receiver", on_message)
+    sender = BitchatMesh("sender", on_message)
+    port = await receiver.start_server()
+    await sender.connect_to("WEST", "localhost", port)
+
+    block = torch.randn(size_mb * 1024 * 1024 // 4)
+    latencies = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            payload = block if mode == "binary" else encode_tensor(block)
+            await sender.pulse("WEST", {"type": "PULSE_DATA", "jobId": "bench", "step": 1, "direction": "WEST", "payload": payload})
+            numel = await received.get()
+            latencies.append(time.perf_counter() - start)
+            assert numel == block.numel()
+    finally:
+        await sender.neighbors["WEST"].close()
+        receiver.server.close()
+        await receiver.server.wait_closed()
+
+    mean = sum(latencies) / len(latencies)
+    return size_mb / mean, mean * 1000
+
+async def main(sizes, repeat):
+    print(f"{'size MB':>8} {'mode':>7} {'MB/s':>10} {'ms/pulse':>10}")
+    for size in sizes:
+        for mode in ("json", "binary"):
+            mbps, ms = await bench(size, repeat, mode)
+            print(f"{size:>8} {mode:>7} {mbps:>10.1f} {ms:>10.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
@@ -0,0 +1,53 @@
+"""
+ParityBuffer throughput: encode (add_shard) and reconstruct vs shard size.
+
+Runs a 3x3 cell (9 data shards) with XOR parity (m=1) and Reed-Solomon
+(m=2, m=3), losing m shards before reconstructing.
+
+    python benchmarks/bench_parity.py --sizes 64 1024 16384
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from worker.lead_logic import ParityBuffer
+
+def bench(k, m, size_kb, repeat):
+    shards = {f"{i // 3}-{i % 3}": os.urandom(size_kb * 1024) for i in range(k)}
+    total_mb = k * size_kb / 1024
+
+    encode = reconstruct = 0.0
+    for _ in range(repeat):
+        buffer = ParityBuffer(k, m)
+        start = time.perf_counter()
+        for shard_id, data in shards.items():
+            buffer.add_shard(shard_id, data)
+        encode += time.perf_counter() - start
+
+        lost = list(shards)[:m]
+        for shard_id in lost:
+            buffer.mark_lost(shard_id)
+        start = time.perf_counter()
+        recovered = buffer.reconstruct(lost[0])
+        reconstruct += time.perf_counter() - start
+        assert recovered == shards[lost[0]]
+
+    return total_mb * repeat / encode, size_kb / 1024 * repeat / reconstruct
+
+def main(sizes, repeat):
+    k = 9
+    print(f"{'shard KB':>9} {'m':>3} {'encode MB/s':>12} {'rebuild MB/s':>13}")
+    for size in sizes:
+        for m in (1, 2, 3):
+            enc, rec = bench(k, m, size, repeat)
+            print(f"{size:>9} {m:>3} {enc:>12.1f} {rec:>13.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1024, 4096, 16384])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,90 @@
+"""
+Model export benchmark: legacy deepcopy/pickle/base64 vs streaming export.
+
+Each run happens in a fresh process; peak RSS growth is measured against
+the process peak right after the model is built.
+
+    python benchmarks/bench_porter_export.py --sizes 10 100 1000 10000
+"""
+import argparse
+import base64
+import copy
+import multiprocessing
+import os
+import pickle
+import resource
+import sys
+import tempfile
+import time
+
+import torch
+import torch.nn as nn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sdk"))
+
+from porter import GridbeePorter
+
+LAYER_MB = 64
+
+def build_model(size_mb):
+    """Stack of square Linear layers totalling roughly size_mb of fp32 weights."""
+    layers = []
+    remaining = size_mb
+    while remaining > 0:
+        mb = min(LAYER_MB, remaining)
+        width = max(1, int((mb * 1024 * 1024 / 4) ** 0.5))
+        layers.append(nn.Linear(width, width, bias=False))
+        remaining -= mb
+    return nn.Sequential(*layers)
+
+def legacy_export(model):
+    # The pre-streaming GridbeePorter.prepare_for_hive
+    hive_model = copy.deepcopy(model).to('cpu')
+    with torch.no_grad():
+        for _, param in hive_model.named_parameters():
+            if param.requires_grad:
+                param.data.mul_(10.0)
+    serialized_data = pickle.dumps(hive_model.state_dict())
+    encoded_data = base64.b64encode(serialized_data).decode('utf-8')
+    return len(encoded_data)
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run(size_mb, mode, queue):
+    with torch.no_grad():
+        model = build_model(size_mb)
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        legacy_export(model)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            GridbeePorter(model).export_to_file(os.path.join(tmp, "model.gbex"))
+    elapsed = time.perf_counter() - start
+
+    queue.put((elapsed, peak_rss_mb() - baseline))
+
+def main(sizes):
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'model MB':>9} {'mode':>7} {'seconds':>9} {'peak +RSS MB':>13}")
+    for size in sizes:
+        for mode in ("legacy", "stream"):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run, args=(size, mode, queue))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                print(f"{size:>9} {mode:>7} {'failed (exit ' + str(proc.exitcode) + ')':>23}")
+                continue
+            elapsed, extra = queue.get()
+            print(f"{size:>9} {mode:>7} {elapsed:>9.2f} {extra:>13.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+    main(args.sizes)
@@ -0,0 +1,128 @@
+"""
+Neighbour work stealing between a slow and a fast bee: round time by slowdown.
+
+Two bees in one event loop, joined by real BitchatMesh links on localhost.
+Each round both run their C += A @ B; the round ends when the slower one
+is done, as in lockstep Cannon. The owner's matmuls are --slowdown times
+slower (a sleep after each one, so no extra CPU is used), standing in for
+old hardware next to a fast machine. The helper advertises its idle time
+after every round; with stealing on, the owner hands it leading rows
+whenever the cost model (steal.plan_split) says it pays.
+
+A slowdown of 1 (equal bees) or a block too small to be worth shipping
+should show no hand-overs at all. Results are checked against A @ B.
+
+    python benchmarks/bench_steal.py --sizes 256 1024 --slowdowns 1 2 4 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker"))
+
+from mesh import BitchatMesh
+from steal import WorkStealer
+from systolic import SystolicEngine
+
+WARMUP_BYTES = 4 * 1024 * 1024 # one large frame per link, so its throughput is measured
+SETTLE_SEC = 0.005
+
+class Bee:
+    def __init__(self, name, slowdown=1.0):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.engine = SystolicEngine()
+        self.mesh = BitchatMesh(name, self.handle)
+        self.stealer = WorkStealer(name, self.mesh, self.engine)
+        if slowdown > 1:
+            multiply_add = self.engine._multiply_add
+
+            def slow_multiply_add(*args, **kwargs):
+                started = time.perf_counter()
+                multiply_add(*args, **kwargs)
+                time.sleep((slowdown - 1) * (time.perf_counter() - started))
+            self.engine._multiply_add = slow_multiply_add
+
+    async def handle(self, data):
+        if data['type'] == 'STEAL_OFFER':
+            self.stealer.handle_offer(data)
+        elif data['type'] == 'STEAL_TASK':
+            self.stealer.handle_task(data)
+        elif data['type'] == 'STEAL_RESULT':
+            self.stealer.handle_result(data)
+
+    def load(self, A, B):
+        self.engine.load_shard({"A": A, "B": B})
+
+async def connect(owner, helper):
+    """Owner's EAST link reaches the helper, the helper's WEST link the owner."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        owner_port = await owner.mesh.start_server()
+        helper_port = await helper.mesh.start_server()
+        await owner.mesh.connect_to("EAST", "127.0.0.1", helper_port)
+        await helper.mesh.connect_to("WEST", "127.0.0.1", owner_port)
+        while not all(link.ws for bee in (owner, helper) for link in bee.mesh.links.values()):
+            await asyncio.sleep(SETTLE_SEC)
+        warmup = {"type": "PULSE_DATA", "jobId": None, "step": 0, "payload": torch.zeros(WARMUP_BYTES // 4)}
+        await owner.mesh.pulse("EAST", {**warmup, "direction": "EAST"})
+        await helper.mesh.pulse("WEST", {**warmup, "direction": "WEST"})
+        while not all(link.throughput for bee in (owner, helper) for link in bee.mesh.links.values()):
+            await asyncio.sleep(SETTLE_SEC)
+
+async def run_rounds(owner, helper, A, B, rounds, steal):
+    owner.stealer.enabled = helper.stealer.enabled = steal
+    owner.stealer.offers.clear()
+    owner.load(A, B)
+    helper.load(A, B)
+    times = []
+    for step in range(rounds):
+        started = time.perf_counter()
+        await asyncio.gather(
+            owner.engine._compute_round(step, owner.stealer.offload),
+            helper.engine._compute_round(step, None)
+        )
+        ended = time.perf_counter()
+        times.append(ended - started)
+        # Lockstep: the helper waited for the owner from its own finish to here
+        helper.engine.idle_seconds = max(0.0, ended - helper.engine.compute_done_at)
+        await helper.stealer.advertise(None, step)
+        await asyncio.sleep(SETTLE_SEC) # let the offer land before the next round
+    return owner.engine.local_C, times
+
+async def main(sizes, slowdowns, rounds):
+    print(f"{'size':>6} {'slowdown':>9} {'lockstep ms':>12} {'stealing ms':>12} {'speedup':>8} {'rows/round':>11} {'fallbacks':>10}")
+    for size in sizes:
+        torch.manual_seed(0)
+        A, B = torch.randn(size, size), torch.randn(size, size)
+        exact = rounds * (A @ B)
+        for slowdown in slowdowns:
+            owner, helper = Bee("owner", slowdown), Bee("helper")
+            await connect(owner, helper)
+            results = {}
+            for steal in (False, True):
+                C, times = await run_rounds(owner, helper, A, B, rounds, steal)
+                assert torch.allclose(C, exact, rtol=1e-3, atol=1e-3 * size), f"steal={steal}: wrong result"
+                # The first rounds only measure: nobody has advertised yet
+                results[steal] = statistics.median(times[2:] if len(times) > 4 else times)
+            counters = owner.stealer.handed_rows.value, owner.stealer.fallbacks.value
+            print(f"{size:>6} {slowdown:>9g} {results[False] * 1000:>12.1f} {results[True] * 1000:>12.1f} "
+                  f"{results[False] / results[True]:>7.2f}x {counters[0] / rounds:>11.1f} {counters[1]:>10}")
+            for bee in (owner, helper):
+                await bee.mesh.close()
+                bee.mesh.server.close()
+                bee.engine.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 1024])
+    parser.add_argument("--slowdowns", type=float, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.slowdowns, args.rounds))
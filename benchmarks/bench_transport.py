@@ -0,0 +1,146 @@
+"""
+Pulse transport benchmark: bytes on the wire, encode/decode cost and result
+error per codec mode, on a real Cannon run.
+
+A q x q torus of SystolicEngines runs in-process. Pulses go through the
+mesh's binary frame encoder/decoder, so the byte counts are what a
+neighbour would receive.
+
+single:  one C = A @ B per mode; relative error vs the fp32 result.
+steps:   --steps job steps over slowly drifting A and B, summing C over the
+         steps, int8 with and without error feedback.
+
+    python benchmarks/bench_transport.py --size 1024 --grid 4 --steps 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker"))
+
+from shared.codec import Transport, ErrorFeedback
+from mesh import decode_frame, encode_frame
+from systolic import SystolicEngine
+
+CONFIGS = [
+    ("none", "none"),
+    ("none", "zlib"),
+    ("fp16", "none"),
+    ("bf16", "none"),
+    ("bf16", "zlib"),
+    ("int8", "none"),
+    ("int8", "zlib"),
+]
+
+class Torus:
+    def __init__(self, q):
+        self.q = q
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.engines = {(i, j): SystolicEngine() for i in range(q) for j in range(q)}
+        self.wire_bytes = 0
+        self.feedback = {} # (i, j) -> ErrorFeedback, kept across job steps
+
+    async def run(self, A, B, spec, job_id="bench"):
+        q = self.q
+        inbox = {pos: {"EAST": asyncio.Queue(), "SOUTH": asyncio.Queue()} for pos in self.engines}
+        layout = SystolicEngine.partition(A, B, q)
+        for (i, j), engine in self.engines.items():
+            block_A, block_B = layout[(i, j)]
+            engine.load_shard({
+                "A": block_A.contiguous(), "B": block_B.contiguous(),
+                "coords": {"i": i, "j": j}, "gridSize": q, "jobId": job_id, "transport": spec
+            })
+            engine.feedback = self.feedback.setdefault((i, j), ErrorFeedback())
+
+        def send(target, side, step, direction, tensor):
+            frame = encode_frame(job_id, step, direction, tensor)
+            message = b"".join(bytes(part) for part in frame)
+            self.wire_bytes += len(message)
+            inbox[target][side].put_nowait(decode_frame(message)['payload'])
+
+        async def run_one(i, j):
+            engine = self.engines[(i, j)]
+
+            async def pulse(step, payload_A, payload_B):
+                send((i, (j - 1) % q), "EAST", step + 1, "WEST", payload_A)
+                send(((i - 1) % q, j), "SOUTH", step + 1, "NORTH", payload_B)
+
+            async def receive(step):
+                return await inbox[(i, j)]["EAST"].get(), await inbox[(i, j)]["SOUTH"].get()
+
+            return await engine.run_cannon(pulse, receive)
+
+        blocks = await asyncio.gather(*(run_one(i, j) for i in range(q) for j in range(q)))
+        rows = [torch.cat(blocks[i * q:(i + 1) * q], dim=1) for i in range(q)]
+        return torch.cat(rows, dim=0)
+
+    def transport_totals(self):
+        encode = sum(engine.transport.encode_seconds for engine in self.engines.values())
+        decode = sum(engine.transport.decode_seconds for engine in self.engines.values())
+        return encode, decode
+
+def relative_error(C, exact):
+    return ((C.double() - exact).norm() / exact.norm()).item()
+
+async def single(size, q):
+    torch.manual_seed(0)
+    A = torch.randn(size, size)
+    B = torch.randn(size, size)
+    exact = A.double() @ B.double()
+
+    print(f"single C = A @ B, {size}x{size} fp32, {q}x{q} torus")
+    print(f"{'mode':<12} {'wire MB':>9} {'ratio':>7} {'encode ms':>10} {'decode ms':>10} {'rel error':>11}")
+    baseline = None
+    for mode, lossless in CONFIGS:
+        torus = Torus(q)
+        spec = None if (mode, lossless) == ("none", "none") else Transport(mode, lossless).spec()
+        start = time.perf_counter()
+        C = await torus.run(A, B, spec)
+        elapsed = time.perf_counter() - start
+        encode, decode = torus.transport_totals()
+        baseline = baseline or torus.wire_bytes
+        print(f"{mode + '+' + lossless:<12} {torus.wire_bytes / 1e6:>9.2f} {baseline / torus.wire_bytes:>6.2f}x "
+              f"{encode * 1000:>10.1f} {decode * 1000:>10.1f} {relative_error(C, exact):>11.2e}   ({elapsed:.2f}s)")
+
+async def steps(size, q, count):
+    print(f"\n{count} job steps, C summed over steps, int8 pulses")
+    print(f"{'feedback':<10} " + " ".join(f"{'step ' + str(k):>10}" for k in range(5, count + 1, 5)))
+    for feedback in (False, True):
+        torch.manual_seed(1)
+        A = torch.randn(size, size)
+        B = torch.randn(size, size)
+        torus = Torus(q)
+        spec = Transport("int8").spec()
+        total = torch.zeros(size, size, dtype=torch.float64)
+        exact = torch.zeros(size, size, dtype=torch.float64)
+        errors = []
+        for k in range(1, count + 1):
+            # Small drift per step, like weights between optimizer updates
+            A += 0.01 * torch.randn(size, size)
+            B += 0.01 * torch.randn(size, size)
+            if not feedback:
+                torus.feedback = {}
+            total += (await torus.run(A, B, spec)).double()
+            exact += A.double() @ B.double()
+            if k % 5 == 0:
+                errors.append(relative_error(total, exact))
+        print(f"{'on' if feedback else 'off':<10} " + " ".join(f"{error:>10.2e}" for error in errors))
+
+async def main(size, q, count):
+    await single(size, q)
+    await steps(size, q, count)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--grid", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.size, args.grid, args.steps))
@@ -0,0 +1,688 @@
+"""
+In-process torus simulator: an R x C torus of WorkerBees against a stand-in Queen.
+
+The stand-in Queen speaks the same protocol as server/discovery.js
+(HANDSHAKE/ACK, NEIGHBOR_UPDATE, Raft membership deltas to Princes) on
+localhost, but wraps the grid into a torus and adds simulator hooks: Cannon
+job injection, freezing its heartbeats, and collecting per-bee reports. The
+bees are real WorkerBees (mesh, pacemaker, Raft, engine), either all in this
+event loop or spread over --processes child processes. They report readiness,
+promotion and final counters over their Queen connection, so both modes
+measure the same way.
+
+Output is JSON: handshake-to-ready time, steps/s, bytes moved, kill
+detection and Raft failover latency. A job every bee finished is checked
+against A @ B and the run fails if C is wrong. Runs are seeded and every bee
+gets a fresh Raft directory, so repeated runs are comparable.
+
+    python benchmarks/sim_torus.py --rows 4 --cols 4 --size 512 --steps 5
+    python benchmarks/sim_torus.py --rows 4 --cols 4 --processes 4 --kill 1 --failover
+    python benchmarks/sim_torus.py --rows 4 --cols 4 --size 2048 --slow 4 [--no-steal]
+    python benchmarks/sim_torus.py --suite --out torus.json --baseline previous.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import torch
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker"))
+
+from bee import WorkerBee
+from shared.codec import Transport
+from systolic import SystolicEngine, encode_tensor, decode_tensor, pack_shard
+from shared.telemetry import Histogram
+
+RAFT_HEARTBEAT_SEC = 0.1 # discovery.js RAFT_HEARTBEAT_MS
+SNAPSHOT_CATCHUP_ENTRIES = 100
+READY_POLL_SEC = 0.005
+READY_TIMEOUT_SEC = 60.0
+STEP_TIMEOUT_SEC = 60.0
+FAILOVER_TIMEOUT_SEC = 10.0
+COLLECT_TIMEOUT_SEC = 10.0
+# Largest ||C - A @ B|| / ||A @ B|| accepted per pulse transport
+RESULT_TOLERANCE = {"none": 1e-5, "fp16": 1e-2, "bf16": 2e-2, "int8": 5e-2}
+NEIGHBORS = [("NORTH", -1, 0, "SOUTH"), ("SOUTH", 1, 0, "NORTH"), ("EAST", 0, 1, "WEST"), ("WEST", 0, -1, "EAST")]
+
+SUITE = {
+    "startup-4x4": {"rows": 4, "cols": 4, "steps": 0},
+    "cannon-4x4": {"rows": 4, "cols": 4, "size": 512, "steps": 5},
+    "cannon-4x4-batch8": {"rows": 4, "cols": 4, "size": 256, "shards": 8, "steps": 5},
+    "cannon-4x4-int8": {"rows": 4, "cols": 4, "size": 512, "steps": 5, "transport": "int8"},
+    "cannon-4x4-processes": {"rows": 4, "cols": 4, "size": 512, "steps": 5, "processes": 4},
+    "kill-4x4": {"rows": 4, "cols": 4, "size": 256, "steps": 3, "kill": 1, "step_timeout": 5.0},
+    "failover-4x4": {"rows": 4, "cols": 4, "steps": 0, "failover": True},
+    # Mixed fleet: a quarter of the bees 4x slower, with and without work stealing
+    "mixed-4x4-steal": {"rows": 4, "cols": 4, "size": 2048, "steps": 3, "slow": 4},
+    "mixed-4x4-nosteal": {"rows": 4, "cols": 4, "size": 2048, "steps": 3, "slow": 4, "steal": False},
+}
+
+def bee_id_at(i, j):
+    return f"sim-{i:02d}-{j:02d}"
+
+def percentiles(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "p50": ordered[len(ordered) // 2],
+        "p99": ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))],
+        "max": ordered[-1]
+    }
+
+class StandInQueen:
+    """
+    Localhost stand-in for server/discovery.js. Bee ids map to fixed cells
+    (placement), and the first `princes` cells in row-major order are
+    Princes, so a run is laid out the same way every time.
+    """
+    def __init__(self, rows, cols, princes, placement):
+        self.rows = rows
+        self.cols = cols
+        self.max_princes = princes
+        self.placement = placement # beeId -> (i, j)
+        self.grid = [[None] * cols for _ in range(rows)]
+        self.bees = {} # beeId -> {ws, coords, role, ip, p2pPort}
+        self.princes = set()
+
+        self.term = 1
+        self.log = [] # membership deltas; nothing is compacted in a short run
+        self.next_index = {}
+
+        self.server = None
+        self.heartbeat = None
+        self.frozen_at = None
+        self.changed = asyncio.Event()
+
+        self.handshake_at = {}
+        self.ready_at = {}
+        self.left_at = {}
+        self.results = {} # (jobId, step) -> {beeId}
+        self.promotions = [] # (at, beeId, term)
+        self.reports = {} # beeId -> SIM_REPORT
+        # Hash-only assignments: a block a bee has already loaded is sent as its hash
+        self.injected = None # (jobId, step, layouts, transport) of the latest step
+        self.sent = {} # beeId -> digests in its latest assignment
+        self.held = {} # beeId -> digests it signed a step over, so has cached
+        self.shard_misses = 0
+        self.shard_failures = {} # beeId -> SHARD_FAILED reports
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    async def start(self):
+        self.server = await websockets.serve(
+            self._handle, "127.0.0.1", 0, max_size=None, compression=None
+        )
+        self.heartbeat = asyncio.create_task(self._heartbeat_loop())
+        port = self.server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}"
+
+    async def close(self):
+        self.freeze()
+        self.heartbeat.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def freeze(self):
+        """Stops Raft heartbeats: to the Princes the Queen has died."""
+        if self.frozen_at is None:
+            self.frozen_at = time.time()
+
+    async def wait_until(self, predicate, timeout):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    async def send(self, ws, message):
+        data = json.dumps(message)
+        self.bytes_sent += len(data)
+        try:
+            await ws.send(data)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def _handle(self, ws):
+        bee_id = None
+        try:
+            async for message in ws:
+                self.bytes_received += len(message)
+                data = json.loads(message)
+                msg_type = data.get('type')
+                if msg_type == 'HANDSHAKE':
+                    bee_id = data['beeId']
+                    self.handshake_at[bee_id] = time.time()
+                    await self.register(ws, data)
+                elif msg_type == 'APPEND_ACK':
+                    self.handle_append_ack(data)
+                elif msg_type == 'RESULT_SIGNATURE':
+                    self.results.setdefault((data.get('jobId'), data.get('step')), set()).add(data['beeId'])
+                    self.held.setdefault(data['beeId'], set()).update(self.sent.get(data['beeId'], ()))
+                elif msg_type == 'SHARD_FAILED':
+                    self.shard_failures[data['beeId']] = self.shard_failures.get(data['beeId'], 0) + 1
+                elif msg_type == 'SHARD_MISS':
+                    await self.handle_shard_miss(ws, data)
+                elif msg_type == 'SIM_READY':
+                    self.ready_at[data['beeId']] = data['at']
+                elif msg_type == 'SIM_PROMOTED':
+                    self.promotions.append((data['at'], data['beeId'], data['term']))
+                elif msg_type == 'SIM_REPORT':
+                    self.reports[data['beeId']] = data
+                self.changed.set()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            if bee_id:
+                self.leave(bee_id, ws)
+
+    def _free_cell(self, bee_id):
+        cell = self.placement.get(bee_id)
+        if cell and self.grid[cell[0]][cell[1]] is None:
+            return cell
+        for i in range(self.rows):
+            for j in range(self.cols):
+                if self.grid[i][j] is None:
+                    return (i, j)
+        return None
+
+    async def register(self, ws, data):
+        bee_id = data['beeId']
+        cell = self._free_cell(bee_id)
+        if cell is None:
+            await ws.close()
+            return
+        i, j = cell
+        role = "PRINCE" if i * self.cols + j < self.max_princes else "WORKER"
+        ip = ws.remote_address[0]
+        self.grid[i][j] = bee_id
+        self.bees[bee_id] = {"ws": ws, "coords": {"i": i, "j": j}, "role": role, "ip": ip, "p2pPort": data.get('p2pPort', 0)}
+        self.log.append({"index": len(self.log) + 1, "term": self.term, "op": "JOIN", "beeId": bee_id,
+                         "i": i, "j": j, "role": role, "ip": ip, "p2pPort": data.get('p2pPort', 0)})
+        if role == "PRINCE":
+            self.princes.add(bee_id)
+
+        await self.send(ws, {"type": "ACK", "status": "ACCEPTED", "coordinates": {"i": i, "j": j}, "role": role})
+
+        # Torus: neighbours wrap around the edges
+        for direction, di, dj, opposite in NEIGHBORS:
+            neighbor_id = self.grid[(i + di) % self.rows][(j + dj) % self.cols]
+            if neighbor_id is None or neighbor_id == bee_id:
+                continue
+            neighbor = self.bees[neighbor_id]
+            await self.send(ws, {"type": "NEIGHBOR_UPDATE", "direction": direction,
+                                 "connectionInfo": {"ip": neighbor['ip'], "port": neighbor['p2pPort']}})
+            await self.send(neighbor['ws'], {"type": "NEIGHBOR_UPDATE", "direction": opposite,
+                                             "connectionInfo": {"ip": ip, "port": data.get('p2pPort', 0)}})
+
+    def leave(self, bee_id, ws):
+        bee = self.bees.get(bee_id)
+        if bee is None or bee['ws'] is not ws:
+            return
+        del self.bees[bee_id]
+        self.princes.discard(bee_id)
+        self.next_index.pop(bee_id, None)
+        coords = bee['coords']
+        self.grid[coords['i']][coords['j']] = None
+        self.log.append({"index": len(self.log) + 1, "term": self.term, "op": "LEAVE", "beeId": bee_id,
+                         "i": coords['i'], "j": coords['j']})
+        self.left_at[bee_id] = time.time()
+        self.changed.set()
+
+    # --- Raft (same rules as discovery.js appendEntriesFor / handleAppendAck) ---
+
+    def term_at(self, index):
+        return self.log[index - 1]['term'] if index else 0
+
+    def hive_snapshot(self):
+        bees = {
+            bee_id: {"i": bee['coords']['i'], "j": bee['coords']['j'], "role": bee['role'], "ip": bee['ip'], "p2pPort": bee['p2pPort']}
+            for bee_id, bee in self.bees.items()
+        }
+        return {"grid": self.grid, "beeCount": len(bees), "bees": bees}
+
+    def append_entries_for(self, prince_id):
+        last = len(self.log)
+        message = {"type": "APPEND_ENTRIES", "term": self.term, "leaderId": "QUEEN", "leaderCommit": last}
+        next_index = self.next_index.get(prince_id, last + 1)
+        if next_index <= 0 or last + 1 - next_index > SNAPSHOT_CATCHUP_ENTRIES:
+            self.next_index[prince_id] = last + 1
+            return {**message, "prevLogIndex": last, "prevLogTerm": self.term_at(last), "entries": [], "hiveState": self.hive_snapshot()}
+        prev = min(next_index, last + 1) - 1
+        return {**message, "prevLogIndex": prev, "prevLogTerm": self.term_at(prev), "entries": self.log[prev:]}
+
+    def handle_append_ack(self, data):
+        if data['beeId'] not in self.princes:
+            return
+        self.next_index[data['beeId']] = 0 if data['matchIndex'] > len(self.log) else data['matchIndex'] + 1
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(RAFT_HEARTBEAT_SEC)
+            if self.frozen_at is not None:
+                continue
+            for prince_id in list(self.princes):
+                await self.send(self.bees[prince_id]['ws'], self.append_entries_for(prince_id))
+
+    # --- Simulator hooks ---
+
+    async def inject_cannon(self, job_id, step, products, transport=None):
+        """
+        Sends every bee its skewed Cannon blocks (SHARD_ASSIGNMENT with a
+        fragment). products is [(A, B), ...]; more than one goes out as a batch.
+        """
+        layouts = [SystolicEngine.partition(A, B, self.rows) for A, B in products]
+        self.injected = (job_id, step, layouts, transport)
+        await asyncio.gather(*(self.send(bee['ws'], self.assignment_for(bee_id)) for bee_id, bee in list(self.bees.items())))
+
+    def assignment_for(self, bee_id, full=False):
+        """A bee's blocks of the latest step; ones it already holds go as hashes, unless full."""
+        job_id, step, layouts, transport = self.injected
+        q = self.rows
+        i, j = self.bees[bee_id]['coords']['i'], self.bees[bee_id]['coords']['j']
+        holds = () if full else self.held.get(bee_id, ())
+        shards = [{"A": pack_shard(layout[(i, j)][0], holds), "B": pack_shard(layout[(i, j)][1], holds)} for layout in layouts]
+        self.sent[bee_id] = {packed['hash'] for shard in shards for packed in shard.values()}
+        fragment = {"coords": {"i": i, "j": j}, "gridSize": q, "jobId": job_id, "transport": transport}
+        if len(shards) == 1:
+            fragment.update(shards[0])
+        else:
+            fragment['shards'] = shards
+        return {
+            "type": "SHARD_ASSIGNMENT",
+            "taskId": i * q + j,
+            "leadId": "QUEEN",
+            "step": step,
+            "fragment": fragment
+        }
+
+    async def handle_shard_miss(self, ws, data):
+        # The bee evicted (or never had) a block we sent as a hash: resend its step in full
+        self.shard_misses += 1
+        self.held.pop(data['beeId'], None)
+        if self.injected and data.get('step') == self.injected[1] and data['beeId'] in self.bees:
+            await self.send(ws, self.assignment_for(data['beeId'], full=True))
+
+    async def collect(self, timeout=COLLECT_TIMEOUT_SEC):
+        expected = set(self.bees)
+        await asyncio.gather(*(self.send(bee['ws'], {"type": "SIM_COLLECT"}) for bee in self.bees.values()))
+        await self.wait_until(lambda: expected <= set(self.reports), timeout)
+        return {bee_id: self.reports[bee_id] for bee_id in expected if bee_id in self.reports}
+
+class SimBee(WorkerBee):
+    """
+    WorkerBee that tells the stand-in Queen when it is ready, when it is
+    promoted, and its final counters. slowdown > 1 stands in for older
+    hardware: every matmul is followed by a sleep, so it takes that many
+    times longer without using more CPU.
+    """
+    def __init__(self, bee_id, raft_dir, slowdown=1.0, steal=True):
+        super().__init__(bee_id, raft_dir)
+        self.stealer.enabled = steal
+        if slowdown > 1:
+            self.engine._multiply_add = self._slowed(self.engine._multiply_add, slowdown)
+        self.dispatcher.handlers['SIM_COLLECT'] = self.handle_sim_collect
+        self.dispatcher.control_types.add('SIM_COLLECT') # answered even while shards are stuck
+        self.task = None
+
+    @staticmethod
+    def _slowed(multiply_add, slowdown):
+        def slow_multiply_add(*args, **kwargs):
+            started = time.perf_counter()
+            multiply_add(*args, **kwargs)
+            time.sleep((slowdown - 1) * (time.perf_counter() - started))
+        return slow_multiply_add
+
+    async def _send_queen(self, message):
+        if self.websocket:
+            try:
+                await self.websocket.send(json.dumps(message))
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+    async def serve(self, queen_uri=None):
+        watcher = asyncio.create_task(self.watch_ready())
+        try:
+            await super().serve(queen_uri)
+        finally:
+            watcher.cancel()
+            self.raft.stop_election_timer()
+
+    async def watch_ready(self):
+        """Ready: the Queen acknowledged us and all four neighbour links are up."""
+        while True:
+            links = self.mesh.stats()
+            if self.websocket and len(links) == 4 and all(link['connected'] for link in links.values()):
+                await self._send_queen({"type": "SIM_READY", "beeId": self.bee_id, "at": time.time()})
+                return
+            await asyncio.sleep(READY_POLL_SEC)
+
+    async def promote_to_queen(self):
+        # No UDP beacon in the simulator; the harness only needs to know when
+        await self._send_queen({"type": "SIM_PROMOTED", "beeId": self.bee_id, "term": self.raft.current_term, "at": time.time()})
+
+    async def handle_sim_collect(self, payload):
+        await self._send_queen({
+            "type": "SIM_REPORT",
+            "beeId": self.bee_id,
+            "role": self.role,
+            "mesh": self.mesh.stats(),
+            "pacemaker": self.pacemaker.stats(),
+            "transport": self.engine.transport.metrics(),
+            "telemetry": self.telemetry.summary(),
+            "dispatcher": {"processed": self.dispatcher.processed, "errors": self.dispatcher.errors},
+            # This bee's block of the last product, to check against A @ B
+            "coords": list(self.engine.coords),
+            "result": encode_tensor(self.engine.local_C) if self.engine.local_C is not None else None
+        })
+
+    def crash(self):
+        """Dies without a GOODBYE: sockets drop, timers stop."""
+        self.raft.stop_election_timer()
+        if self.mesh.server:
+            self.mesh.server.close()
+        if self.task:
+            self.task.cancel()
+
+def start_bees(queen_uri, bee_ids, raft_root, slow=(), slowdown=1.0, steal=True):
+    bees = [
+        SimBee(bee_id, os.path.join(raft_root, bee_id), slowdown if bee_id in slow else 1.0, steal)
+        for bee_id in bee_ids
+    ]
+    for bee in bees:
+        bee.task = asyncio.create_task(bee.serve(queen_uri))
+    return bees
+
+def child_main(queen_uri, bee_ids, raft_root, log_path, slow, slowdown, steal):
+    """Process-pool mode: hosts a slice of the torus until the Queen goes away."""
+    async def main():
+        bees = start_bees(queen_uri, bee_ids, raft_root, slow, slowdown, steal)
+        await asyncio.gather(*(bee.task for bee in bees), return_exceptions=True)
+
+    with open(log_path, "a") as log, contextlib.redirect_stdout(log):
+        asyncio.run(main())
+
+async def simulate(rows=4, cols=4, size=256, steps=3, shards=1, princes=3, processes=0, transport="none",
+                   kill=0, kill_step=None, kill_delay=0.05, failover=False, seed=0,
+                   step_timeout=STEP_TIMEOUT_SEC, log_path=os.devnull, slow=0, slowdown=4.0, steal=True):
+    if rows < 2 or cols < 2:
+        raise ValueError("The torus needs at least 2 rows and 2 columns")
+    if steps and rows != cols:
+        raise ValueError("Cannon jobs need a square torus (rows == cols)")
+    rng = random.Random(seed)
+    placement = {bee_id_at(i, j): (i, j) for i in range(rows) for j in range(cols)}
+    bee_ids = list(placement)
+    config = {"rows": rows, "cols": cols, "size": size, "steps": steps, "shards": shards, "princes": princes, "processes": processes,
+              "transport": transport, "kill": kill, "failover": failover, "seed": seed,
+              "slow": slow, "slowdown": slowdown, "steal": steal}
+
+    # Slow bees: a mixed fleet, picked from the same seed
+    slow_ids = set(random.Random(seed).sample(bee_ids, slow))
+
+    queen = StandInQueen(rows, cols, princes, placement)
+    with tempfile.TemporaryDirectory() as raft_root:
+        queen_uri = await queen.start()
+        started = time.time()
+
+        bees, children = [], []
+        if processes:
+            context = multiprocessing.get_context("spawn")
+            slices = [bee_ids[k::processes] for k in range(processes)]
+            for bee_slice in slices:
+                child = context.Process(target=child_main, args=(queen_uri, bee_slice, raft_root, log_path, slow_ids, slowdown, steal), daemon=True)
+                child.start()
+                children.append((child, bee_slice))
+        else:
+            bees = start_bees(queen_uri, bee_ids, raft_root, slow_ids, slowdown, steal)
+
+        all_ready = await queen.wait_until(lambda: len(queen.ready_at) == len(bee_ids), READY_TIMEOUT_SEC)
+        ready_seconds = [queen.ready_at[b] - queen.handshake_at[b] for b in queen.ready_at if b in queen.handshake_at]
+        startup = {
+            "bees": len(bee_ids),
+            "ready": len(queen.ready_at),
+            "allReady": all_ready,
+            "handshakeToReady": percentiles(ready_seconds),
+            "startToAllReady": max(queen.ready_at.values()) - started if queen.ready_at else None
+        }
+
+        # Job
+        torch.manual_seed(seed)
+        products = [(torch.randn(size, size), torch.randn(size, size)) for _ in range(shards)]
+        spec = Transport(transport).spec() if transport != "none" else None
+        job_id = f"sim-job-{seed}"
+        kill_step = steps // 2 if kill_step is None else kill_step
+        kills = []
+        step_seconds = []
+        completed = 0
+        mesh_before = None
+        job_start = time.perf_counter()
+        for step in range(steps):
+            expected = set(queen.bees)
+            step_start = time.perf_counter()
+            await queen.inject_cannon(job_id, step, products, spec)
+            if kill and step == kill_step:
+                await asyncio.sleep(kill_delay)
+                kills = kill_bees(rng, queen, bees, children, kill)
+            done = await queen.wait_until(lambda: expected - set(queen.left_at) <= queen.results.get((job_id, step), set()), step_timeout)
+            # A bee that died mid-step leaves its neighbours stuck: the step only counts if everyone finished
+            if not done or expected - queen.results.get((job_id, step), set()):
+                break
+            step_seconds.append(time.perf_counter() - step_start)
+            completed += 1
+        job_seconds = time.perf_counter() - job_start
+        if kill and not kills:
+            kills = kill_bees(rng, queen, bees, children, kill)
+
+        failover_result = None
+        if failover:
+            await asyncio.sleep(RAFT_HEARTBEAT_SEC * 3)
+            queen.freeze()
+            promoted = await queen.wait_until(lambda: queen.promotions, FAILOVER_TIMEOUT_SEC)
+            if promoted:
+                at, leader, term = min(queen.promotions)
+                failover_result = {"seconds": at - queen.frozen_at, "leader": leader, "term": term,
+                                   "promotions": len(queen.promotions)}
+            else:
+                failover_result = {"seconds": None, "promotions": 0}
+
+        queen_received = queen.bytes_received # before the reports, which carry result blocks
+        reports = await queen.collect()
+        await queen.close()
+        await asyncio.gather(*(bee.task for bee in bees), return_exceptions=True)
+        for child, _ in children:
+            await asyncio.to_thread(child.join, 10)
+            if child.is_alive():
+                child.kill()
+
+    # Only a job every bee finished leaves a whole C behind
+    error = result_error(reports, products, rows) if steps and completed == steps and not kills else None
+    if error is not None:
+        assert error <= RESULT_TOLERANCE[transport], f"Wrong result: relative error {error:.2e} over A @ B"
+    links = [link for report in reports.values() for link in report['mesh'].values()]
+    waits = [report['pacemaker'] for report in reports.values() if report['pacemaker']['steps']]
+    rounds = completed * (rows - 1)
+    mesh_bytes = sum(link['sentBytes'] for link in links)
+    stages = {stage: Histogram() for stage in ("compute", "wait", "transfer")}
+    steal = dict.fromkeys(("handedOver", "rows", "fallbacks", "served", "refused"), 0)
+    for report in reports.values():
+        counters = (report.get('telemetry') or {}).get('counters', {})
+        for name in steal:
+            steal[name] += counters.get(f"steal.{name}", 0)
+    for report in reports.values():
+        histograms = (report.get('telemetry') or {}).get('histograms', {})
+        for stage, histogram in stages.items():
+            if stage in histograms:
+                histogram.merge(Histogram.from_summary(histograms[stage]))
+    return {
+        "config": config,
+        "startup": startup,
+        "job": {
+            "completedSteps": completed,
+            "stalled": completed < steps,
+            "seconds": job_seconds if steps else 0.0,
+            # Throughput over completed steps only; a stalled step is reported, not averaged in
+            "stepsPerSec": completed / sum(step_seconds) if completed else 0.0,
+            "shardsPerSec": completed * shards / sum(step_seconds) if completed else 0.0,
+            "pulseRoundsPerSec": rounds / sum(step_seconds) if completed else 0.0,
+            "stepSeconds": percentiles(step_seconds),
+            "relError": error
+        },
+        "bytes": {
+            "mesh": mesh_bytes,
+            "meshPerStep": mesh_bytes / completed if completed else None,
+            "queenSent": queen.bytes_sent,
+            "queenReceived": queen_received,
+            "shardMisses": queen.shard_misses
+        },
+        "mesh": {
+            "dropped": sum(link['dropped'] for link in links),
+            "coalesced": sum(link['coalesced'] for link in links),
+            "reconnects": sum(link['reconnects'] for link in links)
+        },
+        "pacemaker": {
+            "waitP50": statistics.median(w['waitP50'] for w in waits) if waits else None,
+            "waitP99": max(w['waitP99'] for w in waits) if waits else None
+        },
+        "kills": {
+            "killed": [bee_id for bee_id, _ in kills],
+            "detectSeconds": [queen.left_at[bee_id] - at for bee_id, at in kills if bee_id in queen.left_at],
+            # Neighbours of a killed bee give up on their run (SHARD_FAILED)
+            "shardFailures": queen.shard_failures
+        },
+        "stages": {
+            stage: {"p50": h.quantile(0.50), "p99": h.quantile(0.99), "seconds": h.total}
+            for stage, h in stages.items() if h.count
+        },
+        "steal": steal,
+        "failover": failover_result,
+        "reports": len(reports)
+    }
+
+def result_error(reports, products, q):
+    """
+    Reassembles each C from the bees' result blocks and returns the largest
+    relative error against A @ B, or None if a block is missing.
+    """
+    blocks = {}
+    for report in reports.values():
+        if report.get('result') is not None:
+            block = decode_tensor(report['result'])
+            blocks[tuple(report['coords'])] = block if block.dim() == 3 else block.unsqueeze(0)
+    if len(blocks) < q * q:
+        return None
+    errors = []
+    for index, (A, B) in enumerate(products):
+        C = torch.cat([torch.cat([blocks[(i, j)][index] for j in range(q)], dim=1) for i in range(q)], dim=0)
+        exact = A @ B
+        errors.append(((C - exact).norm() / exact.norm()).item())
+    return max(errors)
+
+def kill_bees(rng, queen, bees, children, count):
+    """Kills `count` workers (in process mode: whole worker-only processes). Returns [(beeId, killedAt)]."""
+    workers = sorted(b for b, bee in queen.bees.items() if bee['role'] == 'WORKER')
+    killed = []
+    if children:
+        candidates = [c for c in children if c[0].is_alive() and set(c[1]) <= set(workers)] or [c for c in children if c[0].is_alive()]
+        for child, bee_slice in rng.sample(candidates, min(count, len(candidates))):
+            at = time.time()
+            child.kill()
+            killed.extend((bee_id, at) for bee_id in bee_slice)
+        return killed
+    by_id = {bee.bee_id: bee for bee in bees}
+    for bee_id in rng.sample(workers, min(count, len(workers))):
+        killed.append((bee_id, time.time()))
+        by_id[bee_id].crash()
+    return killed
+
+def flatten(result, prefix=""):
+    values = {}
+    for key, value in (result or {}).items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+def compare(results, baseline):
+    """Prints every numeric metric next to its baseline value."""
+    for scenario, result in results.items():
+        before = flatten(baseline.get(scenario))
+        for name, value in flatten(result).items():
+            if name.startswith("config.") or name not in before:
+                continue
+            old = before[name]
+            change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"{scenario:<22} {name:<32} {old:>14.6g} -> {value:<14.6g} {change}", file=sys.stderr)
+
+def run_suite(log_path):
+    results = {}
+    for name, scenario in SUITE.items():
+        print(f"[SIM] {name}...", file=sys.stderr)
+        # A fresh loop per scenario: nothing left over from the last torus
+        results[name] = asyncio.run(simulate(log_path=log_path, **scenario))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4)
+    parser.add_argument("--cols", type=int, default=4)
+    parser.add_argument("--size", type=int, default=256, help="A and B are size x size fp32")
+    parser.add_argument("--steps", type=int, default=3, help="Cannon job steps (0: startup only)")
+    parser.add_argument("--shards", type=int, default=1, help="Independent size x size products per step, batched into one assignment")
+    parser.add_argument("--princes", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=0, help="Spread bees over this many processes (0: one event loop)")
+    parser.add_argument("--transport", choices=["none", "fp16", "bf16", "int8"], default="none")
+    parser.add_argument("--kill", type=int, default=0, help="Workers to kill mid-job (processes, with --processes)")
+    parser.add_argument("--kill-step", type=int, default=None)
+    parser.add_argument("--failover", action="store_true", help="Freeze the Queen after the job and time the Raft failover")
+    parser.add_argument("--step-timeout", type=float, default=STEP_TIMEOUT_SEC)
+    parser.add_argument("--slow", type=int, default=0, help="Bees whose matmuls run --slowdown times slower (a mixed fleet)")
+    parser.add_argument("--slowdown", type=float, default=4.0)
+    parser.add_argument("--no-steal", dest="steal", action="store_false", help="Disable neighbour work stealing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--suite", action="store_true", help="Run the standard scenario set")
+    parser.add_argument("--baseline", help="JSON from an earlier --suite run to compare against")
+    parser.add_argument("--out", help="Write the JSON here instead of stdout")
+    parser.add_argument("--log", default=os.devnull, help="Bee output (default: discarded)")
+    args = parser.parse_args()
+
+    with open(args.log, "a") as log, contextlib.redirect_stdout(log):
+        if args.suite:
+            results = run_suite(args.log)
+        else:
+            results = asyncio.run(simulate(
+                args.rows, args.cols, args.size, args.steps, args.shards, args.princes, args.processes, args.transport,
+                args.kill, args.kill_step, failover=args.failover, seed=args.seed,
+                step_timeout=args.step_timeout, log_path=args.log,
+                slow=args.slow, slowdown=args.slowdown, steal=args.steal
+            ))
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results if args.suite else {"run": results}, json.load(f))
+
+if __name__ == "__main__":
+    main()
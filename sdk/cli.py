@@ -5,13 +5,20 @@ import json
 import websockets
 import os
 import sys
+import tempfile
 
 # Add current directory to path so we can import porter if needed locally, though ideally installed as package
 sys.path.append(os.getcwd())
+# shared/ (codec, telemetry) sits at the repo root, next to sdk/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
 from porter import GridbeePorter
+from shared.codec import Transport, MODES, LOSSLESS, DEFAULT_LEVEL
+from uploader import ChunkedUploader, CHUNK_SIZE, STREAMS
+from shared.telemetry import Histogram
 
 CONFIG_FILE = ".gridbee_config"
+STAGES = ["compute", "wait", "transfer"] # matmul, pacemaker wait, frame send
 
 def save_config(queen_ip, hive_port):
     with open(CONFIG_FILE, "w") as f:
@@ -23,6 +30,12 @@ def load_config():
     with open(CONFIG_FILE, "r") as f:
         return json.load(f)
 
+def queen_uri(config):
+    uri = f"ws://{config['queenIp']}:{config['hivePort']}"
+    if config['queenIp'] == "127.0.0.1": # fix for local testing
+         uri = f"ws://localhost:{config['hivePort']}"
+    return uri
+
 async def scan_for_queen():
     UDP_PORT = 41234
     print(f"[CLI] Scanning for Hive on UDP {UDP_PORT}...")
@@ -46,7 +59,7 @@ async def scan_for_queen():
         return message['queenIp'], message['hivePort']
     return None, None
 
-async def submit_job(model_path):
+async def submit_job(model_path, chunk_mb=CHUNK_SIZE // (1024 * 1024), streams=STREAMS, transport=None):
     config = load_config()
     if not config:
         print("[ERROR] Not logged in. Run 'gridbee login' first.")
@@ -73,30 +86,81 @@ async def submit_job(model_path):
         return
         
     porter = GridbeePorter(user_module.model)
-    payload_data, size = porter.prepare_for_hive()
+    transport = transport or Transport()
     
-    uri = f"ws://{config['queenIp']}:{config['hivePort']}"
-    if config['queenIp'] == "127.0.0.1": # fix for local testing
-         uri = f"ws://localhost:{config['hivePort']}"
+    uri = queen_uri(config)
 
-    print(f"[CLI] Conneting to Queen at {uri}...")
-    
-    async with websockets.connect(uri) as ws:
-        submission = {
-            "type": "JOB_SUBMISSION",
-            "jobName": os.path.basename(model_path),
-            "fileSize": size,
-            "data": payload_data
-        }
-        await ws.send(json.dumps(submission))
-        
-        response = await ws.recv()
-        ack = json.loads(response)
-        
-        if ack.get('type') == 'JOB_ACK':
-            print(f"[SUCCESS] Job Submitted! ID: {ack['jobId']}")
-        else:
-            print(f"[ERROR] Hive rejected job: {response}")
+    with tempfile.TemporaryDirectory() as tmp:
+        export_path = os.path.join(tmp, "model.gbex")
+        porter.export_to_file(export_path, transport)
+
+        print(f"[CLI] Conneting to Queen at {uri}...")
+        uploader = ChunkedUploader(
+            uri, export_path, job_name=os.path.basename(model_path),
+            chunk_size=chunk_mb * 1024 * 1024, streams=streams,
+            transport=transport.spec() if transport.enabled else None
+        )
+        result = await uploader.upload()
+
+    ack = result['ack']
+    print(f"[CLI] Uploaded {result['sentBytes'] / (1024 * 1024):.2f} MB in {result['seconds']:.2f}s "
+          f"({result['throughputMBs']:.1f} MB/s), skipped {result['skippedBytes'] / (1024 * 1024):.2f} MB already on the Hive.")
+    if ack.get('type') == 'JOB_ACK':
+        print(f"[SUCCESS] Job Submitted! ID: {ack['jobId']}")
+    else:
+        print(f"[ERROR] Hive rejected job: {ack}")
+
+async def fetch_status():
+    config = load_config()
+    if not config:
+        print("[ERROR] Not logged in. Run 'gridbee login' first.")
+        return None
+    async with websockets.connect(queen_uri(config), max_size=None) as ws:
+        await ws.send(json.dumps({"type": "STATUS_REQUEST"}))
+        return json.loads(await ws.recv())
+
+def bee_histograms(bee):
+    histograms = (bee.get('telemetry') or {}).get('histograms', {})
+    return {stage: Histogram.from_summary(histograms[stage]) for stage in STAGES if stage in histograms}
+
+def bee_bytes(bee, kind):
+    counters = (bee.get('telemetry') or {}).get('counters', {})
+    return sum(value for name, value in counters.items() if name.startswith(f"mesh.{kind}."))
+
+def latency_cells(histograms):
+    cells = []
+    for stage in STAGES:
+        h = histograms.get(stage)
+        cells.append(f"{h.quantile(0.5) * 1000:>8.2f} {h.quantile(0.99) * 1000:>8.2f}" if h and h.count else f"{'-':>8} {'-':>8}")
+    return " ".join(cells)
+
+def print_status(status):
+    bees = sorted(status['bees'], key=lambda bee: (bee['coords']['i'], bee['coords']['j']))
+    click.echo(f"Hive: {status['beeCount']} bees ({status['princes']} princes). Latencies in ms (p50 p99), since each bee started.")
+    header = " ".join(f"{stage + ' p50 p99':>17}" for stage in STAGES)
+    click.echo(f"{'BEE':<10} {'CELL':<7} {'ROLE':<7} {'GFLOPS':>7} {header} {'tx MB':>8} {'rx MB':>8} {'age s':>6}")
+
+    cluster = {stage: Histogram() for stage in STAGES}
+    for bee in bees:
+        histograms = bee_histograms(bee)
+        for stage, h in histograms.items():
+            cluster[stage].merge(h)
+        cell = f"{bee['coords']['i']},{bee['coords']['j']}"
+        age = f"{bee['telemetryAgeSec']:.0f}" if bee.get('telemetryAgeSec') is not None else "-"
+        gflops = ((bee.get('capability') or {}).get('matmulGflops') or {}).get('float32')
+        gflops = f"{gflops:.0f}" if gflops else "-"
+        click.echo(f"{bee['id'][:10]:<10} {cell:<7} {bee['role']:<7} {gflops:>7} {latency_cells(histograms)} "
+                   f"{bee_bytes(bee, 'txBytes') / 1e6:>8.1f} {bee_bytes(bee, 'rxBytes') / 1e6:>8.1f} {age:>6}")
+    click.echo(f"{'CLUSTER':<34} {latency_cells(cluster)} "
+               f"{sum(bee_bytes(bee, 'txBytes') for bee in bees) / 1e6:>8.1f} {sum(bee_bytes(bee, 'rxBytes') for bee in bees) / 1e6:>8.1f}")
+
+    # Where the time goes. Sends overlap the matmul, so the totals are not exclusive.
+    if cluster['compute'].count:
+        click.echo("Time summed over bees: " + ", ".join(f"{stage} {cluster[stage].total:.2f}s" for stage in STAGES))
+        slowest = max(bees, key=lambda bee: bee_histograms(bee).get('compute', Histogram()).quantile(0.5))
+        slowest_p50 = bee_histograms(slowest)['compute'].quantile(0.5)
+        click.echo(f"Slowest compute: {slowest['id']} (p50 {slowest_p50 * 1000:.2f} ms, "
+                   f"cluster p50 {cluster['compute'].quantile(0.5) * 1000:.2f} ms)")
 
 @click.group()
 def cli():
@@ -112,14 +176,28 @@ def login():
 
 @cli.command()
 @click.option('--model', required=True, help='Path to python file defining "model"')
-def submit(model):
-    """Submit a model to the Hive."""
-    asyncio.run(submit_job(model))
+@click.option('--chunk-mb', default=CHUNK_SIZE // (1024 * 1024), show_default=True, help='Upload chunk size in MB')
+@click.option('--streams', default=STREAMS, show_default=True, help='Concurrent upload streams')
+@click.option('--transport', type=click.Choice(MODES), default="none", show_default=True, help='Lossy tensor encoding for the export and systolic pulses')
+@click.option('--lossless', type=click.Choice(LOSSLESS), default="none", show_default=True, help='Lossless compression after the lossy step')
+@click.option('--level', default=DEFAULT_LEVEL, show_default=True, help='Lossless compression level')
+def submit(model, chunk_mb, streams, transport, lossless, level):
+    """Submit a model to the Hive (chunked, resumable upload)."""
+    asyncio.run(submit_job(model, chunk_mb, streams, Transport(transport, lossless, level)))
 
 @cli.command()
-def status():
-    """Check Hive Status."""
-    click.echo("Telemetry not implemented yet.")
+@click.option('--json', 'as_json', is_flag=True, help='Print the raw STATUS reply')
+def status(as_json):
+    """Per-bee and cluster-wide compute / wait / transfer latencies."""
+    reply = asyncio.run(fetch_status())
+    if reply is None:
+        return
+    if as_json:
+        click.echo(json.dumps(reply, indent=2))
+    elif reply.get('type') == 'STATUS':
+        print_status(reply)
+    else:
+        click.echo(f"[ERROR] Unexpected reply from the Queen: {reply}")
 
 if __name__ == '__main__':
     cli()
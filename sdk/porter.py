@@ -1,8 +1,74 @@
 import torch
 import torch.nn as nn
-import pickle
 import base64
-import copy
+import io
+import struct
+
+from shared.codec import decode
+
+# Export Format
+# MAGIC, then one length-prefixed record per state_dict entry:
+#   name_len | name | dtype | ndim | flags | shape... | nbytes | raw bytes
+# flags bit 0: masked; bit 1: the bytes are a codec blob (see shared/codec.py)
+EXPORT_MAGIC = b"GBEX1"
+RECORD_HEADER = struct.Struct("<IBBB")
+DTYPES = [
+    torch.float32, torch.float16, torch.bfloat16, torch.float64,
+    torch.int8, torch.uint8, torch.int32, torch.int64, torch.bool,
+    # Appended, so existing codes keep their meaning
+    torch.int16, torch.complex64, torch.complex128
+]
+DTYPE_CODES = {dtype: code for code, dtype in enumerate(DTYPES)}
+
+MASK_FACTOR = 10.0
+FLAG_MASKED = 1
+FLAG_ENCODED = 2
+
+def _read_into(stream, buffer):
+    """
+    Fills buffer from stream. Sockets and pipes return short reads, so
+    this loops; an end of stream before the buffer is full is an error.
+    Returns the bytes read, which is only short (0) at a clean end.
+    """
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            if filled:
+                raise EOFError(f"Export stream ended after {filled} of {len(view)} bytes")
+            break
+        filled += count
+    return filled
+
+def _read_exact(stream, size):
+    buffer = bytearray(size)
+    if _read_into(stream, buffer) != size:
+        raise EOFError("Export stream ended inside a record")
+    return buffer
+
+def iter_records(stream):
+    """
+    Reads an export back one tensor at a time.
+    Yields (name, tensor, masked).
+    """
+    if bytes(_read_exact(stream, len(EXPORT_MAGIC))) != EXPORT_MAGIC:
+        raise ValueError("Not a Gridbee export stream")
+    head = bytearray(RECORD_HEADER.size)
+    while True:
+        if not _read_into(stream, head):
+            return
+        name_len, dtype_code, ndim, flags = RECORD_HEADER.unpack(head)
+        name = _read_exact(stream, name_len).decode()
+        shape = struct.unpack(f"<{ndim}Q", _read_exact(stream, 8 * ndim))
+        (nbytes,) = struct.unpack("<Q", _read_exact(stream, 8))
+        raw = _read_exact(stream, nbytes)
+        dtype = DTYPES[dtype_code]
+        if flags & FLAG_ENCODED:
+            tensor = decode(raw)
+        else:
+            tensor = torch.frombuffer(raw, dtype=dtype).reshape(shape) if nbytes else torch.empty(shape, dtype=dtype)
+        yield name, tensor, bool(flags & FLAG_MASKED)
 
 class GridbeePorter:
     """
@@ -11,31 +77,91 @@ class GridbeePorter:
     """
     def __init__(self, model: nn.Module):
         self.model = model
-        
-    def prepare_for_hive(self):
+
+    def export(self, stream, transport=None):
         """
-        1. Copies the model to CPU.
-        2. Multiplies all parameter tensors by 10 (Masking).
-        3. Serializes to a pickle object.
+        Streams the model into any writable binary stream (file, socket
+        makefile, BytesIO) one tensor at a time.
+
+        1. Walks state_dict() (references, no model copy).
+        2. Multiplies trainable parameters by 10 (Masking) on a temporary
+           CPU copy of that one tensor.
+        3. Writes a length-prefixed raw record from a memoryview, or, with
+           an enabled codec.Transport, the floating tensors as codec blobs.
+
+        Peak extra memory is about the size of the largest tensor.
+        Returns the number of bytes written.
         """
-        print("[PORTER] Hydrating model for hive distribution...")
-        
-        # Clone to avoid mutating the user's local instance
-        hive_model = copy.deepcopy(self.model).to('cpu')
-        
+        # Every name of a tied or shared parameter: state_dict() lists them all
+        trainable = {
+            name for name, param in self.model.named_parameters(remove_duplicate=False) if param.requires_grad
+        }
+        state = self.model.state_dict()
+        unsupported = {name: tensor.dtype for name, tensor in state.items() if tensor.dtype not in DTYPE_CODES}
+        if unsupported:
+            # Before the first byte is written, not halfway through the stream
+            raise TypeError(f"Cannot export tensors of these dtypes: {unsupported}")
+
+        stream.write(EXPORT_MAGIC)
+        written = len(EXPORT_MAGIC)
         with torch.no_grad():
-            for name, param in hive_model.named_parameters():
-                if param.requires_grad:
+            for name, tensor in state.items():
+                masked = name in trainable
+                if masked:
                     # Mathematical Obfuscation: Factor 10
-                    param.data.mul_(10.0)
-        
+                    tensor = tensor.to('cpu', copy=True).mul_(MASK_FACTOR)
+                elif tensor.device.type != 'cpu':
+                    tensor = tensor.to('cpu')
+                tensor = tensor.contiguous()
+
+                name_bytes = name.encode()
+                shape = tuple(tensor.shape)
+                flags = FLAG_MASKED if masked else 0
+                if transport is not None and transport.enabled and transport.applies_to(tensor):
+                    body = memoryview(transport.encode(tensor).blob)
+                    flags |= FLAG_ENCODED
+                else:
+                    body = memoryview(tensor.reshape(-1).view(torch.uint8).numpy())
+                header = (
+                    RECORD_HEADER.pack(len(name_bytes), DTYPE_CODES[tensor.dtype], len(shape), flags)
+                    + name_bytes
+                    + struct.pack(f"<{len(shape)}Q", *shape)
+                    + struct.pack("<Q", body.nbytes)
+                )
+                stream.write(header)
+                stream.write(body)
+                written += len(header) + body.nbytes
+                del tensor, body
+
+        return written
+
+    def export_to_file(self, path, transport=None):
+        """Streams the export to disk. Returns the file size in bytes."""
+        print("[PORTER] Streaming model export to disk...")
+        with open(path, "wb") as f:
+            size = self.export(f, transport)
+        print(f"[PORTER] Mathematical Obfuscation Applied (Factor 10).")
+        if transport is not None and transport.enabled:
+            stats = transport.metrics()
+            print(f"[PORTER] Transport {stats['mode']}+{stats['lossless']}: {stats['ratio']:.2f}x smaller tensors.")
+        print(f"[PORTER] Package Ready. Size: {size / (1024 * 1024):.2f} MB -> {path}")
+        return size
+
+    def prepare_for_hive(self):
+        """
+        Inline (JSON) package: the streamed export, base64 encoded.
+        Large models should use export_to_file() instead.
+        """
+        print("[PORTER] Hydrating model for hive distribution...")
+
+        buffer = io.BytesIO()
+        self.export(buffer)
         print(f"[PORTER] Mathematical Obfuscation Applied (Factor 10).")
-        
-        # Serialize
-        serialized_data = pickle.dumps(hive_model.state_dict())
-        encoded_data = base64.b64encode(serialized_data).decode('utf-8')
-        
+
+        encoded_data = base64.b64encode(buffer.getbuffer()).decode('utf-8')
+        buffer.close()
+
         size_mb = len(encoded_data) / (1024 * 1024)
         print(f"[PORTER] Package Ready. Size: {size_mb:.2f} MB")
-        
+
         return encoded_data, len(encoded_data)
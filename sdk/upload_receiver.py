@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import uuid
+import websockets
+
+# Run as `python sdk/upload_receiver.py`: shared/ sits at the repo root, next to sdk/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    from uploader import MAX_MESSAGE_BYTES
+except ImportError:
+    from sdk.uploader import MAX_MESSAGE_BYTES
+
+class UploadReceiver:
+    """
+    Local stand-in for the Queen's side of the chunked upload protocol.
+    Chunks are stored content-addressed on disk, so they survive both an
+    interrupted client and a receiver restart.
+    """
+    def __init__(self, store_dir):
+        self.chunk_dir = os.path.join(store_dir, "chunks")
+        self.job_dir = os.path.join(store_dir, "jobs")
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.job_dir, exist_ok=True)
+
+        self.uploads = {} # uploadId -> UPLOAD_INIT message
+        self.received_bytes = 0
+        self.server = None
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest)
+
+    def has_chunk(self, digest):
+        return os.path.exists(self._chunk_path(digest))
+
+    def _have(self, chunks):
+        return [digest for digest in dict.fromkeys(chunks) if self.has_chunk(digest)]
+
+    def _store_chunk(self, message):
+        digest = message[:32].hex()
+        data = memoryview(message)[32:]
+        if hashlib.sha256(data).hexdigest() != digest:
+            return {"type": "CHUNK_NACK", "hash": digest, "reason": "hash mismatch"}
+        tmp = self._chunk_path(digest) + ".part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._chunk_path(digest))
+        self.received_bytes += len(data)
+        return {"type": "CHUNK_ACK", "hash": digest}
+
+    def _commit(self, upload_id):
+        init = self.uploads[upload_id]
+        missing = [digest for digest in init['chunks'] if not self.has_chunk(digest)]
+        if missing:
+            return {"type": "UPLOAD_HAVE", "uploadId": upload_id, "have": self._have(init['chunks'])}
+
+        job_id = str(uuid.uuid4())
+        with open(os.path.join(self.job_dir, f"{job_id}.gbex"), "wb") as out:
+            for digest in init['chunks']:
+                with open(self._chunk_path(digest), "rb") as chunk:
+                    out.write(chunk.read())
+        del self.uploads[upload_id]
+        print(f"[RECEIVER] Job {init['jobName']} assembled ({init['fileSize']} bytes) -> {job_id}")
+        return {"type": "JOB_ACK", "jobId": job_id, "status": "RECEIVED"}
+
+    async def handle(self, ws):
+        try:
+            async for message in ws:
+                if isinstance(message, bytes):
+                    await ws.send(json.dumps(self._store_chunk(message)))
+                    continue
+
+                data = json.loads(message)
+                if data.get('type') == 'UPLOAD_INIT':
+                    upload_id = str(uuid.uuid4())
+                    self.uploads[upload_id] = data
+                    await ws.send(json.dumps({"type": "UPLOAD_HAVE", "uploadId": upload_id, "have": self._have(data['chunks'])}))
+                elif data.get('type') == 'UPLOAD_COMMIT':
+                    await ws.send(json.dumps(self._commit(data['uploadId'])))
+        except websockets.exceptions.ConnectionClosed:
+            # Client went away mid-upload; stored chunks let it resume
+            pass
+
+    async def start(self, host="localhost", port=0):
+        self.server = await websockets.serve(self.handle, host, port, max_size=MAX_MESSAGE_BYTES, compression=None)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+async def main(store_dir, port):
+    receiver = UploadReceiver(store_dir)
+    port = await receiver.start("0.0.0.0", port)
+    print(f"[RECEIVER] Accepting chunked uploads on port {port}, store: {store_dir}")
+    await asyncio.Future()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in receiver for gridbee chunked uploads")
+    parser.add_argument("--store", default=".gridbee_store")
+    parser.add_argument("--port", type=int, default=41235)
+    args = parser.parse_args()
+    asyncio.run(main(args.store, args.port))
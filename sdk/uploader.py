@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import random
+import time
+import websockets
+
+from shared.budget import ByteBudget
+
+# Chunked Upload Protocol
+# 1. UPLOAD_INIT {jobName, fileSize, chunkSize, chunks: [sha256 hex]}
+#    -> UPLOAD_HAVE {uploadId, have: [sha256 hex]}
+# 2. Missing chunks as binary messages: 32-byte sha256 digest + raw bytes,
+#    over several connections -> CHUNK_ACK {hash}
+# 3. UPLOAD_COMMIT {uploadId} -> JOB_ACK, or UPLOAD_HAVE if chunks are missing
+#    (the Queen then streams each Lead its block as BLOCK_PART frames)
+CHUNK_SIZE = 4 * 1024 * 1024
+STREAMS = 4
+MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+MAX_RETRIES = 5
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MAX_MESSAGE_BYTES = MAX_CHUNK_SIZE + 1024
+
+def chunk_manifest(view, chunk_size=CHUNK_SIZE):
+    """
+    Splits a buffer into fixed-size chunks; returns [(offset, length, sha256 hex)].
+    The export layout is deterministic for a given architecture, so a
+    lightly modified model only changes the chunks its edits fall into.
+    """
+    manifest = []
+    for offset in range(0, len(view), chunk_size):
+        length = min(chunk_size, len(view) - offset)
+        digest = hashlib.sha256(view[offset:offset + length]).hexdigest()
+        manifest.append((offset, length, digest))
+    return manifest
+
+class ChunkedUploader:
+    """
+    Content-addressed, parallel, resumable upload of an exported model file.
+    Only chunks the Queen does not already hold are sent, so an interrupted
+    upload resumes and a resubmit skips unchanged chunks.
+    """
+    def __init__(self, uri, path, job_name=None, chunk_size=CHUNK_SIZE,
+                 streams=STREAMS, max_inflight_bytes=MAX_INFLIGHT_BYTES, transport=None):
+        self.uri = uri
+        self.path = path
+        self.job_name = job_name or os.path.basename(path)
+        self.transport = transport # per-job pulse transport spec, forwarded to the bees
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be between 1 byte and {MAX_CHUNK_SIZE // (1024 * 1024)} MB")
+        self.chunk_size = chunk_size
+        self.streams = streams
+        self.budget = ByteBudget(max_inflight_bytes)
+
+        self.sent_bytes = 0
+        self.skipped_bytes = 0
+
+    async def _connect(self):
+        return await websockets.connect(self.uri, max_size=MAX_MESSAGE_BYTES, compression=None)
+
+    async def _stream_worker(self, queue, view):
+        ws = None
+        try:
+            while True:
+                try:
+                    offset, length, digest = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                reserved = await self.budget.acquire(length)
+                try:
+                    for attempt in range(MAX_RETRIES):
+                        try:
+                            if ws is None:
+                                ws = await self._connect()
+                            await ws.send([bytes.fromhex(digest), view[offset:offset + length]])
+                            ack = json.loads(await ws.recv())
+                            if ack.get('type') != 'CHUNK_ACK' or ack.get('hash') != digest:
+                                raise RuntimeError(f"Chunk {digest[:8]} rejected: {ack}")
+                            self.sent_bytes += length
+                            break
+                        except (OSError, websockets.exceptions.WebSocketException) as e:
+                            if ws is not None:
+                                await ws.close()
+                                ws = None
+                            if attempt == MAX_RETRIES - 1:
+                                raise
+                            delay = min(5.0, 0.2 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                            print(f"[CLI] Stream error ({e}); retrying chunk {digest[:8]} in {delay:.1f}s")
+                            await asyncio.sleep(delay)
+                finally:
+                    await self.budget.release(reserved)
+        finally:
+            if ws is not None:
+                await ws.close()
+
+    async def _send_missing(self, manifest, have, view):
+        queue = asyncio.Queue()
+        seen = set(have)
+        for offset, length, digest in manifest:
+            if digest in seen:
+                continue
+            # Identical chunks inside one file are sent once
+            seen.add(digest)
+            queue.put_nowait((offset, length, digest))
+
+        workers = [asyncio.create_task(self._stream_worker(queue, view)) for _ in range(self.streams)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+
+    async def upload(self):
+        """Returns the JOB_ACK plus upload statistics."""
+        start = time.perf_counter()
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+            view = memoryview(mm) if mm else memoryview(b"")
+            try:
+                manifest = chunk_manifest(view, self.chunk_size)
+                chunks = [digest for _, _, digest in manifest]
+
+                async with await self._connect() as control:
+                    await control.send(json.dumps({
+                        "type": "UPLOAD_INIT",
+                        "jobName": self.job_name,
+                        "fileSize": size,
+                        "chunkSize": self.chunk_size,
+                        "chunks": chunks,
+                        "transport": self.transport
+                    }))
+                    reply = json.loads(await control.recv())
+                    if reply.get('type') == 'UPLOAD_HAVE':
+                        have = set(reply['have'])
+                        self.skipped_bytes = sum(length for _, length, digest in manifest if digest in have)
+
+                    for _ in range(MAX_RETRIES):
+                        if reply.get('type') != 'UPLOAD_HAVE':
+                            break
+                        upload_id = reply['uploadId']
+                        await self._send_missing(manifest, reply['have'], view)
+                        await control.send(json.dumps({"type": "UPLOAD_COMMIT", "uploadId": upload_id}))
+                        reply = json.loads(await control.recv())
+            finally:
+                view.release()
+                if mm:
+                    mm.close()
+
+        elapsed = time.perf_counter() - start
+        return {
+            "ack": reply,
+            "fileSize": size,
+            "sentBytes": self.sent_bytes,
+            "skippedBytes": self.skipped_bytes,
+            "seconds": elapsed,
+            "throughputMBs": self.sent_bytes / (1024 * 1024) / elapsed if elapsed else 0.0
+        }
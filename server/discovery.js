@@ -4,8 +4,8 @@ import path from 'path';
 import { fileURLToPath } from 'url';
 import dgram from 'dgram';
 import { WebSocketServer } from 'ws';
-import { networkInterfaces } from 'os';
-import { randomUUID } from 'crypto';
+import { networkInterfaces, tmpdir } from 'os';
+import { randomUUID, createHash } from 'crypto';
 import { GlobalDivider } from './sharding.js';
 
 const __dirname = path.dirname(fileURLToPath(import.meta.url));
@@ -15,6 +15,20 @@ const HIVE_PORT = 41234;
 const DASHBOARD_PORT = 3000;
 const BEACON_INTERVAL_MS = 2000;
 const HIVE_VERSION = "0.1.0-alpha";
+const RAFT_HEARTBEAT_MS = 100;
+const SNAPSHOT_EVERY_HEARTBEATS = 300; // Full grid to every Prince every ~30s
+const LOG_RETAIN = 1024; // Membership deltas kept for Prince catch-up
+const SNAPSHOT_CATCHUP_ENTRIES = 100; // Beyond this many deltas a snapshot is cheaper
+const PRINCE_MIN_GFLOPS = 50; // Measured fp32 matmul (worker/capability.py) a Prince needs
+const ROW_SPEED_RATIO = 2; // Bees within 2x of a row's measured speed share that systolic row
+// Chunked uploads: chunks live on disk, never all in memory at once
+const CHUNK_DIR = process.env.GRIDBEE_CHUNK_DIR || path.join(tmpdir(), 'gridbee-chunks');
+const UPLOAD_TTL_MS = 30 * 60 * 1000; // An upload with no INIT/chunk/COMMIT for this long is dropped
+const CHUNK_TTL_MS = 24 * 60 * 60 * 1000; // Unreferenced chunks kept this long, so a resubmit skips them
+const CHUNK_STORE_MAX_BYTES = 16 * 1024 ** 3; // Beyond this the oldest unreferenced chunks go early
+const UPLOAD_SWEEP_MS = 60 * 1000;
+const BLOCK_PART_BYTES = 4 * 1024 * 1024; // A Lead's block is streamed in parts this large
+const JOBS_RETAIN = 64; // Finished or abandoned jobs kept for STATUS_REQUEST
 
 /**
  * DiscoveryBeacon: Broadcasts Queen's presence via UDP
@@ -70,8 +84,27 @@ class HiveMind {
         this.observers = new Set(); // Dashboard Clients
 
         this.currentTerm = 1;
+
+        // Raft Log: membership deltas. The live grid is always the snapshot
+        // at lastLogIndex(); entries up to snapshotIndex have been dropped.
+        this.log = []; // [{index, term, op, beeId, i, j, ...}]
+        this.snapshotIndex = 0;
+        this.snapshotTerm = 0;
+        this.nextIndex = new Map(); // princeId -> next log index to send
+        this.heartbeats = 0;
         this.wss = new WebSocketServer({ port: HIVE_PORT });
 
+        // Chunked Uploads (content-addressed, spilled to CHUNK_DIR)
+        this.chunks = new Map(); // sha256 hex -> { size, touchedAt, pins }
+        this.chunkBytes = 0;
+        this.uploads = new Map(); // uploadId -> { init: UPLOAD_INIT message, touchedAt }
+        this.wanted = new Map(); // sha256 hex -> Set of uploadIds still waiting for it
+        this.loadChunkStore();
+        setInterval(() => this.sweepUploads(), UPLOAD_SWEEP_MS);
+
+        // Jobs: per-block progress as the Leads report their cells' signatures
+        this.jobs = new Map(); // jobId -> { name, startedAt, blocks: Map blockId -> { lead, state, signers, ... } }
+
         this.setupWebSocket();
         this.startHeartbeat();
         this.startDashboardServer();
@@ -110,16 +143,78 @@ class HiveMind {
     startHeartbeat() {
         // High-Frequency Raft Heartbeat (AppendEntries) to Princes
         setInterval(() => {
-            this.broadcastToPrinces({
-                type: 'APPEND_ENTRIES',
-                term: this.currentTerm,
-                leaderId: 'QUEEN', // The Node.js Queen is always the original leader
-                hiveState: {
-                    grid: this.grid,
-                    beeCount: this.bees.size
+            this.heartbeats++;
+            const periodicSnapshot = this.heartbeats % SNAPSHOT_EVERY_HEARTBEATS === 0;
+            for (const princeId of this.princes) {
+                const prince = this.bees.get(princeId);
+                if (prince && prince.ws.readyState === 1) { // OPEN
+                    prince.ws.send(JSON.stringify(this.appendEntriesFor(princeId, periodicSnapshot)));
                 }
-            });
-        }, 100); // 100ms heartbeat
+            }
+        }, RAFT_HEARTBEAT_MS);
+    }
+
+    lastLogIndex() {
+        return this.snapshotIndex + this.log.length;
+    }
+
+    termAt(index) {
+        if (index === this.snapshotIndex) return this.snapshotTerm;
+        return this.log[index - this.snapshotIndex - 1].term;
+    }
+
+    appendLog(entry) {
+        // The Node.js Queen is the source of truth: entries commit on append
+        this.log.push({ index: this.lastLogIndex() + 1, term: this.currentTerm, ...entry });
+        if (this.log.length > LOG_RETAIN) {
+            const dropped = this.log.splice(0, this.log.length - LOG_RETAIN);
+            this.snapshotIndex = dropped[dropped.length - 1].index;
+            this.snapshotTerm = dropped[dropped.length - 1].term;
+        }
+    }
+
+    hiveSnapshot() {
+        const bees = {};
+        for (const [id, bee] of this.bees.entries()) {
+            bees[id] = { i: bee.coords.i, j: bee.coords.j, role: bee.role, ip: bee.ip, p2pPort: bee.p2pPort };
+        }
+        return { grid: this.grid, beeCount: this.bees.size, bees };
+    }
+
+    appendEntriesFor(princeId, forceSnapshot = false) {
+        const last = this.lastLogIndex();
+        const message = {
+            type: 'APPEND_ENTRIES',
+            term: this.currentTerm,
+            leaderId: 'QUEEN', // The Node.js Queen is always the original leader
+            leaderCommit: last
+        };
+
+        // Unknown Prince: probe at the log head. A restarted Prince that
+        // recovered its log from disk catches up with deltas only.
+        const next = this.nextIndex.get(princeId) ?? last + 1;
+        if (forceSnapshot || next <= this.snapshotIndex || last + 1 - next > SNAPSHOT_CATCHUP_ENTRIES) {
+            // Fresh Prince, or too far behind: send the full grid once
+            this.nextIndex.set(princeId, last + 1);
+            return { ...message, prevLogIndex: last, prevLogTerm: this.termAt(last), entries: [], hiveState: this.hiveSnapshot() };
+        }
+
+        const prev = Math.min(next, last + 1) - 1;
+        return {
+            ...message,
+            prevLogIndex: prev,
+            prevLogTerm: this.termAt(prev),
+            entries: this.log.slice(prev - this.snapshotIndex)
+        };
+    }
+
+    handleAppendAck(data) {
+        if (!this.princes.has(data.beeId)) return;
+        // matchIndex is the Prince's last log index: resume right after it.
+        // Far behind (or behind snapshotIndex) turns the next heartbeat into
+        // a snapshot; so does a log from before this Queen started.
+        const last = this.lastLogIndex();
+        this.nextIndex.set(data.beeId, data.matchIndex > last ? 0 : data.matchIndex + 1);
     }
 
     broadcastToPrinces(message) {
@@ -177,10 +272,12 @@ class HiveMind {
             this.bees.delete(disconnectedBeeId);
             if (this.princes.has(disconnectedBeeId)) {
                 this.princes.delete(disconnectedBeeId);
+                this.nextIndex.delete(disconnectedBeeId);
             }
 
             // Free the grid cell
             this.grid[coords.i][coords.j] = null;
+            this.appendLog({ op: 'LEAVE', beeId: disconnectedBeeId, i: coords.i, j: coords.j });
 
             // Broadcast NODE_REMOVED to Frontend
             const payload = JSON.stringify({
@@ -200,8 +297,12 @@ class HiveMind {
             const ip = req.socket.remoteAddress;
             // console.log(`[HIVE] New connection request from ${ip}`);
 
-            ws.on('message', (message) => {
+            ws.on('message', (message, isBinary) => {
                 try {
+                    if (isBinary) {
+                        this.handleChunk(ws, message).catch((e) => console.error('[JOB] Could not store chunk:', e.message));
+                        return;
+                    }
                     const data = JSON.parse(message);
                     this.handleMessage(ws, data);
                 } catch (e) {
@@ -228,23 +329,362 @@ class HiveMind {
             // Handle heartbeat updates (Spike Protocol)
             if (this.bees.has(data.beeId)) {
                 const bee = this.bees.get(data.beeId);
-                bee.pmi = this.calculatePMI(data.metrics);
+                bee.pmi = this.calculatePMI(data.metrics, bee.capability);
+                // Hot-path histograms (worker/telemetry.py), kept for STATUS_REQUEST
+                if (data.telemetry) {
+                    bee.telemetry = data.telemetry;
+                    bee.telemetryAt = Date.now();
+                }
                 // Maybe trigger broadcast if significant change?
             }
+        } else if (data.type === 'APPEND_ACK') {
+            this.handleAppendAck(data);
         } else if (data.type === 'JOB_SUBMISSION') {
             this.handleJobSubmission(ws, data);
+        } else if (data.type === 'UPLOAD_INIT') {
+            this.handleUploadInit(ws, data);
+        } else if (data.type === 'UPLOAD_COMMIT') {
+            this.handleUploadCommit(ws, data).catch((e) => console.error('[JOB] Upload commit failed:', e.message));
+        } else if (data.type === 'RESULT_SIGNATURE') {
+            this.handleResultSignature(data);
+        } else if (data.type === 'CELL_RESULT') {
+            this.handleCellResult(data);
+        } else if (data.type === 'CELL_TIMEOUT') {
+            this.handleCellTimeout(data);
+        } else if (data.type === 'SHARD_FAILED') {
+            this.handleShardFailed(data);
+        } else if (data.type === 'SHARD_MISS') {
+            this.handleShardMiss(data);
+        } else if (data.type === 'STATUS_REQUEST') {
+            this.handleStatusRequest(ws);
         } else if (data.type === 'OBSERVER') {
             this.observers.add(ws);
             this.broadcastState();
         }
     }
 
-    handleJobSubmission(ws, data) {
+    handleStatusRequest(ws) {
+        // Per-bee telemetry as last reported; the CLI merges the histograms
+        const now = Date.now();
+        ws.send(JSON.stringify({
+            type: 'STATUS',
+            beeCount: this.bees.size,
+            princes: this.princes.size,
+            bees: Array.from(this.bees.entries()).map(([id, bee]) => ({
+                id,
+                coords: bee.coords,
+                role: bee.role,
+                pmi: bee.pmi,
+                capability: bee.capability || null,
+                telemetry: bee.telemetry || null,
+                telemetryAgeSec: bee.telemetryAt ? (now - bee.telemetryAt) / 1000 : null,
+                failedShards: bee.failedShards || 0
+            })),
+            jobs: Array.from(this.jobs.entries()).map(([id, job]) => ({
+                id,
+                name: job.name,
+                ageSec: (now - job.startedAt) / 1000,
+                blocks: Array.from(job.blocks.entries()).map(([blockId, block]) => ({
+                    blockId,
+                    lead: block.lead,
+                    state: block.state,
+                    signers: block.signers.size,
+                    missing: block.missing || []
+                }))
+            }))
+        }));
+    }
+
+    trackBlock(jobId, blockId, lead) {
+        const job = this.jobs.get(jobId);
+        if (job) job.blocks.set(blockId, { lead, state: 'ASSIGNED', signers: new Set() });
+    }
+
+    jobBlock(data) {
+        // Reports for jobs we never issued, or have since dropped, are ignored
+        return this.jobs.get(data.jobId)?.blocks.get(data.blockId);
+    }
+
+    handleResultSignature(data) {
+        // A worker's copy of what it signed for its Lead: proof it holds its shards
+        const block = this.jobBlock(data);
+        if (block) block.signers.add(data.beeId);
+    }
+
+    handleCellResult(data) {
+        // The Lead's cell reached its quorum of verified signatures
+        const block = this.jobBlock(data);
+        if (!block) return;
+        block.state = 'DONE';
+        block.root = data.root;
+        console.log(`[JOB] Block ${data.blockId} of ${data.jobId} verified by ${data.signers.length}/${data.cellSize} bees (quorum ${data.quorum}), root ${String(data.root).slice(0, 8)}...`);
+        const job = this.jobs.get(data.jobId);
+        if (Array.from(job.blocks.values()).every((b) => b.state === 'DONE')) {
+            console.log(`[JOB] Job "${job.name}" (${data.jobId}) complete in ${((Date.now() - job.startedAt) / 1000).toFixed(1)}s`);
+        }
+    }
+
+    handleShardFailed(data) {
+        // A bee gave up on a Cannon run (neighbour blocks never came) and
+        // freed its engine for the next assignment; the task needs a new run
+        const bee = this.bees.get(data.beeId);
+        if (bee) bee.failedShards = (bee.failedShards || 0) + 1;
+        console.warn(`[SHARD] ${data.beeId} abandoned task ${data.taskId} of ${data.jobId} (step ${data.step}): ${data.reason}`);
+    }
+
+    handleShardMiss(data) {
+        // A hash-only Cannon operand (worker/systolic.py pack_shard) the bee no
+        // longer holds. The Queen only streams whole blocks, so there is
+        // nothing to resend here; benchmarks/sim_torus.py resends in full.
+        console.warn(`[SHARD] ${data.beeId} no longer holds block ${String(data.hash).slice(0, 8)} (task ${data.taskId} of ${data.jobId}, step ${data.step})`);
+    }
+
+    handleCellTimeout(data) {
+        // Quorum missed: the Lead marked the missing bees' cells FAILED
+        const block = this.jobBlock(data);
+        if (!block) return;
+        block.state = 'DEGRADED';
+        block.missing = data.missing;
+        console.warn(`[JOB] Block ${data.blockId} of ${data.jobId} missed its quorum: no signature from ${data.missing.join(', ')} (${data.cells.length} cells)`);
+    }
+
+    chunkPath(hash) {
+        return path.join(CHUNK_DIR, hash);
+    }
+
+    loadChunkStore() {
+        // Chunks from before a restart still count, so an interrupted upload resumes
+        fs.mkdirSync(CHUNK_DIR, { recursive: true });
+        const now = Date.now();
+        for (const name of fs.readdirSync(CHUNK_DIR)) {
+            const file = path.join(CHUNK_DIR, name);
+            if (!/^[0-9a-f]{64}$/.test(name)) {
+                fs.rmSync(file, { force: true }); // Half-written .part file
+                continue;
+            }
+            const { size } = fs.statSync(file);
+            this.chunks.set(name, { size, touchedAt: now, pins: 0 });
+            this.chunkBytes += size;
+        }
+        if (this.chunks.size) {
+            console.log(`[JOB] Chunk store ${CHUNK_DIR}: ${this.chunks.size} chunks (${(this.chunkBytes / 1024 ** 2).toFixed(1)} MB)`);
+        }
+    }
+
+    chunksHeld(hashes) {
+        return [...new Set(hashes)].filter((hash) => this.chunks.has(hash));
+    }
+
+    handleUploadInit(ws, data) {
+        const uploadId = randomUUID();
+        const now = Date.now();
+        this.uploads.set(uploadId, { init: data, touchedAt: now });
+        for (const hash of new Set(data.chunks)) {
+            const chunk = this.chunks.get(hash);
+            if (chunk) {
+                chunk.touchedAt = now;
+                continue;
+            }
+            if (!this.wanted.has(hash)) this.wanted.set(hash, new Set());
+            this.wanted.get(hash).add(uploadId);
+        }
+        const have = this.chunksHeld(data.chunks);
+        console.log(`[JOB] Upload "${data.jobName}": ${data.chunks.length} chunks, ${have.length} already held`);
+        ws.send(JSON.stringify({ type: 'UPLOAD_HAVE', uploadId, have }));
+    }
+
+    async handleChunk(ws, message) {
+        // 32-byte sha256 digest followed by the chunk bytes
+        const hash = message.subarray(0, 32).toString('hex');
+        const data = message.subarray(32);
+        if (createHash('sha256').update(data).digest('hex') !== hash) {
+            ws.send(JSON.stringify({ type: 'CHUNK_NACK', hash, reason: 'hash mismatch' }));
+            return;
+        }
+        if (!this.chunks.has(hash)) {
+            // Written aside and renamed: a crash never leaves a short chunk under its hash
+            const file = this.chunkPath(hash);
+            const part = `${file}.${randomUUID()}.part`;
+            await fs.promises.writeFile(part, data);
+            await fs.promises.rename(part, file);
+            if (!this.chunks.has(hash)) { // Another stream may have stored it meanwhile
+                this.chunks.set(hash, { size: data.length, touchedAt: Date.now(), pins: 0 });
+                this.chunkBytes += data.length;
+            }
+        }
+        const now = Date.now();
+        this.chunks.get(hash).touchedAt = now;
+        // A chunk arriving keeps the uploads waiting for it alive
+        for (const uploadId of this.wanted.get(hash) || []) {
+            const upload = this.uploads.get(uploadId);
+            if (upload) upload.touchedAt = now;
+        }
+        this.wanted.delete(hash);
+        ws.send(JSON.stringify({ type: 'CHUNK_ACK', hash }));
+        if (this.chunkBytes > CHUNK_STORE_MAX_BYTES) this.evictChunks(now);
+    }
+
+    forgetUpload(uploadId) {
+        const upload = this.uploads.get(uploadId);
+        if (!upload) return;
+        this.uploads.delete(uploadId);
+        for (const hash of upload.init.chunks) {
+            const waiting = this.wanted.get(hash);
+            if (waiting) {
+                waiting.delete(uploadId);
+                if (!waiting.size) this.wanted.delete(hash);
+            }
+        }
+    }
+
+    sweepUploads() {
+        const now = Date.now();
+        for (const [uploadId, upload] of this.uploads.entries()) {
+            if (now - upload.touchedAt > UPLOAD_TTL_MS) {
+                console.log(`[JOB] Upload "${upload.init.jobName}" abandoned; expiring ${uploadId}`);
+                this.forgetUpload(uploadId);
+            }
+        }
+        this.evictChunks(now);
+    }
+
+    evictChunks(now = Date.now()) {
+        // Oldest first. A chunk a live upload lists, or a block being
+        // streamed from it, always stays.
+        const live = new Set();
+        for (const { init } of this.uploads.values()) {
+            for (const hash of init.chunks) live.add(hash);
+        }
+        const byAge = [...this.chunks.entries()].sort((a, b) => a[1].touchedAt - b[1].touchedAt);
+        for (const [hash, chunk] of byAge) {
+            if (now - chunk.touchedAt <= CHUNK_TTL_MS && this.chunkBytes <= CHUNK_STORE_MAX_BYTES) break;
+            if (chunk.pins || live.has(hash)) continue;
+            this.chunks.delete(hash);
+            this.chunkBytes -= chunk.size;
+            fs.promises.rm(this.chunkPath(hash), { force: true }).catch(() => {});
+        }
+    }
+
+    async handleUploadCommit(ws, data) {
+        const upload = this.uploads.get(data.uploadId);
+        if (!upload) {
+            ws.send(JSON.stringify({ type: 'UPLOAD_ERROR', reason: 'unknown uploadId' }));
+            return;
+        }
+        const { init } = upload;
+        upload.touchedAt = Date.now();
+        if (init.chunks.some((hash) => !this.chunks.has(hash))) {
+            ws.send(JSON.stringify({ type: 'UPLOAD_HAVE', uploadId: data.uploadId, have: this.chunksHeld(init.chunks) }));
+            return;
+        }
+        // Pinned until every Lead has its block, so eviction can't pull them away mid-stream
+        const chunks = init.chunks.map((hash) => this.chunks.get(hash));
+        chunks.forEach((chunk) => chunk.pins++);
+        this.forgetUpload(data.uploadId);
+        try {
+            await this.streamJob(ws, {
+                jobName: init.jobName,
+                fileSize: chunks.reduce((total, chunk) => total + chunk.size, 0),
+                chunks: init.chunks,
+                transport: init.transport
+            });
+        } finally {
+            chunks.forEach((chunk) => chunk.pins--);
+        }
+    }
+
+    announceJob(data) {
         const jobId = randomUUID();
         const sizeMB = data.fileSize / (1024 * 1024);
+        this.jobs.set(jobId, { name: data.jobName, startedAt: Date.now(), blocks: new Map() });
+        while (this.jobs.size > JOBS_RETAIN) this.jobs.delete(this.jobs.keys().next().value);
 
         console.log(`[JOB] Received Model "${data.jobName}" (Size: ${sizeMB.toFixed(2)} MB)`);
         console.log(`[JOB] Job ID Assigned: ${jobId}`);
+        if (data.transport) {
+            console.log(`[JOB] Transport: ${data.transport.mode} + ${data.transport.lossless} (level ${data.transport.level})`);
+        }
+        return jobId;
+    }
+
+    async streamJob(ws, job) {
+        // A committed upload is never joined into one buffer or base64
+        // string: each Lead gets its byte range as BLOCK_PART frames read
+        // from the chunk files, one part in memory per Lead at a time.
+        const jobId = this.announceJob(job);
+        ws.send(JSON.stringify({ type: 'JOB_ACK', jobId, status: 'RECEIVED' }));
+
+        const leads = Array.from(this.princes);
+        const numBlocks = leads.length || 1;
+        const blockSize = Math.ceil(job.fileSize / numBlocks);
+        console.log(`[SHARD] Streaming job in ${numBlocks} blocks of up to ${(blockSize / 1024 ** 2).toFixed(1)} MB...`);
+        await Promise.all(leads.map(async (beeId, index) => {
+            const bee = this.bees.get(beeId);
+            if (!bee || bee.ws.readyState !== 1) return;
+            const start = Math.min(index * blockSize, job.fileSize);
+            const end = Math.min(start + blockSize, job.fileSize);
+            const header = {
+                type: 'BLOCK_PART',
+                jobId,
+                blockId: index,
+                totalBlocks: numBlocks,
+                size: end - start,
+                // Per-job tensor transport (codec.py), null for raw
+                transport: job.transport || null
+            };
+            this.trackBlock(jobId, index, beeId);
+            try {
+                await this.streamBlock(bee.ws, header, start, end, job.chunks);
+                console.log(`[SHARD] Streamed Block ${index} (${end - start} bytes) to Lead ${beeId}`);
+            } catch (e) {
+                console.error(`[SHARD] Block ${index} to Lead ${beeId} failed: ${e.message}`);
+            }
+        }));
+    }
+
+    async streamBlock(ws, header, start, end, hashes) {
+        if (start >= end) {
+            await this.sendFrame(ws, { ...header, offset: 0 }, Buffer.alloc(0));
+            return;
+        }
+        let chunkStart = 0;
+        for (const hash of hashes) {
+            const chunkEnd = chunkStart + this.chunks.get(hash).size;
+            const from = Math.max(start, chunkStart);
+            const to = Math.min(end, chunkEnd);
+            if (from < to) {
+                const file = await fs.promises.open(this.chunkPath(hash), 'r');
+                try {
+                    for (let pos = from; pos < to; pos += BLOCK_PART_BYTES) {
+                        const body = Buffer.allocUnsafe(Math.min(BLOCK_PART_BYTES, to - pos));
+                        const { bytesRead } = await file.read(body, 0, body.length, pos - chunkStart);
+                        if (bytesRead !== body.length) throw new Error(`chunk ${hash.slice(0, 8)} is short on disk`);
+                        await this.sendFrame(ws, { ...header, offset: pos - start }, body);
+                    }
+                } finally {
+                    await file.close();
+                }
+            }
+            chunkStart = chunkEnd;
+            if (chunkStart >= end) break;
+        }
+    }
+
+    sendFrame(ws, header, body) {
+        // GBS1 frame (worker/mesh.py encode_shard): magic, header length, JSON header, bytes.
+        // Resolves once the frame is handed to the socket, which paces the reads.
+        const meta = Buffer.from(JSON.stringify(header));
+        const prefix = Buffer.alloc(8);
+        prefix.write('GBS1', 0, 'latin1');
+        prefix.writeUInt32LE(meta.length, 4);
+        return new Promise((resolve, reject) => {
+            ws.send(Buffer.concat([prefix, meta, body]), { binary: true }, (err) => (err ? reject(err) : resolve()));
+        });
+    }
+
+    handleJobSubmission(ws, data) {
+        // Single-message submissions (base64 in JSON); chunked uploads stream instead
+        const jobId = this.announceJob(data);
 
         // 1. Identify Lead Bees (For now, use all Princes as Leads)
         // In real logic, we'd select top N Princes.
@@ -264,9 +704,12 @@ class HiveMind {
                     jobId: jobId,
                     blockId: index,
                     totalBlocks: numBlocks,
-                    data: blocks[index]
+                    data: blocks[index],
+                    // Per-job tensor transport (codec.py), null for raw
+                    transport: data.transport || null
                 };
                 bee.ws.send(JSON.stringify(assignment));
+                this.trackBlock(jobId, index, beeId);
                 console.log(`[SHARD] Assigned Block ${index} to Lead ${beeId}`);
             }
         });
@@ -279,28 +722,61 @@ class HiveMind {
         ws.send(JSON.stringify(ack));
     }
 
-    calculatePMI(metrics) {
+    static measuredGflops(capability) {
+        return capability?.matmulGflops?.float32 || 0;
+    }
+
+    calculatePMI(metrics, capability) {
         const vramScore = (metrics.vramFree || 0) * 0.01;
         const cpuScore = (metrics.cpuIdle || 0);
         const jitterPenalty = (metrics.jitter || 0) * 0.5;
+        // Measured speed, log-scaled so one GPU doesn't drown out the other terms
+        const gflops = HiveMind.measuredGflops(capability);
+        const computeScore = gflops ? 10 * Math.log2(1 + gflops / 10) : 0;
 
-        return (vramScore * 0.7) + (cpuScore * 0.3) - jitterPenalty;
+        return (vramScore * 0.7) + (cpuScore * 0.3) + computeScore - jitterPenalty;
     }
 
-    findEmptySlot() {
+    findEmptySlot(gflops = 0) {
+        // A systolic row moves at the pace of its slowest bee. A measured bee
+        // joins the first row within ROW_SPEED_RATIO of its speed, else an
+        // empty row, else the row closest in speed. Unmeasured: first free cell.
+        let emptyRow = null;
+        let closest = null;
+        let closestGap = Infinity;
         for (let i = 0; i < 10; i++) {
-            for (let j = 0; j < 10; j++) {
-                if (this.grid[i][j] === null) {
-                    return { i, j };
+            const j = this.grid[i].indexOf(null);
+            if (j < 0) continue;
+            if (!gflops) return { i, j };
+
+            const speeds = this.grid[i]
+                .filter((id) => id !== null)
+                .map((id) => this.bees.get(id)?.gflops || 0)
+                .filter((speed) => speed > 0);
+            if (!speeds.length) {
+                // Empty row, or only unmeasured bees: no speed to match
+                if (this.grid[i].every((id) => id === null)) {
+                    emptyRow = emptyRow || { i, j };
+                    continue;
                 }
+                return { i, j };
+            }
+            const rowSpeed = Math.exp(speeds.reduce((sum, speed) => sum + Math.log(speed), 0) / speeds.length);
+            const gap = Math.abs(Math.log2(gflops / rowSpeed));
+            if (gap <= Math.log2(ROW_SPEED_RATIO)) return { i, j };
+            if (gap < closestGap) {
+                closest = { i, j };
+                closestGap = gap;
             }
         }
-        return null;
+        return emptyRow || closest;
     }
 
     registerBee(ws, data) {
-        const pmi = this.calculatePMI(data.metrics);
-        const coords = this.findEmptySlot();
+        const capability = data.metrics.capability || null;
+        const gflops = HiveMind.measuredGflops(capability);
+        const pmi = this.calculatePMI(data.metrics, capability);
+        const coords = this.findEmptySlot(gflops);
         const p2pPort = data.p2pPort || 0;
 
         if (!coords) {
@@ -309,19 +785,22 @@ class HiveMind {
             return;
         }
 
-        const role = pmi > 20 ? 'PRINCE' : 'WORKER';
+        // Bees from before the capability probe are judged on PMI alone
+        const role = pmi > 20 && (!capability || gflops >= PRINCE_MIN_GFLOPS) ? 'PRINCE' : 'WORKER';
 
         // Update State
-        const beeInfo = { ws, coords, pmi, role, p2pPort, ip: ws._socket.remoteAddress };
+        const beeInfo = { ws, coords, pmi, role, p2pPort, ip: ws._socket.remoteAddress, capability, gflops };
         this.grid[coords.i][coords.j] = data.beeId;
         this.bees.set(data.beeId, beeInfo);
+        this.appendLog({ op: 'JOIN', beeId: data.beeId, i: coords.i, j: coords.j, role, ip: beeInfo.ip, p2pPort });
 
         if (role === 'PRINCE') {
             this.princes.add(data.beeId);
             console.log(`[HA] New Prince Designated: ${data.beeId}`);
         }
 
-        console.log(`[DISCOVERY] Bee Joined Hive at (${coords.i}, ${coords.j}) with PMI: ${pmi.toFixed(2)} (${role})`);
+        const speed = capability ? `, ${gflops.toFixed(0)} GFLOPS${capability.cached ? '' : ' (fresh probe)'}` : '';
+        console.log(`[DISCOVERY] Bee Joined Hive at (${coords.i}, ${coords.j}) with PMI: ${pmi.toFixed(2)}${speed} (${role})`);
 
         // Send Ack
         const response = {
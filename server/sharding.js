@@ -2,7 +2,8 @@ export class GlobalDivider {
     static divide(base64Data, numBlocks) {
         if (numBlocks < 1) numBlocks = 1;
 
-        const blockSize = Math.ceil(base64Data.length / numBlocks);
+        // Whole 4-char base64 groups, so every Lead can decode its block alone
+        const blockSize = Math.ceil(base64Data.length / numBlocks / 4) * 4;
         const blocks = [];
 
         for (let i = 0; i < numBlocks; i++) {
@@ -0,0 +1,24 @@
+import asyncio
+
+class ByteBudget:
+    """
+    Bounds the bytes in flight: the SDK's upload streams, a Lead's shard
+    dispatch to its workers. A request larger than the whole budget is
+    capped to it, so it waits for everything else instead of forever.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self, size):
+        size = min(size, self.limit)
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+        return size
+
+    async def release(self, size):
+        async with self.condition:
+            self.used -= size
+            self.condition.notify_all()
@@ -0,0 +1,226 @@
+import struct
+import time
+import zlib
+
+import numpy as np
+import torch
+
+try:
+    import zstandard
+except ImportError: # Optional; zlib is always available
+    zstandard = None
+
+# Lossy tensor transport for residential uplinks
+# (one module, imported as shared.codec by the bees and the SDK alike)
+#   mode:     none | fp16 | bf16 | int8 (blockwise, one fp32 scale per block)
+#   lossless: none | zlib | zstd, applied after the lossy step
+# An encoded tensor is self-describing:
+#   mode | lossless | dtype | ndim | block | shape... | body
+MODES = ["none", "fp16", "bf16", "int8"]
+LOSSLESS = ["none", "zlib", "zstd"]
+BLOB_HEADER = struct.Struct("<BBBBI")
+DTYPES = [
+    torch.float32, torch.float16, torch.bfloat16, torch.float64,
+    torch.int8, torch.uint8, torch.int32, torch.int64
+]
+DTYPE_CODES = {dtype: code for code, dtype in enumerate(DTYPES)}
+CAST = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
+INT8_BLOCK = 256
+DEFAULT_LEVEL = 1
+
+def _shuffle(raw, itemsize):
+    """Byte planes of a float array: exponent bytes line up and compress far better."""
+    if itemsize == 1:
+        return raw
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+def _unshuffle(raw, itemsize):
+    if itemsize == 1:
+        return raw
+    return np.frombuffer(raw, dtype=np.uint8).reshape(itemsize, -1).T.tobytes()
+
+def _compress(lossless, level, raw):
+    if lossless == "zlib":
+        return zlib.compress(raw, level)
+    return zstandard.ZstdCompressor(level=level).compress(raw)
+
+def _decompress(lossless, raw):
+    if lossless == "zlib":
+        return zlib.decompress(raw)
+    if zstandard is None:
+        raise RuntimeError("zstd-compressed tensor received but the zstandard module is not installed")
+    return zstandard.ZstdDecompressor().decompress(raw)
+
+def _tensor_bytes(tensor):
+    return tensor.reshape(-1).view(torch.uint8).numpy().tobytes()
+
+class EncodedTensor:
+    """A tensor in wire form. Decodes lazily, on receipt, right before the matmul."""
+    __slots__ = ("blob",)
+
+    def __init__(self, blob):
+        self.blob = blob
+
+    @property
+    def nbytes(self):
+        return len(self.blob)
+
+    def decode(self, device='cpu'):
+        return decode(self.blob).to(device)
+
+def decode(blob):
+    view = memoryview(blob)
+    mode_code, lossless_code, dtype_code, ndim, block = BLOB_HEADER.unpack_from(view)
+    offset = BLOB_HEADER.size
+    shape = struct.unpack_from(f"<{ndim}Q", view, offset)
+    offset += 8 * ndim
+    mode, lossless, dtype = MODES[mode_code], LOSSLESS[lossless_code], DTYPES[dtype_code]
+
+    body = view[offset:]
+    if lossless != "none" and len(body):
+        body = _decompress(lossless, body)
+    numel = int(np.prod(shape, dtype=np.int64))
+    if numel == 0:
+        return torch.empty(shape, dtype=dtype)
+
+    if mode == "int8":
+        blocks = -(-numel // block)
+        scale_bytes = body[:4 * blocks]
+        if lossless != "none":
+            scale_bytes = _unshuffle(scale_bytes, 4)
+        scales = torch.frombuffer(bytearray(scale_bytes), dtype=torch.float32)
+        q = torch.zeros(blocks * block, dtype=torch.float32)
+        q[:numel] = torch.frombuffer(bytearray(body[4 * blocks:]), dtype=torch.int8).float()
+        values = (q.view(blocks, block) * scales[:, None]).reshape(-1)[:numel]
+    else:
+        wire = CAST.get(mode, dtype)
+        raw = _unshuffle(body, wire.itemsize) if lossless != "none" else body
+        values = torch.frombuffer(bytearray(raw), dtype=wire)
+    return values.to(dtype).reshape(shape)
+
+class Transport:
+    """
+    Per-job tensor transport: a lossy mode plus optional lossless compression.
+    Keeps running totals (bytes before/after, encode/decode time) for metrics.
+    """
+    def __init__(self, mode="none", lossless="none", level=DEFAULT_LEVEL, block=INT8_BLOCK):
+        if mode not in MODES:
+            raise ValueError(f"Unknown transport mode {mode!r}; expected one of {MODES}")
+        if lossless not in LOSSLESS:
+            raise ValueError(f"Unknown lossless codec {lossless!r}; expected one of {LOSSLESS}")
+        if lossless == "zstd" and zstandard is None:
+            print("[CODEC] zstandard not installed; using zlib.")
+            lossless = "zlib"
+        self.mode = mode
+        self.lossless = lossless
+        self.level = level
+        self.block = block
+
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.encode_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.tensors = 0
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Builds a Transport from a job's {"mode", "lossless", "level"} (None: send raw)."""
+        spec = spec or {}
+        return cls(
+            spec.get('mode', "none"), spec.get('lossless', "none"),
+            spec.get('level', DEFAULT_LEVEL), spec.get('block', INT8_BLOCK)
+        )
+
+    @property
+    def enabled(self):
+        return self.mode != "none" or self.lossless != "none"
+
+    def spec(self):
+        return {"mode": self.mode, "lossless": self.lossless, "level": self.level, "block": self.block}
+
+    def applies_to(self, tensor):
+        # Integer tensors (indices, counters) always travel exactly
+        return tensor.dtype in DTYPE_CODES and tensor.is_floating_point()
+
+    def encode(self, tensor):
+        start = time.perf_counter()
+        tensor = tensor.detach()
+        if tensor.device.type != 'cpu':
+            tensor = tensor.to('cpu')
+        tensor = tensor.contiguous()
+        mode = self.mode if self.applies_to(tensor) else "none"
+        shape = tuple(tensor.shape)
+
+        if tensor.numel() == 0:
+            body = b""
+        elif mode == "int8":
+            flat = tensor.reshape(-1).float()
+            blocks = -(-flat.numel() // self.block)
+            padded = torch.zeros(blocks * self.block, dtype=torch.float32)
+            padded[:flat.numel()] = flat
+            padded = padded.view(blocks, self.block)
+            scales = padded.abs().amax(dim=1) / 127.0
+            scales[scales == 0] = 1.0
+            q = torch.round(padded / scales[:, None]).clamp_(-127, 127).to(torch.int8).reshape(-1)[:flat.numel()]
+            scale_bytes = _tensor_bytes(scales)
+            if self.lossless != "none":
+                scale_bytes = _shuffle(scale_bytes, 4)
+            body = scale_bytes + _tensor_bytes(q)
+        else:
+            wire = tensor.to(CAST[mode]) if mode in CAST else tensor
+            body = _tensor_bytes(wire)
+            if self.lossless != "none":
+                body = _shuffle(body, wire.element_size())
+        if self.lossless != "none" and body:
+            body = _compress(self.lossless, self.level, body)
+
+        blob = BLOB_HEADER.pack(
+            MODES.index(mode), LOSSLESS.index(self.lossless), DTYPE_CODES[tensor.dtype], len(shape), self.block
+        ) + struct.pack(f"<{len(shape)}Q", *shape) + body
+
+        self.raw_bytes += tensor.numel() * tensor.element_size()
+        self.wire_bytes += len(blob)
+        self.encode_seconds += time.perf_counter() - start
+        self.tensors += 1
+        return EncodedTensor(blob)
+
+    def decode(self, encoded, device='cpu'):
+        start = time.perf_counter()
+        tensor = encoded.decode(device)
+        self.decode_seconds += time.perf_counter() - start
+        return tensor
+
+    def metrics(self):
+        return {
+            **self.spec(),
+            "tensors": self.tensors,
+            "rawBytes": self.raw_bytes,
+            "wireBytes": self.wire_bytes,
+            "ratio": self.raw_bytes / self.wire_bytes if self.wire_bytes else 1.0,
+            "encodeSeconds": self.encode_seconds,
+            "decodeSeconds": self.decode_seconds
+        }
+
+class ErrorFeedback:
+    """
+    Carries each stream's quantisation residual into its next send, so the
+    sum of what was sent tracks the sum of the true values and the error in
+    an accumulated result stays bounded instead of growing with every step.
+    """
+    def __init__(self):
+        self.residuals = {} # (jobId, stream) -> residual tensor
+
+    def encode(self, transport, key, tensor):
+        residual = self.residuals.get(key)
+        target = tensor.detach().float()
+        if residual is not None and residual.shape == target.shape:
+            target = target + residual.to(target.device)
+        encoded = transport.encode(target.to(tensor.dtype))
+        self.residuals[key] = (target - encoded.decode(target.device).float()).to('cpu')
+        return encoded
+
+    def reset(self, job_id=None):
+        """Forgets the residuals of one job (or all of them)."""
+        for key in [k for k in self.residuals if job_id is None or k[0] == job_id]:
+            del self.residuals[key]
@@ -0,0 +1,188 @@
+import asyncio
+import functools
+import os
+import time
+from bisect import bisect_left
+
+# Hot-path instrumentation: counters and fixed-bucket latency histograms
+# (one module, shared.telemetry, for the bees and the SDK, which merges the
+# bees' summaries for `gridbee status`)
+#
+# Buckets are fixed and shared by every bee, so histograms from different
+# bees merge exactly by adding counts: cluster-wide percentiles come from
+# the merged buckets, not from averaging per-bee percentiles.
+# GRIDBEE_TELEMETRY=0 turns everything into no-ops.
+ENABLED = os.environ.get("GRIDBEE_TELEMETRY", "1") != "0"
+
+BUCKET_MIN_SEC = 1e-6
+BUCKET_GROWTH = 2 ** 0.25 # ~19% per bucket
+BUCKET_COUNT = 108 # up to ~134s; anything slower lands in the overflow bucket
+BOUNDS = [BUCKET_MIN_SEC * BUCKET_GROWTH ** k for k in range(BUCKET_COUNT)]
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Span:
+    """Times a with-block into a histogram."""
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+class Histogram:
+    """Latency histogram (seconds) over the fixed BOUNDS; the last slot counts overflows."""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (BUCKET_COUNT + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def time(self):
+        return Span(self)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (never above the max seen)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for k, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BOUNDS[k], self.max) if k < BUCKET_COUNT else self.max
+        return self.max
+
+    def merge(self, other):
+        for k, count in enumerate(other.counts):
+            self.counts[k] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def summary(self):
+        """Compact form for heartbeats: totals, p50/p99 and the non-empty buckets as [index, count]."""
+        return {
+            "n": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p99": self.quantile(0.99),
+            "b": [[k, count] for k, count in enumerate(self.counts) if count]
+        }
+
+    @classmethod
+    def from_summary(cls, summary):
+        histogram = cls()
+        for k, count in summary.get('b', []):
+            histogram.counts[k] += count
+        histogram.count = summary.get('n', 0)
+        histogram.total = summary.get('sum', 0.0)
+        histogram.max = summary.get('max', 0.0)
+        return histogram
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class _NullInstrument:
+    """Stands in for a Counter or Histogram when telemetry is off."""
+    __slots__ = ()
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, seconds):
+        pass
+
+    def time(self):
+        return NULL_SPAN
+
+NULL_SPAN = _NullSpan()
+NULL_INSTRUMENT = _NullInstrument()
+
+class Telemetry:
+    """
+    One bee's counters and histograms, by name. Components look their
+    instruments up once, at construction, and keep the reference: the hot
+    path is then one method call, and a no-op when telemetry is off.
+    """
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+
+    def counter(self, name):
+        if not self.enabled:
+            return NULL_INSTRUMENT
+        if name not in self.counters:
+            self.counters[name] = Counter()
+        return self.counters[name]
+
+    def histogram(self, name):
+        if not self.enabled:
+            return NULL_INSTRUMENT
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        return self.histograms[name]
+
+    def span(self, name):
+        """Context manager timing a block into histogram `name`."""
+        return self.histogram(name).time()
+
+    def timed(self, name):
+        """Decorator timing every call (sync or async) into histogram `name`."""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+            histogram = self.histogram(name)
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def timed_async(*args, **kwargs):
+                    with histogram.time():
+                        return await fn(*args, **kwargs)
+                return timed_async
+
+            @functools.wraps(fn)
+            def timed_sync(*args, **kwargs):
+                with histogram.time():
+                    return fn(*args, **kwargs)
+            return timed_sync
+        return decorate
+
+    def summary(self):
+        """Everything observed since start, in heartbeat form (None when telemetry is off)."""
+        if not self.enabled:
+            return None
+        return {
+            "counters": {name: counter.value for name, counter in self.counters.items()},
+            "histograms": {name: histogram.summary() for name, histogram in self.histograms.items() if histogram.count}
+        }
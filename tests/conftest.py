@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Worker and SDK modules import each other by bare name, as they do when run from worker/ or sdk/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "worker"))
+sys.path.insert(0, os.path.join(ROOT, "sdk"))
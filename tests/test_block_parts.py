@@ -0,0 +1,32 @@
+import asyncio
+
+from bee import WorkerBee
+
+def receive(tmp_path, parts):
+    """Feeds BLOCK_PART frames to a Lead; returns the blocks it went on to shard."""
+    lead = WorkerBee("lead", raft_dir=str(tmp_path))
+    handled = []
+
+    async def handle_block_assignment(payload):
+        handled.append(bytes(payload['block']))
+
+    lead.handle_block_assignment = handle_block_assignment
+
+    async def main():
+        for offset, data in parts:
+            await lead.handle_block_part({"jobId": "job", "blockId": 0, "totalBlocks": 1, "size": 8, "offset": offset, "data": data})
+
+    asyncio.run(main())
+    return handled
+
+def test_parts_in_any_order(tmp_path):
+    assert receive(tmp_path, [(4, b"efgh"), (0, b"abcd")]) == [b"abcdefgh"]
+
+def test_duplicate_part_counts_once(tmp_path):
+    # A resent first half must not complete the block with the second half missing
+    assert receive(tmp_path, [(0, b"abcd"), (0, b"abcd")]) == []
+    assert receive(tmp_path, [(0, b"abcd"), (0, b"abcd"), (4, b"efgh")]) == [b"abcdefgh"]
+
+def test_out_of_range_parts_are_dropped(tmp_path):
+    parts = [(6, b"xxxx"), (-2, b"xx"), (0, b"abcd"), (2, b"xxxx"), (4, b"efgh")]
+    assert receive(tmp_path, parts) == [b"abcdefgh"]
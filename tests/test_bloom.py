@@ -0,0 +1,47 @@
+from bee import QUARANTINE_CAPACITY, QUARANTINE_TTL_SEC
+from immune import BloomFilter, SlicedBloomFilter
+
+def false_positive_rate(bloom, probes=100_000):
+    return sum(f"healthy-{k}" in bloom for k in range(probes)) / probes
+
+def test_quarantine_holds_its_error_rate_at_capacity():
+    bloom = SlicedBloomFilter(capacity=QUARANTINE_CAPACITY, ttl=QUARANTINE_TTL_SEC)
+    for k in range(QUARANTINE_CAPACITY):
+        bloom.add(f"flagged-{k}")
+    assert all(f"flagged-{k}" in bloom for k in range(0, QUARANTINE_CAPACITY, 997))
+    assert false_positive_rate(bloom) <= bloom.error_rate
+
+def test_every_generation_counts_towards_the_error_rate():
+    bloom = SlicedBloomFilter(capacity=20_000, error_rate=0.01, ttl=3600, slices=4)
+    # Four full generations, as after an hour of steady flagging
+    epoch = bloom._epoch()
+    for age in range(4):
+        generation = BloomFilter(bloom.capacity, bloom.error_rate / bloom.num_slices)
+        for k in range(bloom.capacity):
+            generation.add(f"flagged-{age}-{k}")
+        bloom.generations[epoch - age] = generation
+    # At capacity each generation sits right at its share; allow sampling noise
+    assert false_positive_rate(bloom, 50_000) <= 1.5 * bloom.error_rate
+
+def test_filter_sized_for_its_capacity():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.001)
+    for k in range(10_000):
+        bloom.add(f"flagged-{k}")
+    assert false_positive_rate(bloom) <= 2 * bloom.error_rate
+
+def test_bytes_round_trip_and_merge():
+    ours, theirs = BloomFilter(1000), BloomFilter(1000)
+    ours.add("a")
+    theirs.add("b")
+    theirs = BloomFilter.from_bytes(theirs.to_bytes())
+    merged = ours.union(theirs)
+    assert "a" in merged and "b" in merged
+    assert "b" not in ours
+
+def test_sliced_update_keeps_its_own_copies():
+    ours, theirs = SlicedBloomFilter(1000), SlicedBloomFilter(1000)
+    theirs.add("b")
+    ours.update(theirs)
+    ours.add("a")
+    assert "a" in ours and "b" in ours
+    assert "a" not in theirs
@@ -0,0 +1,53 @@
+import pytest
+import torch
+
+from shared.codec import Transport, ErrorFeedback, MODES, LOSSLESS, decode, zstandard
+
+# Worst relative error per element for each lossy mode
+TOLERANCE = {"none": 0.0, "fp16": 1e-3, "bf16": 1e-2}
+
+@pytest.mark.parametrize("lossless", [name for name in LOSSLESS if name != "zstd" or zstandard is not None])
+@pytest.mark.parametrize("mode", MODES)
+def test_round_trip(mode, lossless):
+    torch.manual_seed(0)
+    tensor = torch.randn(37, 53)
+    transport = Transport(mode, lossless)
+    decoded = transport.decode(transport.encode(tensor))
+    assert decoded.shape == tensor.shape and decoded.dtype == tensor.dtype
+    if mode == "int8":
+        # Half a quantisation step, per block of INT8_BLOCK values
+        blocks = tensor.reshape(-1).split(transport.block)
+        errors = (decoded - tensor).reshape(-1).split(transport.block)
+        for block, error in zip(blocks, errors):
+            assert error.abs().max() <= block.abs().max() / 127 / 2 * 1.0001
+    else:
+        assert torch.allclose(decoded, tensor, rtol=TOLERANCE[mode], atol=0.0)
+
+def test_integer_tensors_travel_exactly():
+    tensor = torch.arange(-500, 500, dtype=torch.int64)
+    blob = Transport("int8", "zlib").encode(tensor).blob
+    assert torch.equal(decode(blob), tensor)
+
+def test_empty_tensor():
+    tensor = torch.empty(0, 8)
+    decoded = decode(Transport("int8", "zlib").encode(tensor).blob)
+    assert decoded.shape == (0, 8)
+
+def test_spec_round_trip():
+    transport = Transport("bf16", "zlib", level=3)
+    again = Transport.from_spec(transport.spec())
+    assert again.spec() == transport.spec()
+    assert not Transport.from_spec(None).enabled
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        Transport("fp8")
+
+def test_error_feedback_bounds_accumulated_error():
+    torch.manual_seed(0)
+    transport, feedback = Transport("int8"), ErrorFeedback()
+    tensor = torch.randn(1024)
+    sent = sum(feedback.encode(transport, ("job", "A"), tensor).decode() for _ in range(50))
+    # Without feedback the per-send error would add up 50 times over
+    single = (transport.encode(tensor).decode() - tensor).abs().max()
+    assert (sent - 50 * tensor).abs().max() <= 2 * single
@@ -0,0 +1,61 @@
+import pytest
+import torch
+
+from shared.codec import EncodedTensor, Transport
+from mesh import DTYPES, encode_frame, decode_frame, encode_shard, decode_shard, encode_tensors, decode_tensors
+
+def joined(frame):
+    """What the receiver gets: the fragments of one binary message, concatenated."""
+    if isinstance(frame, list):
+        return b"".join(bytes(part) for part in frame)
+    return frame
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_tensor_frame_round_trip(dtype):
+    tensor = (torch.arange(24) - 12).reshape(2, 3, 4).to(dtype)
+    message = decode_frame(joined(encode_frame("job-1", 7, "WEST", tensor)))
+    assert message['type'] == "PULSE_DATA"
+    assert (message['jobId'], message['step'], message['direction']) == ("job-1", 7, "WEST")
+    assert message['payload'].dtype == dtype
+    assert torch.equal(message['payload'], tensor)
+
+def test_tensor_frame_without_job_or_data():
+    message = decode_frame(joined(encode_frame(None, 0, "NORTH", torch.empty(0, 5))))
+    assert message['jobId'] is None
+    assert message['payload'].shape == (0, 5)
+
+def test_encoded_frame_stays_encoded():
+    tensor = torch.randn(16, 16)
+    encoded = Transport("fp16").encode(tensor)
+    message = decode_frame(joined(encode_frame("job-1", 2, "SOUTH", encoded)))
+    assert isinstance(message['payload'], EncodedTensor)
+    assert bytes(message['payload'].blob) == encoded.blob
+    assert torch.allclose(message['payload'].decode(), tensor, rtol=1e-3)
+
+def test_tensor_frame_rejects_other_magic():
+    with pytest.raises(ValueError):
+        decode_frame(b"XXXX" + bytes(16))
+
+def test_shard_round_trip():
+    data = bytes(range(256)) * 4
+    header = {"type": "SHARD_ASSIGNMENT", "cell": [1, 2], "hash": "abc"}
+    message = decode_shard(joined(encode_shard(header, memoryview(data)[100:900])))
+    assert bytes(message.pop('data')) == data[100:900]
+    assert message == header
+
+def test_shard_without_data():
+    message = decode_shard(joined(encode_shard({"type": "BLOCK_PART"}, b"")))
+    assert len(message['data']) == 0
+
+def test_shard_rejects_other_magic():
+    with pytest.raises(ValueError):
+        decode_shard(b"GBT1" + bytes(8))
+
+def test_tensors_round_trip():
+    tensors = [torch.randn(3, 4), torch.arange(5, dtype=torch.int32), torch.empty(0, 2, dtype=torch.float16)]
+    message = decode_shard(joined(encode_tensors({"type": "STEAL_RESULT", "taskId": "t"}, tensors)))
+    assert message['taskId'] == "t"
+    decoded = decode_tensors(message)
+    assert len(decoded) == len(tensors)
+    for sent, received in zip(tensors, decoded):
+        assert received.dtype == sent.dtype and torch.equal(received, sent)
@@ -0,0 +1,41 @@
+import pytest
+
+from lead_logic import GrecoLatinGenerator, AssignmentTable, micro_shards
+
+@pytest.mark.parametrize("n", [3, 4, 5])
+@pytest.mark.parametrize("size", [1000, 4096, 7])
+def test_pieces_cover_the_block_once(n, size):
+    block = bytes(range(256)) * (size // 256) + bytes(size % 256)
+    shards = micro_shards(memoryview(block), GrecoLatinGenerator.generate_gls(n))
+    assert len(shards) == n * n
+    pieces = {data_id * n + task_id: bytes(view) for task_id, data_id, view in shards.values()}
+    assert sorted(pieces) == list(range(n * n))
+    # In piece order the shards are the block again, with no gaps or overlaps
+    assert b"".join(pieces[k] for k in range(n * n)) == block
+
+def test_shards_are_views_of_the_block():
+    block = bytearray(range(90))
+    shards = micro_shards(memoryview(block), GrecoLatinGenerator.generate_gls(3))
+    _, _, view = shards[(0, 0)]
+    block[:] = bytes(90)
+    assert bytes(view) == bytes(len(view))
+
+def test_layout_follows_the_square():
+    n = 4
+    gls = GrecoLatinGenerator.generate_gls(n)
+    shards = micro_shards(memoryview(bytes(160)), gls)
+    for r in range(n):
+        # Every row and column holds each task and each data partition once
+        assert {shards[(r, c)][0] for c in range(n)} == set(range(n))
+        assert {shards[(r, c)][1] for c in range(n)} == set(range(n))
+        assert {shards[(c, r)][0] for c in range(n)} == set(range(n))
+        assert {shards[(c, r)][1] for c in range(n)} == set(range(n))
+
+def test_assignment_table():
+    table = AssignmentTable("job", 0)
+    table.assign((0, 0), "bee-a", 0, 0, "h0", 10)
+    table.assign((0, 1), "bee-b", 1, 1, "h1", 10)
+    table.assign((1, 0), "bee-a", 1, 0, "h2", 10)
+    table.mark((0, 1), AssignmentTable.ACKED)
+    assert table.cells_of("bee-a") == [(0, 0), (1, 0)]
+    assert table.counts() == {AssignmentTable.PENDING: 2, AssignmentTable.ACKED: 1}
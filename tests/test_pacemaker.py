@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from pacemaker import Pacemaker
+
+def pulse(job_id, step, tag):
+    return {"type": "PULSE_DATA", "jobId": job_id, "step": step, "payload": tag}
+
+def test_step_released_only_with_every_input():
+    async def run():
+        pacemaker = Pacemaker()
+        pacemaker.enqueue("EAST", pulse("a", 1, "A1"))
+        waiter = asyncio.create_task(pacemaker.wait_for_step(1, job_id="a"))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        pacemaker.enqueue("SOUTH", pulse("a", 1, "B1"))
+        inputs = await waiter
+        assert (inputs['EAST']['payload'], inputs['SOUTH']['payload']) == ("A1", "B1")
+    asyncio.run(run())
+
+def test_next_job_survives_the_end_of_this_one():
+    async def run():
+        pacemaker = Pacemaker()
+        pacemaker.enqueue("EAST", pulse("a", 1, "A1"))
+        pacemaker.enqueue("SOUTH", pulse("a", 1, "B1"))
+        # A neighbour already on job b, during our last round of job a
+        pacemaker.enqueue("EAST", pulse("b", 1, "next-A1"))
+        pacemaker.enqueue("SOUTH", pulse("b", 1, "next-B1"))
+        assert (await pacemaker.wait_for_step(1, job_id="a"))['EAST']['payload'] == "A1"
+        pacemaker.finish("a")
+        inputs = await pacemaker.wait_for_step(1, max_wait=0.1, job_id="b")
+        assert inputs['EAST']['payload'] == "next-A1"
+    asyncio.run(run())
+
+def test_late_duplicates_dropped_until_the_job_finishes():
+    async def run():
+        pacemaker = Pacemaker()
+        for direction in ("EAST", "SOUTH"):
+            pacemaker.enqueue(direction, pulse("a", 1, "first"))
+        await pacemaker.wait_for_step(1, job_id="a")
+        pacemaker.enqueue("EAST", pulse("a", 1, "duplicate"))
+        assert not pacemaker.buffer
+        # The same job run again (after the Queen's next assignment) starts afresh
+        pacemaker.finish("a")
+        for direction in ("EAST", "SOUTH"):
+            pacemaker.enqueue(direction, pulse("a", 1, "again"))
+        assert (await pacemaker.wait_for_step(1, max_wait=0.1, job_id="a"))['SOUTH']['payload'] == "again"
+    asyncio.run(run())
+
+def test_timeout_names_the_missing_side():
+    async def run():
+        pacemaker = Pacemaker()
+        pacemaker.enqueue("EAST", pulse("a", 2, "A2"))
+        with pytest.raises(asyncio.TimeoutError, match="SOUTH"):
+            await pacemaker.wait_for_step(2, max_wait=0.05, job_id="a")
+        assert pacemaker.stats()['timeouts'] == 1
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from lead_logic import ParityBuffer
+
+def filled(n_shards, parity_shards, seed=0):
+    rng = random.Random(seed)
+    # Uneven lengths: shorter shards are zero padded inside the code
+    shards = {f"s{k}": rng.randbytes(rng.randint(1, 300)) for k in range(n_shards)}
+    buffer = ParityBuffer(n_shards, parity_shards)
+    for shard_id, data in shards.items():
+        buffer.add_shard(shard_id, data)
+    return buffer, shards
+
+def test_xor_recovers_any_single_loss():
+    for lost in range(5):
+        buffer, shards = filled(5, 1)
+        buffer.mark_lost(f"s{lost}")
+        assert buffer.reconstruct(f"s{lost}") == shards[f"s{lost}"]
+
+def test_reed_solomon_recovers_up_to_parity_losses():
+    buffer, shards = filled(8, 3)
+    lost = ["s1", "s4", "s7"]
+    for shard_id in lost:
+        buffer.mark_lost(shard_id)
+    for shard_id in lost:
+        assert buffer.reconstruct(shard_id) == shards[shard_id]
+
+def test_too_many_losses():
+    buffer, _ = filled(6, 2)
+    for shard_id in ("s0", "s1", "s2"):
+        buffer.mark_lost(shard_id)
+    with pytest.raises(ValueError):
+        buffer.reconstruct("s0")
+
+def test_replaced_shard_updates_parity():
+    buffer, shards = filled(4, 2)
+    buffer.add_shard("s2", b"replacement")
+    shards["s2"] = b"replacement"
+    for shard_id in ("s0", "s2"):
+        buffer.mark_lost(shard_id)
+    assert buffer.reconstruct("s0") == shards["s0"]
+    assert buffer.reconstruct("s2") == shards["s2"]
+
+def test_memoryview_shards():
+    block = bytes(range(256)) * 3
+    buffer = ParityBuffer(3)
+    for k in range(3):
+        buffer.add_shard(k, memoryview(block)[k * 256:(k + 1) * 256])
+    buffer.mark_lost(1)
+    assert buffer.reconstruct(1) == block[256:512]
+
+def test_unknown_and_full():
+    buffer, _ = filled(2, 1)
+    with pytest.raises(KeyError):
+        buffer.reconstruct("nope")
+    with pytest.raises(ValueError):
+        buffer.add_shard("s9", b"x")
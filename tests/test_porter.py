@@ -0,0 +1,45 @@
+import io
+
+import pytest
+import torch
+import torch.nn as nn
+
+from porter import GridbeePorter, iter_records, MASK_FACTOR
+
+class TiedLM(nn.Module):
+    """Input embedding and output projection share one weight."""
+    def __init__(self):
+        super().__init__()
+        self.embed = nn.Embedding(8, 4)
+        self.head = nn.Linear(4, 8, bias=False)
+        self.head.weight = self.embed.weight
+        self.register_buffer("steps", torch.arange(3, dtype=torch.int16))
+
+def export_records(model):
+    stream = io.BytesIO()
+    GridbeePorter(model).export(stream)
+    stream.seek(0)
+    return {name: (tensor, masked) for name, tensor, masked in iter_records(stream)}
+
+def test_tied_weights_are_masked_under_every_name():
+    model = TiedLM()
+    records = export_records(model)
+    for name in ("embed.weight", "head.weight"):
+        tensor, masked = records[name]
+        assert masked
+        assert torch.allclose(tensor, model.embed.weight.detach() * MASK_FACTOR)
+
+def test_buffers_round_trip_unmasked():
+    model = TiedLM()
+    tensor, masked = export_records(model)["steps"]
+    assert not masked
+    assert tensor.dtype == torch.int16
+    assert torch.equal(tensor, model.steps)
+
+def test_unsupported_dtype_fails_before_writing():
+    model = nn.Module()
+    model.register_buffer("codes", torch.zeros(2, dtype=torch.uint16))
+    stream = io.BytesIO()
+    with pytest.raises(TypeError, match="codes"):
+        GridbeePorter(model).export(stream)
+    assert stream.getvalue() == b""
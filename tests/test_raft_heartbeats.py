@@ -0,0 +1,81 @@
+import asyncio
+
+from raft_manager import RaftConsensus, RaftState, ELECTION_TIMEOUT_MIN, RPC_TIMEOUT_SEC
+
+def cluster(n):
+    nodes = [RaftConsensus(f"prince-{k}") for k in range(n)]
+    bees = {node.bee_id: {"role": "PRINCE", "ip": "sim", "p2pPort": k} for k, node in enumerate(nodes)}
+    for node in nodes:
+        node.shadow_state = {"grid": [], "beeCount": n, "bees": bees}
+    return nodes
+
+def test_dead_peer_does_not_delay_heartbeats():
+    nodes = cluster(4)
+    leader, dead = nodes[0], nodes[-1]
+    heard = {node.bee_id: [] for node in nodes}
+    timeouts = []
+
+    async def send(peer, message, timeout):
+        target = nodes[peer['p2pPort']]
+        timeouts.append(timeout)
+        if target is dead:
+            # Never answers: the request only ends at its timeout
+            await asyncio.sleep(timeout)
+            return None
+        heard[target.bee_id].append(asyncio.get_running_loop().time())
+        return target.process_append_entries(message)
+
+    async def main():
+        async def promote():
+            pass
+
+        for node in nodes[1:-1]:
+            node.start_election_timer(send, promote)
+        leader.start_election_timer(send, promote)
+        leader.state = RaftState.CANDIDATE
+        leader.current_term = 1
+        await leader.become_leader()
+        await asyncio.sleep(1.0)
+        for node in nodes:
+            node.stop_election_timer()
+
+    asyncio.run(main())
+    assert max(timeouts) == RPC_TIMEOUT_SEC < ELECTION_TIMEOUT_MIN
+    for node in nodes[1:-1]:
+        times = heard[node.bee_id]
+        assert len(times) > 10
+        # Heartbeats keep coming well inside the election timeout...
+        assert max(b - a for a, b in zip(times, times[1:])) < ELECTION_TIMEOUT_MIN
+        # ...so the live followers never start an election
+        assert node.elections_started == 0 and node.state == RaftState.FOLLOWER
+    assert leader.state == RaftState.LEADER
+
+def test_dead_peer_does_not_block_an_election():
+    nodes = cluster(4)
+    candidate, dead = nodes[0], nodes[-1]
+    for node in nodes:
+        node.last_heartbeat = 0 # the old leader is long gone
+
+    async def send(peer, message, timeout):
+        target = nodes[peer['p2pPort']]
+        if target is dead:
+            await asyncio.sleep(timeout)
+            return None
+        return target.process_request_vote(message)
+
+    async def main():
+        promoted = asyncio.Event()
+
+        async def promote():
+            promoted.set()
+
+        candidate.send_fn, candidate.promote_fn = send, promote
+        started = asyncio.get_running_loop().time()
+        await candidate.start_election()
+        elapsed = asyncio.get_running_loop().time() - started
+        candidate.stop_election_timer()
+        return promoted.is_set(), elapsed
+
+    promoted, elapsed = asyncio.run(main())
+    assert promoted
+    assert elapsed < ELECTION_TIMEOUT_MIN
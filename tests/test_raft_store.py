@@ -0,0 +1,91 @@
+import asyncio
+
+from raft_store import RaftStore
+
+def entry(index, term=1):
+    return {"index": index, "term": term, "op": f"op-{index}"}
+
+def written(directory, records):
+    """Runs records(store) against a started store, then stops it (which flushes)."""
+    async def run():
+        store = RaftStore(str(directory))
+        store.start()
+        records(store)
+        await asyncio.sleep(0) # let the writer pick up part of it
+        await store.stop()
+        return store
+    return asyncio.run(run())
+
+def test_recovers_meta_entries_and_commit(tmp_path):
+    def records(store):
+        store.save_meta("bee-1", 3, "bee-2")
+        for index in range(1, 6):
+            store.append_entry(entry(index))
+        store.commit(4)
+    store = written(tmp_path, records)
+    assert store.records_written == 7
+
+    state = RaftStore(str(tmp_path)).load()
+    assert (state['beeId'], state['term'], state['votedFor']) == ("bee-1", 3, "bee-2")
+    assert [e['index'] for e in state['entries']] == [1, 2, 3, 4, 5]
+    assert state['commitIndex'] == 4
+    assert state['replayed'] == 7
+
+def test_truncate_and_overwrite(tmp_path):
+    def records(store):
+        for index in range(1, 6):
+            store.append_entry(entry(index))
+        store.truncate(4)
+        store.append_entry(entry(4, term=2))
+        # A conflicting entry replaces everything from its index on
+        store.append_entry(entry(2, term=3))
+    written(tmp_path, records)
+
+    state = RaftStore(str(tmp_path)).load()
+    assert [(e['index'], e['term']) for e in state['entries']] == [(1, 1), (2, 3)]
+
+def test_snapshot_compacts_the_log(tmp_path):
+    def records(store):
+        for index in range(1, 4):
+            store.append_entry(entry(index))
+        store.snapshot({"beeId": "bee-1", "term": 2, "votedFor": None, "snapshotIndex": 3, "snapshotTerm": 1,
+                        "commitIndex": 3, "shadowState": {"bees": {"b": {"ip": "10.0.0.1"}}}, "entries": []})
+        store.append_entry(entry(3)) # already in the snapshot
+        store.append_entry(entry(4, term=2))
+    store = written(tmp_path, records)
+    assert store.snapshots_written == 1
+
+    state = RaftStore(str(tmp_path)).load()
+    assert state['snapshotIndex'] == 3 and state['term'] == 2
+    assert state['shadowState'] == {"bees": {"b": {"ip": "10.0.0.1"}}}
+    assert [e['index'] for e in state['entries']] == [4]
+    assert state['replayed'] == 2
+
+def test_torn_tail_is_dropped(tmp_path):
+    def records(store):
+        store.save_meta("bee-1", 1, None)
+        store.append_entry(entry(1))
+        store.append_entry(entry(2))
+    store = written(tmp_path, records)
+    # A crash part way through the next write
+    with open(store.log_path, "a") as f:
+        f.write('{"k": "entry", "e": {"index": 3, "te')
+
+    state = RaftStore(str(tmp_path)).load()
+    assert [e['index'] for e in state['entries']] == [1, 2]
+    assert state['replayed'] == 3
+
+def test_records_after_stop_are_flushed(tmp_path):
+    async def run():
+        store = RaftStore(str(tmp_path))
+        store.start()
+        store.append_entry(entry(1))
+        await store.stop()
+        store.append_entry(entry(2))
+        await store.stop() # no writer left: stop only flushes
+    asyncio.run(run())
+    assert [e['index'] for e in RaftStore(str(tmp_path)).load()['entries']] == [1, 2]
+
+def test_empty_directory(tmp_path):
+    state = RaftStore(str(tmp_path)).load()
+    assert state['term'] == 0 and state['entries'] == [] and state['replayed'] == 0
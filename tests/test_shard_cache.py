@@ -0,0 +1,67 @@
+import os
+
+import pytest
+import torch
+
+from shard_cache import ShardCache, ShardMissingError, tensor_digest
+from systolic import SystolicEngine, pack_shard
+
+def block(seed, n=64):
+    return torch.randn(n, n, generator=torch.Generator().manual_seed(seed))
+
+def test_evicted_blocks_spill_and_come_back(tmp_path):
+    cache = ShardCache(memory_budget=64 * 64 * 4, spill_dir=str(tmp_path))
+    first, second = block(0), block(1)
+    cache.put(tensor_digest(first), first)
+    cache.put(tensor_digest(second), second)
+    # Only one block fits in memory: the older one is on disk
+    assert cache.stats()['spills'] == 1
+    assert torch.equal(cache.get(tensor_digest(first)), first)
+    assert cache.stats()['diskHits'] == 1
+
+def test_spilled_blocks_survive_a_restart(tmp_path):
+    cache = ShardCache(memory_budget=0, spill_dir=str(tmp_path))
+    tensor = block(2)
+    cache.put(tensor_digest(tensor), tensor)
+    cache.put(tensor_digest(block(3)), block(3))
+    restarted = ShardCache(spill_dir=str(tmp_path))
+    assert torch.equal(restarted.get(tensor_digest(tensor)), tensor)
+
+def test_missing_spill_files_are_forgotten(tmp_path):
+    cache = ShardCache(memory_budget=0, spill_dir=str(tmp_path), disk_budget=64 * 64 * 4 * 2)
+    tensors = [block(seed) for seed in range(4)]
+    for tensor in tensors[:3]:
+        cache.put(tensor_digest(tensor), tensor)
+    digest = tensor_digest(tensors[0])
+    os.remove(cache._path(digest))
+    assert cache.get(digest) is None
+    assert digest not in cache
+    # Evicting a block whose files are already gone is not an error either
+    os.remove(cache._path(tensor_digest(tensors[1])) + ".json")
+    cache.put(tensor_digest(tensors[3]), tensors[3])
+    assert cache.disk_bytes <= cache.disk_budget
+
+def test_each_cache_claims_its_own_slot():
+    first, second = ShardCache(), ShardCache()
+    try:
+        assert first.spill_dir != second.spill_dir
+    finally:
+        first.lock.close()
+        second.lock.close()
+
+def test_hash_only_operands_resolve_from_the_cache(tmp_path):
+    engine = SystolicEngine()
+    engine.cache = ShardCache(spill_dir=str(tmp_path / "held"))
+    A, B = block(4, 8), block(5, 8)
+    engine.load_shard({"A": pack_shard(A), "B": pack_shard(B), "jobId": "job"})
+    # Second step: both blocks are held, so only their hashes are sent
+    held = {tensor_digest(A), tensor_digest(B)}
+    packed = {"A": pack_shard(A, held), "B": pack_shard(B, held), "jobId": "job"}
+    assert "data" not in packed['A'] and "data" not in packed['B']
+    engine.load_shard(packed)
+    assert torch.equal(engine.local_A, A)
+
+    # A bee that no longer holds them answers SHARD_MISS
+    engine.cache = ShardCache(spill_dir=str(tmp_path / "empty"))
+    with pytest.raises(ShardMissingError):
+        engine.load_shard(packed)
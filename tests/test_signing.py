@@ -0,0 +1,51 @@
+import asyncio
+
+from bee import WorkerBee, shard_blocks
+from immune import Lymphocyte, SignatureAggregator, merkle_root
+
+def test_aggregator_rejects_a_root_other_than_expected():
+    blocks = [b"shard-a", b"shard-b"]
+    expected = {"bee-a": merkle_root(blocks), "bee-b": merkle_root(blocks)}
+
+    async def main():
+        aggregator = SignatureAggregator(Lymphocyte("lead"), {"bee-a", "bee-b"}, expected=expected)
+        # Validly signed, but over shards bee-b was never sent
+        await aggregator.submit(Lymphocyte("bee-b").sign_batch(0, [b"other"]))
+        await aggregator.submit(Lymphocyte("bee-a").sign_batch(0, blocks))
+        while aggregator.pending or not aggregator.verifier.done():
+            await asyncio.sleep(0.01)
+        return aggregator
+
+    aggregator = asyncio.run(main())
+    assert aggregator.rejected[0] == {"bee-b"}
+    assert aggregator.missing(0) == {"bee-b"}
+
+def test_shard_blocks_are_in_cell_order():
+    hashes = {(1, 0): "02", (0, 1): "01", (0, 0): "00"}
+    assert shard_blocks(hashes) == [b"\x00", b"\x01", b"\x02"]
+
+def test_workers_sign_their_micro_shards_to_quorum(tmp_path):
+    async def main():
+        bees = [WorkerBee(bee_id, raft_dir=str(tmp_path / bee_id)) for bee_id in ("lead", "worker-a", "worker-b")]
+        try:
+            roles = {"lead": "PRINCE", "worker-a": "WORKER", "worker-b": "WORKER"}
+            state = {"bees": {}}
+            for bee in bees:
+                port = await bee.mesh.start_server()
+                state['bees'][bee.bee_id] = {"role": roles[bee.bee_id], "ip": "127.0.0.1", "p2pPort": port}
+            for bee in bees:
+                bee.raft.shadow_state = state
+
+            lead = bees[0]
+            await lead.handle_block_assignment({
+                "jobId": "job", "blockId": 0, "totalBlocks": 1, "block": bytearray(range(256)) * 8
+            })
+            aggregator = lead.aggregators[("job", 0)]
+            return await aggregator.wait_for_quorum(0, timeout=10)
+        finally:
+            for bee in bees:
+                await bee.mesh.close()
+
+    aggregate = asyncio.run(main())
+    assert aggregate['signers'] == ["worker-a", "worker-b"]
+    assert aggregate['cellSize'] == 2
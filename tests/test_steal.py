@@ -0,0 +1,41 @@
+import torch
+
+from steal import MIN_GAIN, MIN_ROWS, WorkStealer, plan_split
+
+def test_plan_split_balances_both_halves():
+    rows, local_sec, helper_sec, b_sec, ac_sec = 256, 1.0, 0.5, 0.01, 0.02
+    count, saved = plan_split(rows, local_sec, helper_sec, b_sec, ac_sec, busy_sec=0.0, spare_sec=10.0)
+    assert MIN_ROWS <= count < rows
+    assert saved >= MIN_GAIN * local_sec
+    # Our remaining rows and the helper's share finish within a row of each other
+    f = count / rows
+    here, there = local_sec * (1 - f), b_sec + f * (ac_sec + helper_sec)
+    assert abs(here - there) <= (local_sec + ac_sec + helper_sec) / rows + 0.01
+
+def test_plan_split_capped_by_spare_time():
+    unlimited, _ = plan_split(256, 1.0, 0.5, 0.01, 0.02, busy_sec=0.0, spare_sec=10.0)
+    capped, _ = plan_split(256, 1.0, 0.5, 0.01, 0.02, busy_sec=0.0, spare_sec=0.2)
+    assert MIN_ROWS <= capped < unlimited
+
+def test_plan_split_declines_unprofitable_rounds():
+    # No spare time, a wire slower than the matmul, a busy helper, no matmul, too few rows
+    assert plan_split(256, 1.0, 0.5, 0.01, 0.02, busy_sec=0.0, spare_sec=0.0) == (0, 0.0)
+    assert plan_split(256, 1.0, 0.5, 0.01, 50.0, busy_sec=0.0, spare_sec=10.0) == (0, 0.0)
+    assert plan_split(256, 1.0, 0.5, 0.01, 0.02, busy_sec=2.0, spare_sec=10.0) == (0, 0.0)
+    assert plan_split(256, 0.0, 0.5, 0.01, 0.02, busy_sec=0.0, spare_sec=10.0) == (0, 0.0)
+    assert plan_split(MIN_ROWS, 1.0, 0.5, 0.01, 0.02, busy_sec=0.0, spare_sec=10.0) == (0, 0.0)
+
+def test_freivalds_accepts_correct_rows():
+    torch.manual_seed(0)
+    A_rows, B = torch.randn(32, 256), torch.randn(256, 64)
+    assert WorkStealer._verify(A_rows, B, A_rows @ B)
+    assert WorkStealer._verify(A_rows[:0], B, (A_rows @ B)[:0])
+
+def test_freivalds_rejects_wrong_rows():
+    torch.manual_seed(0)
+    A_rows, B = torch.randn(32, 256), torch.randn(256, 64)
+    product = A_rows @ B
+    product[5] += 1.0
+    assert not WorkStealer._verify(A_rows, B, product)
+    # Rows computed from the wrong operand
+    assert not WorkStealer._verify(A_rows, B, torch.randn(32, 256) @ B)
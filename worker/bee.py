@@ -1,124 +1,79 @@
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
 import signal
+import socket
+import struct
 import sys
+import time
+import uuid
+from collections import deque
 
-# ... existing imports ...
+import psutil
+import websockets
 
-class WorkerBee:
-    def __init__(self):
-        # ... existing init ...
-        self.stop_event = asyncio.Event()
-        self.websocket = None # Store ws for cleanup
-
-    async def shutdown(self):
-        print("\n[BEE] Shutting down gracefully...")
-        try:
-            if self.websocket and self.websocket.open:
-                goodbye = {"type": "GOODBYE", "beeId": self.bee_id}
-                await self.websocket.send(json.dumps(goodbye))
-                print("[BEE] Sent GOODBYE to Hive.")
-                await self.websocket.close()
-        except:
-            pass
-        finally:
-            self.stop_event.set()
-
-    # ... existing methods ...
-
-    async def run(self):
-        # Register signals
-        loop = asyncio.get_running_loop()
-        for sig in (signal.SIGINT, signal.SIGTERM):
-            loop.add_signal_handler(sig, lambda: asyncio.create_task(self.shutdown()))
-
-        p2p_port = await self.mesh.start_server()
-        
-        # ... discovery ...
-        
-        try:
-            async with websockets.connect(self.queen_uri) as websocket:
-                self.websocket = websocket
-                
-                # ... handshake ...
-                initial_metrics = self.monitor.capture_metrics()
-                handshake = {
-                    "type": "HANDSHAKE",
-                    "beeId": self.bee_id,
-                    "metrics": initial_metrics,
-                    "p2pPort": p2p_port
-                }
-                await websocket.send(json.dumps(handshake))
-                
-                response = await websocket.recv()
-                ack = json.loads(response)
-                
-                if ack.get('type') == 'ACK':
-                    coords = ack['coordinates']
-                    self.role = ack['role']
-                    print(f"[CONNECTED] Assigned to Cell ({coords['i']}, {coords['j']}). Role: {self.role}.")
-                    
-                    if self.role == 'PRINCE':
-                        print("[HA] Monitoring Hive Heartbeats...")
-                        asyncio.create_task(self.raft.run_election_loop(None, self.promote_to_queen))
-                else:
-                    return
-
-                while not self.stop_event.is_set():
-                    try:
-                        # Use wait_for with the websocket recv
-                        # But we also need to check stop_event
-                        # We can race recv() and stop_event.wait()
-                        
-                        recv_task = asyncio.create_task(websocket.recv())
-                        wait_task = asyncio.create_task(self.stop_event.wait())
-                        
-                        done, pending = await asyncio.wait(
-                            [recv_task, wait_task], 
-                            return_when=asyncio.FIRST_COMPLETED
-                        )
-                        
-                        if wait_task in done:
-                            recv_task.cancel()
-                            break
-
-                        message = recv_task.result()
-                        data = json.loads(message)
-                        
-                        # ... message handling ...
-                            
-                    except websockets.exceptions.ConnectionClosed:
-                        print("[BEE] Connection to Queen Lost!")
-                        break
-                    except Exception as e:
-                         print(f"[BEE] Error in loop: {e}")
-                         # break? No, try to continue unless fatal
-                    
-                    # Heartbeat
-                    should_send, metrics = self.monitor.should_pulse()
-                    if should_send:
-                        payload = {"type": "HEARTBEAT", "beeId": self.bee_id, "metrics": metrics}
-                        await websocket.send(json.dumps(payload))
-        finally:
-            print("[BEE] Process Terminated.")
+# Run as `python3 worker/bee.py`: shared/ sits at the repo root, next to worker/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
+from shared.budget import ByteBudget
+from shared.telemetry import Telemetry
 
 # Local Imports
 try:
-    from lead_logic import GrecoLatinGenerator, ParityBuffer
-    from mesh import BitchatMesh
+    from lead_logic import GrecoLatinGenerator, ParityBuffer, AssignmentTable, micro_shards
+    from mesh import BitchatMesh, OPPOSITE, MAX_MESSAGE_BYTES, encode_shard, decode_shard
     from systolic import SystolicEngine
+    from shard_cache import ShardCache, ShardMissingError
     from pacemaker import Pacemaker
-    from immune import Lymphocyte, BloomFilter, FlagManager
+    from dispatch import Dispatcher
+    from capability import load_or_probe
+    from steal import WorkStealer
+    from collective import Collective
+    from raft_manager import RaftConsensus
+    from raft_store import RaftStore
+    from immune import Lymphocyte, SlicedBloomFilter, FlagManager, SignatureAggregator, merkle_root
 except ImportError:
-    from worker.lead_logic import GrecoLatinGenerator, ParityBuffer
-    from worker.mesh import BitchatMesh
+    from worker.lead_logic import GrecoLatinGenerator, ParityBuffer, AssignmentTable, micro_shards
+    from worker.mesh import BitchatMesh, OPPOSITE, MAX_MESSAGE_BYTES, encode_shard, decode_shard
     from worker.systolic import SystolicEngine
+    from worker.shard_cache import ShardCache, ShardMissingError
     from worker.pacemaker import Pacemaker
-    from worker.immune import Lymphocyte, BloomFilter, FlagManager
+    from worker.dispatch import Dispatcher
+    from worker.capability import load_or_probe
+    from worker.steal import WorkStealer
+    from worker.collective import Collective
+    from worker.raft_manager import RaftConsensus
+    from worker.raft_store import RaftStore
+    from worker.immune import Lymphocyte, SlicedBloomFilter, FlagManager, SignatureAggregator, merkle_root
 
 # Configuration
 UDP_PORT = 41234
 HEARTBEAT_INTERVAL_SEC = 60
+HEARTBEAT_CHECK_SEC = 1.0
+TELEMETRY_INTERVAL_SEC = 10 # heartbeat at least this often while the histograms are moving
 SPIKE_THRESHOLD = 0.05
+QUARANTINE_TTL_SEC = 3600
+QUARANTINE_CAPACITY = 1_000_000 # flagged IDs per quarantine slice (~2.2 MB each)
+SAMPLE_INTERVAL_SEC = 1.0
+EWMA_ALPHA = 0.3
+JITTER_WINDOW = 32
+PING_TIMEOUT_SEC = 2.0
+LEAD_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+SHARD_ACK_TIMEOUT_SEC = 30.0
+CELL_RESULT_TIMEOUT_SEC = 120.0 # a cell's signatures, from block assignment on
+PULSE_TIMEOUT_SEC = 30.0 # a Cannon round's blocks, out and in; past it the run is abandoned
+
+def p2p_host(ip):
+    """Normalises an address as seen by the Queen (IPv4-mapped, loopback)."""
+    ip = ip.replace("::ffff:", "")
+    return "localhost" if ip == "127.0.0.1" else ip
+
+def shard_blocks(hashes):
+    """What a worker signs for a block's micro-shards: their digests ({cell: hex}), in cell order."""
+    return [bytes.fromhex(digest) for _, digest in sorted(hashes.items())]
 
 class DiscoveryChain:
     """Handles Queen Discovery via UDP"""
@@ -149,25 +104,87 @@ class DiscoveryChain:
                 pass
                 
 class SpikeMonitor:
-    def __init__(self):
-        self.last_metrics = self.capture_metrics()
+    """
+    Samples host metrics on its own timer (run()) and keeps EWMA-smoothed
+    values; the message loop only reads the cached snapshot.
+    Jitter is judged per neighbor link: each link keeps its own window of
+    ping/pong RTTs and an EWMA baseline, and its jitter is the RMS
+    deviation (ms) from that baseline. A steady latency difference between
+    links is not jitter; the reported figure is the worst link's.
+    """
+    def __init__(self, mesh=None, vram_probe=None):
+        self.mesh = mesh
+        self.vram_probe = vram_probe
+        self.links = {} # direction -> {"baseline": EWMA RTT (s), "deviations": deque (s)}
+        self.snapshot = None
+        self.sample()
+        self.last_metrics = self.snapshot
         self.last_sent_time = 0
         
-    def capture_metrics(self):
+    def _ewma(self, key, value):
+        if self.snapshot is None:
+            return value
+        return EWMA_ALPHA * value + (1 - EWMA_ALPHA) * self.snapshot[key]
+        
+    def _record_rtt(self, direction, rtt):
+        link = self.links.get(direction)
+        if link is None:
+            self.links[direction] = {"baseline": rtt, "deviations": deque(maxlen=JITTER_WINDOW)}
+            return
+        link['deviations'].append(rtt - link['baseline'])
+        link['baseline'] = EWMA_ALPHA * rtt + (1 - EWMA_ALPHA) * link['baseline']
+
+    def link_jitter_ms(self):
+        """Jitter (ms) of every neighbor link with at least two samples."""
+        return {
+            direction: math.sqrt(sum(d * d for d in link['deviations']) / len(link['deviations'])) * 1000
+            for direction, link in self.links.items() if link['deviations']
+        }
+
+    def _jitter_ms(self):
+        return max(self.link_jitter_ms().values(), default=0.0)
+        
+    def sample(self):
         vm = psutil.virtual_memory()
         cpu = psutil.cpu_percent(interval=None)
         
-        # Mock VRAM for now (requires nvidia-smi usually)
-        # Using swap free as a placeholder for 'secondary memory' if needed, or just 0
-        # Mocking High VRAM to ensure Prince Status for testing
-        vram_free = 8000 
+        # No VRAM figure from torch on this device (CPU): report none. The
+        # Queen ranks bees by the measured capability in the handshake.
+        vram_free = (self.vram_probe() if self.vram_probe else None) or 0.0
         
-        return {
-            "vramFree": vram_free,
-            "ramFree": vm.available / (1024 * 1024), # MB
-            "cpuIdle": 100 - cpu,
-            "jitter": 0 # Placeholder for network ping
+        self.snapshot = {
+            "vramFree": self._ewma("vramFree", vram_free),
+            "ramFree": self._ewma("ramFree", vm.available / (1024 * 1024)), # MB
+            "cpuIdle": self._ewma("cpuIdle", 100 - cpu),
+            "jitter": self._jitter_ms()
         }
+        return self.snapshot
+        
+    async def measure_rtts(self):
+        """One ping/pong round trip per connected neighbor."""
+        async def ping(direction, ws):
+            start = time.perf_counter()
+            pong = await ws.ping()
+            await asyncio.wait_for(pong, PING_TIMEOUT_SEC)
+            self._record_rtt(direction, time.perf_counter() - start)
+        
+        sockets = {d: ws for d, ws in self.mesh.neighbors.items() if ws is not None} if self.mesh else {}
+        # A link that went away starts a fresh baseline when it comes back
+        for direction in set(self.links) - set(sockets):
+            del self.links[direction]
+        await asyncio.gather(*[ping(d, ws) for d, ws in sockets.items()], return_exceptions=True)
+        
+    async def run(self):
+        while True:
+            await asyncio.sleep(SAMPLE_INTERVAL_SEC)
+            try:
+                await self.measure_rtts()
+                self.sample()
+            except Exception as e:
+                print(f"[MONITOR] Sampling failed: {e}")
+        
+    def capture_metrics(self):
+        return dict(self.snapshot)
         
     def should_pulse(self):
         current_metrics = self.capture_metrics()
@@ -189,22 +206,67 @@ class SpikeMonitor:
         return False, None
 
 class WorkerBee:
-    def __init__(self):
-        self.bee_id = str(uuid.uuid4())
-        self.monitor = SpikeMonitor()
-        self.raft = RaftConsensus(self.bee_id)
+    def __init__(self, bee_id=None, raft_dir=None):
+        # Durable Raft state; a restarted bee keeps its identity
+        self.raft_store = RaftStore(raft_dir)
+        recovered = self.raft_store.load()
+        self.bee_id = bee_id or recovered['beeId'] or str(uuid.uuid4())
+        self.raft = RaftConsensus(self.bee_id, self.raft_store)
+        self.raft.restore(recovered)
         
-        self.mesh = BitchatMesh(self.bee_id, self.handle_p2p_message)
-        self.engine = SystolicEngine()
-        self.pacemaker = Pacemaker()
+        # Hot-path counters and histograms, summarised into heartbeats
+        self.telemetry = Telemetry()
+        self.mesh = BitchatMesh(self.bee_id, self.handle_p2p_message, self.telemetry)
+        self.engine = SystolicEngine(telemetry=self.telemetry)
+        self.monitor = SpikeMonitor(self.mesh, self.engine.free_vram_mb)
+        self.engine.cache = ShardCache(device=self.engine.device)
+        self.engine.cache.set_budget_from_metrics(self.monitor.last_metrics)
+        self.pacemaker = Pacemaker(telemetry=self.telemetry)
+        # Idle bees take rows of a slower neighbour's round
+        self.stealer = WorkStealer(self.bee_id, self.mesh, self.engine, telemetry=self.telemetry)
+        # Ring/tree reductions over the neighbour links (results, gradients)
+        self.collective = Collective(self.mesh, telemetry=self.telemetry)
+        # One Cannon run at a time: a second assignment waits instead of overwriting the engine
+        self.engine_lock = asyncio.Lock()
         
         # Immune System
-        self.bloom = BloomFilter()
+        self.bloom = SlicedBloomFilter(capacity=QUARANTINE_CAPACITY, ttl=QUARANTINE_TTL_SEC)
         self.lymphocyte = Lymphocyte(self.bee_id)
         self.flags = FlagManager(self.mesh, self.bloom)
+        self.aggregators = {} # (jobId, blockId) -> SignatureAggregator (Lead only)
+        self.held_shards = {} # (jobId, blockId) -> micro-shards from a Lead, until all are in and signed
+        self.assignments = {} # jobId -> AssignmentTable (Lead only)
+        self.parity_buffers = {} # jobId -> ParityBuffer (Lead only)
+        self.incoming_blocks = {} # (jobId, blockId) -> block streamed by the Queen, being filled in
         
         self.queen_uri = None
+        self.websocket = None
         self.role = "WORKER"
+        self.capability = None
+        self.stop_event = asyncio.Event()
+        
+        # Queen message dispatch table
+        self.dispatcher = Dispatcher({
+            "APPEND_ENTRIES": self.handle_append_entries,
+            "NEIGHBOR_UPDATE": self.handle_neighbor_update,
+            "BLOCK_ASSIGNMENT": self.handle_block_assignment,
+            "BLOCK_PART": self.handle_block_part,
+            "SHARD_ASSIGNMENT": self.handle_shard_assignment,
+            "RESULT_SIGNATURE": self.handle_result_signature
+        }, telemetry=self.telemetry)
+        
+    async def shutdown(self):
+        print("\n[BEE] Shutting down gracefully...")
+        try:
+            if self.websocket:
+                goodbye = {"type": "GOODBYE", "beeId": self.bee_id}
+                await self.websocket.send(json.dumps(goodbye))
+                print("[BEE] Sent GOODBYE to Hive.")
+        except:
+            pass
+        finally:
+            # The reader's stop watcher closes the socket
+            self.stop_event.set()
         
     async def promote_to_queen(self):
         print("[HA] I am initializing Queen Protocols...")
@@ -226,35 +288,316 @@ class WorkerBee:
                 await asyncio.sleep(2)
         loop.create_task(broadcast_beacon())
 
+    async def handle_append_entries(self, payload):
+        reply = self.raft.process_append_entries(payload)
+        if self.websocket:
+            await self.websocket.send(json.dumps(reply))
+
+    async def handle_neighbor_update(self, payload):
+        conn = payload['connectionInfo']
+        await self.mesh.connect_to(payload['direction'], p2p_host(conn['ip']), conn['port'])
+
+    async def send_to_peer(self, peer, message, timeout):
+        """Raft transport: request/reply to a Prince from shadow_state."""
+        return await self.mesh.request(p2p_host(peer['ip']), peer['p2pPort'], message, timeout)
+
+    def cell_workers(self):
+        """
+        Live workers in this Lead's cell, from the replicated hive state: the
+        Queen uses every Prince as a Lead, so workers are dealt round-robin.
+        """
+        bees = self.raft.shadow_state.get('bees', {})
+        leads = sorted(bee_id for bee_id, info in bees.items() if info.get('role') == 'PRINCE')
+        workers = sorted(bee_id for bee_id, info in bees.items() if info.get('role') == 'WORKER')
+        if self.bee_id in leads:
+            workers = workers[leads.index(self.bee_id)::len(leads)]
+        return {bee_id: bees[bee_id] for bee_id in workers}
+
+    async def handle_block_part(self, part):
+        """
+        One part of a block the Queen streams from a chunked upload (binary,
+        straight from its chunk files). Parts are copied into place as they
+        arrive; the block is handled once every byte is in. A part outside
+        the declared size, or overlapping one already received, is dropped:
+        a resent part must not count twice.
+        """
+        key = (part['jobId'], part['blockId'])
+        data = part.pop('data')
+        offset, size = part['offset'], part['size']
+        end = offset + len(data)
+        block = self.incoming_blocks.get(key)
+        if not 0 <= offset <= end <= size or (block is not None and len(block['buffer']) != size):
+            print(f"[LEAD] Dropping part {offset}+{len(data)} of block {part['blockId']}: outside the block's bytes.")
+            return
+        if block is None:
+            table = self.assignments.get(part['jobId'])
+            if table is not None and table.block_id == part['blockId']:
+                print(f"[LEAD] Dropping part {offset}+{len(data)} of block {part['blockId']}: already complete.")
+                return
+            block = self.incoming_blocks[key] = {"buffer": bytearray(size), "parts": {}} # offset -> length
+        if offset in block['parts'] or any(start < end and offset < start + length for start, length in block['parts'].items()):
+            print(f"[LEAD] Dropping duplicate part {offset}+{len(data)} of block {part['blockId']}.")
+            return
+        block['buffer'][offset:end] = data
+        block['parts'][offset] = len(data)
+        if sum(block['parts'].values()) < size:
+            return
+        del self.incoming_blocks[key]
+        await self.handle_block_assignment({**part, "type": "BLOCK_ASSIGNMENT", "block": block['buffer']})
+
     async def handle_block_assignment(self, payload):
+        job_id = payload.get('jobId')
         print(f"[LEAD] Received Block {payload['blockId']}/{payload['totalBlocks']} from Queen.")
-        N = 3
+        cell = self.cell_workers()
+        N = GrecoLatinGenerator.choose_n(len(cell))
         gls_grid = GrecoLatinGenerator.generate_gls(N)
-        print(f"[SHARD] Generated {N}x{N} Greco-Latin Square for recursive sharding.")
+        print(f"[SHARD] {len(cell)} live workers in cell: {N}x{N} Greco-Latin Square for recursive sharding.")
+
+        # One buffer (streamed, or one decode); every shard below is a view into it
+        if 'block' in payload:
+            block = memoryview(payload['block'])
+        else:
+            block = memoryview(base64.b64decode(payload.get('data') or ""))
+        shards = micro_shards(block, gls_grid)
+        workers = sorted(cell)
+
+        table = AssignmentTable(job_id, payload['blockId'])
         parity = ParityBuffer(N*N)
-        for r in range(N):
-            for c in range(N):
-                (task_id, data_id) = gls_grid[r][c]
-                mock_shard = f"SHARD_T{task_id}_D{data_id}".encode()
-                parity.add_shard(f"{r}-{c}", mock_shard)
-                print(f"[SHARD] Dispatched Task {task_id} / Data {data_id} to cell ({r},{c})")
+        for k, (pos, (task_id, data_id, view)) in enumerate(sorted(shards.items())):
+            bee_id = workers[k % len(workers)] if workers else self.bee_id
+            table.assign(pos, bee_id, task_id, data_id, hashlib.sha256(view).hexdigest(), len(view))
+            parity.add_shard(f"{pos[0]}-{pos[1]}", view)
+        self.assignments[job_id] = table
+        self.parity_buffers[job_id] = parity
         print("[RELIABILITY] Parity XOR Buffer Initialized. Monitoring for dropouts...")
+        
+        # The quorum counts bees, not cells: one worker may hold several cells.
+        # Each signs the root over its cells' digests, which we know already.
+        step = payload.get('step', 0)
+        signers = {entry['beeId'] for entry in table.cells.values()} - {self.bee_id}
+        if signers:
+            expected = {
+                bee_id: merkle_root(shard_blocks({pos: table.cells[pos]['hash'] for pos in table.cells_of(bee_id)}))
+                for bee_id in signers
+            }
+            aggregator = SignatureAggregator(self.lymphocyte, signers, expected=expected)
+            self.aggregators[(job_id, payload['blockId'])] = aggregator
+            asyncio.create_task(self.report_cell_result(payload, table, aggregator, step))
+        else:
+            print("[IMMUNE] No workers in cell; the Lead keeps every shard and nothing is aggregated.")
+
+        await self.dispatch_shards(table, shards, cell, payload.get('transport'), step)
+
+    async def dispatch_shards(self, table, shards, cell, transport=None, step=0):
+        """Sends every micro-shard to its worker concurrently, bounded by bytes in flight."""
+        budget = ByteBudget(LEAD_MAX_INFLIGHT_BYTES)
+
+        async def send(pos):
+            entry = table.cells[pos]
+            task_id, data_id, view = shards[pos]
+            if entry['beeId'] == self.bee_id:
+                self.engine.cache.put_bytes(entry['hash'], view)
+                table.mark(pos, AssignmentTable.LOCAL)
+                return
+            header = {
+                "type": "SHARD_ASSIGNMENT",
+                "jobId": table.job_id,
+                "blockId": table.block_id,
+                "leadId": self.bee_id,
+                "cell": list(pos),
+                "taskId": task_id,
+                "dataId": data_id,
+                "hash": entry['hash'],
+                "transport": transport,
+                # The worker signs once it holds all of its cells for this step
+                "step": step,
+                "cells": len(table.cells_of(entry['beeId']))
+            }
+            peer = cell[entry['beeId']]
+            reserved = await budget.acquire(len(view))
+            try:
+                table.mark(pos, AssignmentTable.SENT)
+                reply = await self.mesh.request(
+                    p2p_host(peer['ip']), peer['p2pPort'], encode_shard(header, view), SHARD_ACK_TIMEOUT_SEC
+                )
+            finally:
+                await budget.release(reserved)
+            acked = bool(reply) and reply.get('type') == 'SHARD_ACK' and reply.get('hash') == entry['hash']
+            table.mark(pos, AssignmentTable.ACKED if acked else AssignmentTable.FAILED)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(pos) for pos in table.cells))
+        total = sum(entry['size'] for entry in table.cells.values())
+        print(f"[SHARD] Dispatched {len(table.cells)} shards ({total} bytes) in {(time.perf_counter() - start) * 1000:.1f} ms: {table.counts()}")
+
+    async def report_cell_result(self, payload, table, aggregator, step):
+        """
+        Waits for 2/3+1 worker signatures, then reports the cell upward. If
+        they don't come in time, the silent bees' cells are marked FAILED
+        and reported to the Queen. Bees that sent an invalid signature
+        are flagged either way.
+        """
+        job_id = payload.get('jobId')
+        try:
+            aggregate = await aggregator.wait_for_quorum(step, CELL_RESULT_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            missing = sorted(aggregator.missing(step))
+            cells = [cell for bee_id in missing for cell in table.cells_of(bee_id)]
+            for cell in cells:
+                table.mark(cell, AssignmentTable.FAILED)
+            print(f"[IMMUNE] Cell quorum missed ({aggregator.cell_size - len(missing)}/{aggregator.cell_size} signed, {aggregator.quorum} needed). Reporting {len(cells)} cells FAILED.")
+            report = {
+                "type": "CELL_TIMEOUT",
+                "beeId": self.bee_id,
+                "jobId": job_id,
+                "blockId": payload['blockId'],
+                "step": step,
+                "missing": missing,
+                "cells": [list(cell) for cell in cells]
+            }
+        else:
+            print(f"[IMMUNE] Cell quorum reached ({len(aggregate['signers'])}/{aggregate['cellSize']}). Root: {aggregate['root'][:8]}...")
+            report = {
+                "type": "CELL_RESULT",
+                "beeId": self.bee_id,
+                "jobId": job_id,
+                "blockId": payload['blockId'],
+                **aggregate
+            }
+        finally:
+            key = (job_id, payload['blockId'])
+            if self.aggregators.get(key) is aggregator:
+                del self.aggregators[key]
+        for bee_id in sorted(aggregator.rejected.get(step, ())):
+            await self.flags.report_malice(bee_id, f"invalid result signature for job {job_id}")
+        if self.websocket:
+            await self.websocket.send(json.dumps(report))
+
+    async def handle_result_signature(self, report):
+        aggregator = self.aggregators.get((report.get('jobId'), report.get('blockId')))
+        if aggregator:
+            await aggregator.submit(report)
+        # The acknowledgement a worker's mesh.request waits for
+        return {"type": "SIGNATURE_ACK", "beeId": self.bee_id, "jobId": report.get('jobId'), "step": report.get('step'), "accepted": aggregator is not None}
+
+    async def send_result_signature(self, report):
+        """
+        Straight to the Lead that aggregates our cell (address from the
+        replicated hive state); the Queen gets a copy as the step's
+        completion notice.
+        """
+        lead_id = report.get('leadId')
+        if lead_id == self.bee_id:
+            await self.handle_result_signature(report)
+        else:
+            lead = self.raft.shadow_state.get('bees', {}).get(lead_id)
+            if lead and lead.get('p2pPort'):
+                reply = await self.mesh.request(p2p_host(lead['ip']), lead['p2pPort'], report)
+                if not reply or not reply.get('accepted'):
+                    print(f"[IMMUNE] Lead {lead_id} did not accept our result signature.")
+        if self.websocket:
+            await self.websocket.send(json.dumps(report))
 
     async def handle_shard_assignment(self, payload):
         print(f"[WORKER] Received Shard Assignment (Task {payload['taskId']}) from Lead.")
-        self.engine.load_shard(payload['fragment']) 
+        if 'fragment' not in payload:
+            return self.store_micro_shard(payload)
+        async with self.engine_lock:
+            await self.run_fragment(payload)
+
+    async def run_fragment(self, payload):
+        try:
+            self.engine.load_shard(payload['fragment'])
+        except ShardMissingError as e:
+            # Hash-only assignment for a block we no longer hold: ask for the bytes
+            print(f"[CACHE] Shard {e.digest[:8]} not held locally. Requesting full block.")
+            if self.websocket:
+                await self.websocket.send(json.dumps({
+                    "type": "SHARD_MISS",
+                    "beeId": self.bee_id,
+                    "taskId": payload['taskId'],
+                    "jobId": payload['fragment'].get('jobId'),
+                    "step": payload.get('step', 0),
+                    "hash": e.digest
+                }))
+            return
+        job_id = self.engine.job_id
         
-        self.engine.step()
+        async def pulse(step, payload_A, payload_B):
+            # Blocks wait for queue space rather than being dropped; a
+            # neighbour that never drains them ends the run below
+            await asyncio.wait_for(asyncio.gather(
+                self.mesh.pulse("WEST", {"type": "PULSE_DATA", "jobId": job_id, "step": step + 1, "direction": "WEST", "payload": payload_A}),
+                self.mesh.pulse("NORTH", {"type": "PULSE_DATA", "jobId": job_id, "step": step + 1, "direction": "NORTH", "payload": payload_B}),
+                self.stealer.advertise(job_id, step)
+            ), PULSE_TIMEOUT_SEC)
         
-        # Sign Result
-        result_hash = self.lymphocyte.sign("RESULT_DATA_MOCK")
-        print(f"[IMMUNE] Signed Result: {result_hash[:8]}...")
+        async def receive(step):
+            inputs = await self.pacemaker.wait_for_step(step + 1, max_wait=PULSE_TIMEOUT_SEC, job_id=job_id)
+            return inputs['EAST']['payload'], inputs['SOUTH']['payload']
         
-        payload_A, payload_B = self.engine.get_pulse_payloads()
-        await self.mesh.pulse("WEST", {"type": "PULSE_DATA", "step": 1, "payload": payload_A})
-        await self.mesh.pulse("NORTH", {"type": "PULSE_DATA", "step": 1, "payload": payload_B})
+        try:
+            await self.engine.run_cannon(pulse, receive, self.stealer.offload)
+        except asyncio.TimeoutError as e:
+            # Frees engine_lock for the next assignment; the Queen can reassign this one
+            print(f"[PULSE] Cannon run for task {payload['taskId']} abandoned: {e or 'blocks not sent in time'}")
+            if self.websocket:
+                await self.websocket.send(json.dumps({
+                    "type": "SHARD_FAILED",
+                    "beeId": self.bee_id,
+                    "taskId": payload['taskId'],
+                    "jobId": job_id,
+                    "step": payload.get('step', 0),
+                    "reason": str(e) or "pulse timeout"
+                }))
+            return
+        finally:
+            # Only this job's steps: a neighbour's first pulses for the next
+            # job may already be buffered, ahead of our own assignment
+            self.pacemaker.finish(job_id)
+        wait = self.pacemaker.stats()
+        print(f"[PULSE] Cannon complete after {self.engine.grid_size} systolic rounds. Pacemaker wait p50 {wait['waitP50']*1000:.1f} ms / p99 {wait['waitP99']*1000:.1f} ms.")
+        if self.engine.transport.enabled:
+            stats = self.engine.transport.metrics()
+            print(f"[PULSE] Transport {stats['mode']}+{stats['lossless']}: {stats['wireBytes']} bytes on the wire ({stats['ratio']:.2f}x), encode {stats['encodeSeconds']*1000:.1f} ms / decode {stats['decodeSeconds']*1000:.1f} ms.")
         
-        print(f"[PULSE] Systolic Pulse Fired (West/North). Waiting for Quorum...")
+        # Sign Result: one signature over the Merkle root of this step's result blocks
+        report = self.lymphocyte.sign_batch(payload.get('step', 0), self.engine.result_blocks())
+        report.update({"jobId": job_id, "blockId": payload.get('blockId'), "leadId": payload.get('leadId')})
+        print(f"[IMMUNE] Signed Result Root: {report['root'][:8]}...")
+        await self.send_result_signature(report)
+
+    def store_micro_shard(self, payload):
+        """Caches a Lead's raw micro-shard under its hash; the reply is the ACK."""
+        digest = hashlib.sha256(payload['data']).hexdigest()
+        reply = {"type": "SHARD_ACK", "beeId": self.bee_id, "jobId": payload.get('jobId'), "cell": payload.get('cell'), "hash": digest}
+        if digest != payload.get('hash'):
+            reply['type'] = "SHARD_NACK"
+            return reply
+        self.engine.cache.put_bytes(digest, payload['data'])
+        self.note_micro_shard(payload, digest)
+        return reply
+
+    def note_micro_shard(self, payload, digest):
+        """
+        Once every cell the Lead dealt us for a block is in, signs the
+        Merkle root over their digests and sends it to the Lead, whose
+        aggregator counts it towards the cell's quorum.
+        """
+        now = time.monotonic()
+        for key in [key for key, held in self.held_shards.items() if now - held['at'] > CELL_RESULT_TIMEOUT_SEC]:
+            del self.held_shards[key] # the Lead stopped waiting for these long ago
+        key = (payload.get('jobId'), payload.get('blockId'))
+        held = self.held_shards.setdefault(key, {"at": now, "hashes": {}})
+        held['hashes'][tuple(payload['cell'])] = digest # a resent cell replaces itself
+        if len(held['hashes']) < payload.get('cells', 1):
+            return
+        del self.held_shards[key]
+        report = self.lymphocyte.sign_batch(payload.get('step', 0), shard_blocks(held['hashes']))
+        report.update({"jobId": key[0], "blockId": key[1], "leadId": payload.get('leadId')})
+        print(f"[IMMUNE] Signed {len(held['hashes'])} micro-shards of block {key[1]}: root {report['root'][:8]}...")
+        # After our ACK goes out: the Lead is still waiting on that reply
+        asyncio.create_task(self.send_result_signature(report))
 
     async def handle_p2p_message(self, data):
         """Callback for incoming P2P messages"""
@@ -266,36 +609,94 @@ class WorkerBee:
             return
 
         if data['type'] == 'PULSE_DATA':
-            # Pacemaker logic would go here
-            pass
+            # A pulse sent WEST arrives on our EAST side, NORTH on our SOUTH side
+            self.pacemaker.enqueue(OPPOSITE[data['direction']], data)
             
-        elif data['type'] == 'GOSSIP_FLAG':
-             print(f"[IMMUNE] Received GOSSIP about {data['targetId']}: {data['reason']}")
-             self.bloom.add(data['targetId'])
-             # Propagate? (TTL logic needed in real impl to prevent loops)
+        elif data['type'] in ('GOSSIP_FLAG', 'GOSSIP_BATCH', 'GOSSIP_DIGEST'):
+            await self.flags.handle_message(data)
+
+        elif data['type'] == 'RESULT_SIGNATURE':
+            return await self.handle_result_signature(data)
+
+        elif data['type'] == 'STEAL_OFFER':
+            self.stealer.handle_offer(data)
+
+        elif data['type'] == 'STEAL_TASK':
+            self.stealer.handle_task(data)
+
+        elif data['type'] == 'STEAL_RESULT':
+            self.stealer.handle_result(data)
+
+        elif data['type'] == 'COLLECTIVE':
+            self.collective.handle_message(data)
+
+        elif data['type'] == 'SHARD_ASSIGNMENT':
+            return await self.handle_shard_assignment(data)
+
+        # Raft between Princes: the reply goes back on the same connection
+        elif data['type'] == 'REQUEST_VOTE':
+            return self.raft.process_request_vote(data)
+
+        elif data['type'] == 'APPEND_ENTRIES':
+            return self.raft.process_append_entries(data)
+
+    async def heartbeat_loop(self, websocket):
+        """Spike-protocol heartbeat on its own timer, off the receive path."""
+        last_telemetry, telemetry_sent_at = None, 0.0
+        while True:
+            await asyncio.sleep(HEARTBEAT_CHECK_SEC)
+            should_send, metrics = self.monitor.should_pulse()
+            telemetry = self.telemetry.summary()
+            if not should_send and telemetry != last_telemetry and time.time() - telemetry_sent_at >= TELEMETRY_INTERVAL_SEC:
+                should_send, metrics = True, self.monitor.capture_metrics()
+            if should_send:
+                self.engine.cache.set_budget_from_metrics(metrics)
+                payload = {"type": "HEARTBEAT", "beeId": self.bee_id, "metrics": metrics}
+                if self.engine.transport.enabled:
+                    payload['transport'] = self.engine.transport.metrics()
+                if telemetry is not None:
+                    payload['telemetry'] = telemetry
+                    last_telemetry, telemetry_sent_at = telemetry, time.time()
+                await websocket.send(json.dumps(payload))
 
     async def run(self):
         # Register signals
         loop = asyncio.get_running_loop()
         for sig in (signal.SIGINT, signal.SIGTERM):
             loop.add_signal_handler(sig, lambda: asyncio.create_task(self.shutdown()))
+        await self.serve()
 
+    async def serve(self, queen_uri=None):
+        """Joins the Hive and runs until the Queen connection ends. Without queen_uri, finds the Queen over UDP."""
         p2p_port = await self.mesh.start_server()
+        # Measured once per machine (cached on disk), before we ask for a cell
+        self.capability = await asyncio.to_thread(load_or_probe, self.engine.device)
+        gflops = ", ".join(f"{dtype} {rate:.0f}" for dtype, rate in self.capability['matmulGflops'].items())
+        print(f"[PROBE] {self.engine.device}: {gflops} GFLOPS, memory {self.capability['memoryGBs']:.1f} GB/s, "
+              f"frames {self.capability['serializationMBs']:.0f} MB/s{' (cached)' if self.capability['cached'] else ''}")
+        self.raft_store.start()
+        self.flags.start()
+        asyncio.create_task(self.monitor.run())
         
         # ... discovery ...
         
         try:
-            queen_ip, queen_port = await DiscoveryChain.listen_udp()
-            self.queen_uri = f"ws://{queen_ip}:{queen_port}"
-            if queen_ip == "127.0.0.1": self.queen_uri = f"ws://localhost:{queen_port}"
+            if queen_uri:
+                self.queen_uri = queen_uri
+            else:
+                queen_ip, queen_port = await DiscoveryChain.listen_udp()
+                self.queen_uri = f"ws://{queen_ip}:{queen_port}"
+                if queen_ip == "127.0.0.1": self.queen_uri = f"ws://localhost:{queen_port}"
             
             print(f"[BEE] Connecting to Hive at {self.queen_uri}...")
             
-            async with websockets.connect(self.queen_uri) as websocket:
+            # Assignments carry whole blocks: lift the 1 MiB default like the mesh does
+            async with websockets.connect(self.queen_uri, max_size=MAX_MESSAGE_BYTES) as websocket:
                 self.websocket = websocket
                 
                 # ... handshake ...
                 initial_metrics = self.monitor.capture_metrics()
+                initial_metrics['capability'] = self.capability
                 handshake = {
                     "type": "HANDSHAKE",
                     "beeId": self.bee_id,
@@ -314,57 +715,39 @@ class WorkerBee:
                     
                     if self.role == 'PRINCE':
                         print("[HA] Monitoring Hive Heartbeats...")
-                        asyncio.create_task(self.raft.run_election_loop(None, self.promote_to_queen))
+                        self.raft.start_election_timer(self.send_to_peer, self.promote_to_queen)
                 else:
                     return
 
-                while not self.stop_event.is_set():
-                    try:
-                        # Use wait_for with the websocket recv
-                        # But we also need to check stop_event
-                        # We can race recv() and stop_event.wait()
-                        
-                        recv_task = asyncio.create_task(websocket.recv())
-                        wait_task = asyncio.create_task(self.stop_event.wait())
-                        
-                        done, pending = await asyncio.wait(
-                            [recv_task, wait_task], 
-                            return_when=asyncio.FIRST_COMPLETED
-                        )
-                        
-                        if wait_task in done:
-                            recv_task.cancel()
-                            break
-
-                        message = recv_task.result()
-                        data = json.loads(message)
-                        
-                        if data.get('type') == 'APPEND_ENTRIES':
-                            self.raft.process_append_entries(data)
-                        elif data.get('type') == 'BLOCK_ASSIGNMENT':
-                            await self.handle_block_assignment(data)
-                        elif data.get('type') == 'SHARD_ASSIGNMENT':
-                            await self.handle_shard_assignment(data)
-                        elif data.get('type') == 'NEIGHBOR_UPDATE':
-                            conn = data['connectionInfo']
-                            direction = data['direction']
-                            target_ip = conn['ip'].replace("::ffff:", "")
-                            if target_ip == "127.0.0.1": target_ip = "localhost"  
-                            await self.mesh.connect_to(direction, target_ip, conn['port'])
-                            
-                    except websockets.exceptions.ConnectionClosed:
+                self.dispatcher.start()
+                heartbeat = asyncio.create_task(self.heartbeat_loop(websocket))
+                stop_watch = asyncio.create_task(self.stop_event.wait())
+                stop_watch.add_done_callback(lambda _: asyncio.create_task(websocket.close()))
+
+                # Single long-lived reader feeding the dispatch table
+                try:
+                    async for message in websocket:
+                        try:
+                            # Binary: a GBS1 frame (streamed block part)
+                            data = decode_shard(message) if isinstance(message, bytes) else json.loads(message)
+                        except (ValueError, struct.error) as e:
+                            print(f"[BEE] Malformed message from Queen: {e}")
+                            continue
+                        await self.dispatcher.submit(data)
+                except websockets.exceptions.ConnectionClosed:
+                    pass
+                finally:
+                    if not self.stop_event.is_set():
                         print("[BEE] Connection to Queen Lost!")
-                        break
-                    except Exception as e:
-                         print(f"[BEE] Error in loop: {e}")
-                         if self.stop_event.is_set(): break
-                    
-                    # Heartbeat
-                    should_send, metrics = self.monitor.should_pulse()
-                    if should_send:
-                        payload = {"type": "HEARTBEAT", "beeId": self.bee_id, "metrics": metrics}
-                        await websocket.send(json.dumps(payload))
+                    heartbeat.cancel()
+                    stop_watch.cancel()
+                    await self.dispatcher.stop()
+                    # A half-streamed block can't complete over a new connection
+                    self.incoming_blocks.clear()
         finally:
+            await self.mesh.close()
+            await self.raft_store.stop()
+            self.engine.close()
             print("[BEE] Process Terminated.")
 
 if __name__ == "__main__":
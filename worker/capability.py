@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import platform
+import socket
+import struct
+import threading
+import time
+
+import psutil
+import torch
+
+try:
+    from mesh import encode_frame, decode_frame
+except ImportError:
+    from worker.mesh import encode_frame, decode_frame
+
+# Startup capability probe: how fast this bee actually computes and moves
+# data, so the Queen can pick Princes and rows by measured speed instead of
+# free RAM. Results are cached per hardware fingerprint; a restart on the
+# same machine skips the probe. GRIDBEE_REPROBE=1 forces a fresh run.
+PROBE_VERSION = 1 # bump when the probe changes: old cache entries stop matching
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "gridbee", "capability.json")
+TEST_SECONDS = 0.25 # sustained run per measurement, after one warm-up
+MATMUL_SIZE = {"cpu": 512, "cuda": 2048, "mps": 1024}
+DTYPES = {
+    "cpu": [torch.float32, torch.bfloat16],
+    "cuda": [torch.float32, torch.float16, torch.bfloat16],
+    "mps": [torch.float32, torch.float16]
+}
+BANDWIDTH_BYTES = 64 * 1024 * 1024
+FRAME_BYTES = 4 * 1024 * 1024
+FRAME_LENGTH = struct.Struct("<I")
+
+_lock = threading.Lock()
+_probed = {} # fingerprint -> result, for bees sharing a process
+
+def _sync(device):
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    elif device == 'mps':
+        torch.mps.synchronize()
+
+def _sustained(fn, device):
+    """Calls fn repeatedly for TEST_SECONDS; returns calls per second."""
+    fn()
+    _sync(device)
+    calls, start = 0, time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        if calls % 4 == 0:
+            _sync(device)
+            elapsed = time.perf_counter() - start
+            if elapsed >= TEST_SECONDS:
+                return calls / elapsed
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+def hardware_fingerprint(device):
+    parts = [
+        PROBE_VERSION, platform.system(), platform.machine(), _cpu_model(),
+        psutil.cpu_count(logical=False), psutil.cpu_count(),
+        round(psutil.virtual_memory().total / 2 ** 30), torch.__version__,
+        device, torch.get_num_threads()
+    ]
+    if device == 'cuda':
+        parts.append(torch.cuda.get_device_name())
+    return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:16]
+
+def matmul_gflops(device):
+    """Sustained square matmul throughput per dtype; dtypes the device cannot multiply are left out."""
+    n = MATMUL_SIZE.get(device, 512)
+    results = {}
+    for dtype in DTYPES.get(device, [torch.float32]):
+        try:
+            A = torch.randn(n, n, device=device).to(dtype)
+            B = torch.randn(n, n, device=device).to(dtype)
+            C = torch.empty(n, n, device=device, dtype=dtype)
+            rate = _sustained(lambda: torch.mm(A, B, out=C), device)
+        except (RuntimeError, TypeError):
+            continue
+        results[str(dtype).replace("torch.", "")] = 2 * n ** 3 * rate / 1e9
+    return results
+
+def memory_bandwidth_gbs(device):
+    """Device copy bandwidth (read + write)."""
+    src = torch.empty(BANDWIDTH_BYTES // 4, dtype=torch.float32, device=device).fill_(1.0)
+    dst = torch.empty_like(src)
+    rate = _sustained(lambda: dst.copy_(src), device)
+    return 2 * BANDWIDTH_BYTES * rate / 1e9
+
+def serialization_mbs():
+    """
+    Pulse throughput through this host's own stack: mesh binary frames
+    encoded, sent over a loopback TCP socket, received and decoded.
+    """
+    tensor = torch.randn(FRAME_BYTES // 4)
+    server = socket.create_server(("127.0.0.1", 0))
+    port = server.getsockname()[1]
+    received = []
+
+    def read_exact(conn, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        while size:
+            n = conn.recv_into(view[-size:], size)
+            if not n:
+                raise ConnectionError("loopback closed")
+            size -= n
+        return buffer
+
+    def reader():
+        conn, _ = server.accept()
+        with conn:
+            while True:
+                (length,) = FRAME_LENGTH.unpack(read_exact(conn, FRAME_LENGTH.size))
+                if not length:
+                    break
+                received.append(decode_frame(read_exact(conn, length))['step'])
+            conn.sendall(b"\x00")
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        with socket.create_connection(("127.0.0.1", port)) as client:
+            def send_frame(step):
+                header, body = encode_frame("probe", step, "WEST", tensor)
+                client.sendall(FRAME_LENGTH.pack(len(header) + body.nbytes))
+                client.sendall(header)
+                client.sendall(body)
+
+            send_frame(0) # warm-up
+            frames, start = 0, time.perf_counter()
+            while time.perf_counter() - start < TEST_SECONDS:
+                frames += 1
+                send_frame(frames)
+            client.sendall(FRAME_LENGTH.pack(0))
+            client.recv(1)
+            elapsed = time.perf_counter() - start
+    finally:
+        thread.join(timeout=5)
+        server.close()
+    return frames * FRAME_BYTES / elapsed / 1e6
+
+def probe(device):
+    start = time.perf_counter()
+    result = {
+        "matmulGflops": matmul_gflops(device),
+        "memoryGBs": memory_bandwidth_gbs(device),
+        "serializationMBs": serialization_mbs()
+    }
+    result['probeSeconds'] = time.perf_counter() - start
+    return result
+
+def _read_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_cache(path, cache):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, path)
+
+def load_or_probe(device, path=CACHE_PATH):
+    """
+    This host's capability on `device`, probed once per hardware
+    fingerprint. Blocking (a second or two on a cache miss): run it in a
+    worker thread.
+    """
+    fingerprint = hardware_fingerprint(device)
+    reprobe = os.environ.get("GRIDBEE_REPROBE") == "1"
+    with _lock:
+        if fingerprint in _probed:
+            return _probed[fingerprint]
+        cache = _read_cache(path)
+        if fingerprint in cache and not reprobe:
+            result = {**cache[fingerprint], "cached": True}
+        else:
+            print(f"[PROBE] Measuring {device} capability (hardware {fingerprint})...")
+            result = {"fingerprint": fingerprint, "device": device, **probe(device), "probedAt": time.time()}
+            try:
+                _write_cache(path, {**_read_cache(path), fingerprint: result})
+            except OSError as e:
+                print(f"[PROBE] Could not cache the result: {e}")
+            result = {**result, "cached": False}
+        _probed[fingerprint] = result
+        return result
@@ -0,0 +1,227 @@
+import asyncio
+import math
+
+import torch
+
+from shared.telemetry import Telemetry
+
+try:
+    from mesh import encode_tensors, decode_tensors
+except ImportError:
+    from worker.mesh import encode_tensors, decode_tensors
+
+# Collectives over the torus neighbour links, with no host in the middle.
+#
+# Rings run along torus rows (send EAST, receive from WEST) and columns
+# (send SOUTH, receive from NORTH); they need the wrapped torus Cannon
+# already needs. Every bee of the ring must make the same call with the
+# same op id: messages are matched by op id, phase, step and segment.
+#
+# Large tensors: ring reduce-scatter / all-gather, and a 2-D all-reduce
+# built from them (reduce-scatter along the row, all-reduce of the owned
+# 1/cols along the column, all-gather along the row). Each link carries
+# about 2N(cols-1)/cols + 2N(rows-1)/(rows*cols) bytes for N input bytes,
+# whatever the torus size. Chunks are cut into segments that travel the
+# ring independently, so a segment is reduced and forwarded while the
+# next one is still on the wire.
+#
+# Small tensors: latency matters more than bandwidth, so they take a tree
+# of nearest-neighbour hops instead (half-rings either side of the root
+# along its row, then along its column): rows/2 + cols/2 hops each way
+# instead of 2(rows-1) + 2(cols-1) ring steps.
+SEGMENT_BYTES = 1024 * 1024
+INFLIGHT_SEGMENTS = 8 # per ring pass; keeps the neighbour send queues from filling
+TREE_MAX_BYTES = 64 * 1024 # all_reduce picks the tree at or below this
+TIMEOUT_SEC = 30.0
+
+AXES = {
+    # axis -> (towards higher index, towards lower index)
+    "row": ("EAST", "WEST"),
+    "col": ("SOUTH", "NORTH")
+}
+
+class CollectiveError(Exception):
+    """A peer's part of a collective did not arrive in time."""
+
+class Collective:
+    """
+    Ring and tree collectives for one bee. coords is (i, j) on a
+    rows x cols torus; results are new tensors, inputs are left as they are.
+    """
+    def __init__(self, mesh, telemetry=None, timeout=TIMEOUT_SEC):
+        self.mesh = mesh
+        self.timeout = timeout
+        self.inbox = {} # message key -> Future (created by whichever side gets there first)
+
+        telemetry = telemetry or Telemetry()
+        self.times = {kind: telemetry.histogram(f"collective.{kind}") for kind in ("ring", "tree", "reduceScatter", "allGather")}
+        self.sent_bytes = telemetry.counter("collective.txBytes")
+
+    # Transport
+
+    def handle_message(self, data):
+        future = self._slot(data['key'])
+        if not future.done():
+            future.set_result(decode_tensors(data)[0])
+
+    def _slot(self, key):
+        if key not in self.inbox:
+            self.inbox[key] = asyncio.get_running_loop().create_future()
+        return self.inbox[key]
+
+    async def _receive(self, key):
+        future = self._slot(key)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise CollectiveError(f"Nothing received for {key} within {self.timeout:.0f}s") from None
+        finally:
+            self.inbox.pop(key, None)
+
+    async def _send(self, direction, key, tensor):
+        link = self.mesh.links.get(direction)
+        if link is None:
+            raise CollectiveError(f"No {direction} neighbour for {key}")
+        # A copy: the frame may still be queued when the caller writes to the result
+        frame = encode_tensors({"type": "COLLECTIVE", "key": key}, [tensor.detach().to('cpu', copy=True)])
+        await link.put(frame)
+        self.sent_bytes.inc(tensor.numel() * tensor.element_size())
+
+    # Rings
+
+    @staticmethod
+    def _segments(chunks):
+        """Each chunk cut into the same number of segments, so segment s of one chunk pairs with segment s of any other."""
+        largest = max(chunk.numel() * chunk.element_size() for chunk in chunks)
+        count = max(1, math.ceil(largest / SEGMENT_BYTES))
+        return [torch.tensor_split(chunk, count) for chunk in chunks]
+
+    async def _ring(self, chunks, rank, size, axis, key, phase):
+        """
+        Ring pass over chunks (1-D views, modified in place), rank sending
+        to rank + 1. "rs": reduce-scatter, after which chunks[rank] holds the
+        sum over the ring. "ag": all-gather, starting from chunks[rank] and
+        ending with every chunk filled in.
+        """
+        if size == 1:
+            return
+        forward = AXES[axis][0]
+        segments = self._segments(chunks)
+        inflight = asyncio.Semaphore(INFLIGHT_SEGMENTS)
+
+        async def travel(segment):
+            async with inflight:
+                await hops(segment)
+
+        async def hops(segment):
+            for step in range(size - 1):
+                if phase == "rs":
+                    send, receive = (rank - step - 1) % size, (rank - step - 2) % size
+                else:
+                    send, receive = (rank - step) % size, (rank - step - 1) % size
+                message = f"{key}/{phase}-{axis}/{step}/{segment}"
+                sending = asyncio.create_task(self._send(forward, message, segments[send][segment]))
+                incoming = await self._receive(message)
+                await sending
+                target = segments[receive][segment]
+                if phase == "rs":
+                    target.add_(incoming.to(target.device))
+                else:
+                    target.copy_(incoming)
+
+        await asyncio.gather(*(travel(segment) for segment in range(len(segments[0]))))
+
+    async def reduce_scatter(self, tensor, key, axis, rank, size):
+        """Sums tensor over the ring and returns this rank's part of the sum (tensor_split along dim 0)."""
+        with self.times["reduceScatter"].time():
+            flat_parts = [part.reshape(-1) for part in torch.tensor_split(tensor.detach().clone(), size)]
+            await self._ring(flat_parts, rank, size, axis, key, "rs")
+            return flat_parts[rank].reshape(torch.tensor_split(tensor, size)[rank].shape)
+
+    async def all_gather(self, tensor, key, axis, rank, size):
+        """Every rank's tensor (all the same shape), stacked in rank order."""
+        with self.times["allGather"].time():
+            out = torch.empty((size, *tensor.shape), dtype=tensor.dtype, device=tensor.device)
+            out[rank] = tensor
+            await self._ring([part.reshape(-1) for part in out], rank, size, axis, key, "ag")
+            return out
+
+    async def ring_all_reduce(self, tensor, key, coords, shape):
+        """2-D torus all-reduce: bandwidth-optimal for large tensors."""
+        (i, j), (rows, cols) = coords, shape
+        with self.times["ring"].time():
+            flat = tensor.detach().reshape(-1).clone()
+            row_chunks = list(torch.tensor_split(flat, cols))
+            await self._ring(row_chunks, j, cols, "row", key, "rs")
+            # Our 1/cols of the row sum, summed down the column
+            col_chunks = list(torch.tensor_split(row_chunks[j], rows))
+            await self._ring(col_chunks, i, rows, "col", key, "rs")
+            await self._ring(col_chunks, i, rows, "col", key, "ag")
+            await self._ring(row_chunks, j, cols, "row", key, "ag")
+            return flat.reshape(tensor.shape)
+
+    # Tree
+
+    @staticmethod
+    def _chain(position, root, size):
+        """
+        Position on the half-rings either side of root: returns (parent
+        side, child sides), a side being +1 (higher index) or -1. The root
+        has no parent.
+        """
+        distance = (position - root) % size
+        up_max = size // 2 # farthest bee on the higher-index side
+        down_max = size - 1 - up_max
+        if distance == 0:
+            return None, [side for side, reach in ((1, up_max), (-1, down_max)) if reach]
+        if distance <= up_max:
+            return -1, [1] if distance < up_max else []
+        return 1, [-1] if size - distance < down_max else []
+
+    async def _tree_pass(self, tensor, position, root, size, axis, key, reduce):
+        """One axis of the tree: children's sums flow to root (reduce) or root's value flows out (broadcast)."""
+        if size == 1:
+            return tensor
+        parent, children = self._chain(position, root, size)
+        directions = AXES[axis]
+        side_direction = {1: directions[0], -1: directions[1]}
+        phase = "reduce" if reduce else "bcast"
+        if reduce:
+            for side in children:
+                child = (position + side) % size
+                tensor.add_(await self._receive(f"{key}/tree-{phase}-{axis}/{child}"))
+            if parent is not None:
+                await self._send(side_direction[parent], f"{key}/tree-{phase}-{axis}/{position}", tensor)
+            return tensor
+        if parent is not None:
+            parent_position = (position + parent) % size
+            tensor.copy_(await self._receive(f"{key}/tree-{phase}-{axis}/{parent_position}"))
+        await asyncio.gather(*(
+            self._send(side_direction[side], f"{key}/tree-{phase}-{axis}/{position}", tensor)
+            for side in children
+        ))
+        return tensor
+
+    async def tree_reduce(self, tensor, key, coords, shape, root=(0, 0), broadcast=True):
+        """
+        Sum over the torus along a nearest-neighbour tree rooted at root.
+        With broadcast every bee gets the sum (a tree all-reduce); without,
+        only the root does and the others get None.
+        """
+        (i, j), (rows, cols), (ri, rj) = coords, shape, root
+        with self.times["tree"].time():
+            total = tensor.detach().clone()
+            await self._tree_pass(total, j, rj, cols, "row", key, reduce=True)
+            if j == rj:
+                await self._tree_pass(total, i, ri, rows, "col", key, reduce=True)
+            if not broadcast:
+                return total if (i, j) == (ri, rj) else None
+            if j == rj:
+                await self._tree_pass(total, i, ri, rows, "col", key, reduce=False)
+            return await self._tree_pass(total, j, rj, cols, "row", key, reduce=False)
+
+    async def all_reduce(self, tensor, key, coords, shape):
+        """Sum of tensor over the whole torus, on every bee: tree for small tensors, 2-D ring otherwise."""
+        if tensor.numel() * tensor.element_size() <= TREE_MAX_BYTES:
+            return await self.tree_reduce(tensor, key, coords, shape)
+        return await self.ring_all_reduce(tensor, key, coords, shape)
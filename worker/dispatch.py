@@ -0,0 +1,75 @@
+import asyncio
+
+from shared.telemetry import Telemetry
+
+# Messages that keep the hive alive; they must never wait behind compute
+CONTROL_PLANE = {"APPEND_ENTRIES", "NEIGHBOR_UPDATE", "REQUEST_VOTE", "VOTE_ACK"}
+
+class Dispatcher:
+    """
+    Routes decoded messages through a type -> handler table.
+
+    Each message class (control / data) has its own queue and a fixed pool
+    of worker tasks, which bounds how many handlers of that class run at
+    once. Control-plane messages get dedicated workers, so a long shard
+    computation can't hold back APPEND_ENTRIES.
+    """
+    def __init__(self, handlers, control_types=CONTROL_PLANE, control_workers=4, data_workers=2, data_queue_size=0, telemetry=None):
+        self.handlers = handlers
+        self.control_types = set(control_types)
+        self.workers = {"control": control_workers, "data": data_workers}
+        self.queues = {
+            "control": asyncio.Queue(),
+            "data": asyncio.Queue(maxsize=data_queue_size)
+        }
+        self.tasks = []
+
+        self.processed = {"control": 0, "data": 0}
+        self.unhandled = 0
+        self.errors = 0
+        # Handler latency per message type
+        self.telemetry = telemetry or Telemetry()
+        self.latency = {msg_type: self.telemetry.histogram(f"handler.{msg_type}") for msg_type in handlers}
+
+    def start(self):
+        for cls, count in self.workers.items():
+            self.tasks.extend(asyncio.create_task(self._worker(cls)) for _ in range(count))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def _latency(self, msg_type):
+        if msg_type not in self.latency: # handler registered after construction
+            self.latency[msg_type] = self.telemetry.histogram(f"handler.{msg_type}")
+        return self.latency[msg_type]
+
+    def message_class(self, msg_type):
+        return "control" if msg_type in self.control_types else "data"
+
+    async def submit(self, data):
+        handler = self.handlers.get(data.get('type'))
+        if handler is None:
+            self.unhandled += 1
+            return
+        await self.queues[self.message_class(data['type'])].put((handler, data))
+
+    async def join(self):
+        """Waits until every submitted message has been handled."""
+        await asyncio.gather(*(queue.join() for queue in self.queues.values()))
+
+    async def _worker(self, cls):
+        queue = self.queues[cls]
+        while True:
+            handler, data = await queue.get()
+            try:
+                with self._latency(data['type']).time():
+                    await handler(data)
+            except Exception as e:
+                self.errors += 1
+                print(f"[BEE] Handler for {data.get('type')} failed: {e}")
+            finally:
+                self.processed[cls] += 1
+                queue.task_done()
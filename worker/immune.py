@@ -1,19 +1,203 @@
+import asyncio
+import base64
 import hashlib
 import json
+import math
+import struct
+import time
+import uuid
+from collections import OrderedDict
+
+try:
+    from mesh import OPPOSITE, DIRECTIONS
+except ImportError:
+    from worker.mesh import OPPOSITE, DIRECTIONS
 
 class BloomFilter:
     """
-    Simplified probabilistic data structure for blacklisting.
-    Uses a python set for POC instead of bitarray to reduce dependencies.
+    Probabilistic data structure for blacklisting.
+    Fixed-size bit array sized from expected capacity and target false
+    positive rate; k bit positions per item come from one digest via double
+    hashing (h1 + i*h2). Memory and lookup cost do not grow with the
+    number of flagged IDs.
     """
-    def __init__(self):
-        self.blacklist = set()
-        
+    HEADER = struct.Struct("<QBQ") # num_bits, num_hashes, count
+
+    def __init__(self, capacity=100_000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.num_bits = max(8, (bits + 7) // 8 * 8)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray(self.num_bits // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def _set(self, positions):
+        for pos in positions:
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def _test(self, positions):
+        bits = self.bits
+        for pos in positions:
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
     def add(self, item):
-        self.blacklist.add(item)
-        
+        self._set(self._positions(item))
+        self.count += 1
+
+    def __contains__(self, item):
+        return self._test(self._positions(item))
+
+    def _check_compatible(self, other):
+        if (self.num_bits, self.num_hashes) != (other.num_bits, other.num_hashes):
+            raise ValueError("Bloom filters must share size and hash count to merge")
+
+    def union(self, other):
+        """Returns a new filter holding both sets (one bitwise OR)."""
+        self._check_compatible(other)
+        merged = BloomFilter.__new__(BloomFilter)
+        merged.__dict__.update(self.__dict__)
+        merged.bits = bytearray(
+            (int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little"))
+            .to_bytes(len(self.bits), "little")
+        )
+        merged.count = self.count + other.count
+        return merged
+
+    def copy(self):
+        clone = BloomFilter.__new__(BloomFilter)
+        clone.__dict__.update(self.__dict__)
+        clone.bits = bytearray(self.bits)
+        return clone
+
+    def update(self, other):
+        """In-place union."""
+        merged = self.union(other)
+        self.bits, self.count = merged.bits, merged.count
+
+    def to_bytes(self):
+        return self.HEADER.pack(self.num_bits, self.num_hashes, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        num_bits, num_hashes, count = cls.HEADER.unpack_from(data)
+        bloom = cls.__new__(cls)
+        bloom.capacity = None
+        bloom.error_rate = None
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.bits = bytearray(data[cls.HEADER.size:cls.HEADER.size + num_bits // 8])
+        bloom.count = count
+        return bloom
+
+class SlicedBloomFilter:
+    """
+    Time-sliced Bloom filter so quarantines expire.
+    Keeps `slices` generations, each covering ttl / slices seconds of
+    additions; the oldest generation is dropped as time moves on, so an ID
+    is forgotten between ttl * (slices-1)/slices and ttl after its last flag.
+    Slices are aligned to wall-clock epochs so two bees can merge them.
+
+    capacity is per generation (IDs flagged within one slice). A lookup
+    tests every generation, so error_rate is split between them: each one
+    is sized for error_rate / slices.
+    """
+    def __init__(self, capacity=100_000, error_rate=0.001, ttl=3600, slices=4):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ttl = ttl
+        self.slice_span = ttl / slices
+        self.num_slices = slices
+        self.generations = {} # epoch -> BloomFilter
+
+    def _epoch(self, now=None):
+        return int((time.time() if now is None else now) // self.slice_span)
+
+    def _rotate(self, now=None):
+        oldest = self._epoch(now) - self.num_slices + 1
+        for epoch in [e for e in self.generations if e < oldest]:
+            del self.generations[epoch]
+
+    def _current(self):
+        epoch = self._epoch()
+        if epoch not in self.generations:
+            self._rotate()
+            self.generations[epoch] = BloomFilter(self.capacity, self.error_rate / self.num_slices)
+        return self.generations[epoch]
+
+    def add(self, item):
+        self._current().add(item)
+
     def __contains__(self, item):
-        return item in self.blacklist
+        if not self.generations:
+            return False
+        self._rotate()
+        positions = None
+        for bloom in self.generations.values():
+            if positions is None:
+                positions = bloom._positions(item)
+            if bloom._test(positions):
+                return True
+        return False
+
+    def union(self, other):
+        merged = SlicedBloomFilter(self.capacity, self.error_rate, self.ttl, self.num_slices)
+        merged.generations = {epoch: bloom.copy() for epoch, bloom in self.generations.items()}
+        merged.update(other)
+        return merged
+
+    def update(self, other):
+        for epoch, bloom in other.generations.items():
+            if epoch in self.generations:
+                self.generations[epoch] = self.generations[epoch].union(bloom)
+            else:
+                # Our own copy: later adds here must not show up in other
+                self.generations[epoch] = bloom.copy()
+        self._rotate()
+
+    def to_bytes(self):
+        self._rotate()
+        parts = [struct.pack("<dI", self.ttl, self.num_slices)]
+        for epoch, bloom in self.generations.items():
+            blob = bloom.to_bytes()
+            parts.append(struct.pack("<qI", epoch, len(blob)))
+            parts.append(blob)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, capacity=100_000, error_rate=0.001):
+        ttl, slices = struct.unpack_from("<dI", data)
+        sliced = cls(capacity, error_rate, ttl, slices)
+        offset = struct.calcsize("<dI")
+        while offset < len(data):
+            epoch, size = struct.unpack_from("<qI", data, offset)
+            offset += struct.calcsize("<qI")
+            sliced.generations[epoch] = BloomFilter.from_bytes(data[offset:offset + size])
+            offset += size
+        sliced._rotate()
+        return sliced
+
+def merkle_root(blocks):
+    """
+    Merkle root (hex) over a list of bytes-like blocks. Leaves and inner
+    nodes are domain separated; an odd node is paired with itself.
+    """
+    level = [hashlib.sha256(b"\x00" + bytes(block)).digest() for block in blocks]
+    if not level:
+        return hashlib.sha256(b"\x00").hexdigest()
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
 
 class Lymphocyte:
     """
@@ -38,25 +222,274 @@ class Lymphocyte:
         expected_sig = hashlib.sha256(expected_payload.encode()).hexdigest()
         return signature == expected_sig
 
+    def sign_batch(self, step, blocks):
+        """
+        One signature per step: signs the Merkle root over all result blocks.
+        Returns the RESULT_SIGNATURE report a Lead aggregates.
+        """
+        root = merkle_root(blocks)
+        return {
+            "type": "RESULT_SIGNATURE",
+            "beeId": self.bee_id,
+            "step": step,
+            "root": root,
+            "signature": self.sign(f"{step}:{root}")
+        }
+
+    def verify_batch(self, reports):
+        """Verifies many RESULT_SIGNATURE reports; returns a list of bools."""
+        return [
+            self.verify(f"{r['step']}:{r['root']}", r['signature'], r['beeId'])
+            for r in reports
+        ]
+
+class SignatureAggregator:
+    """
+    Lead-side collection of worker signatures for one cell.
+    signers are the distinct bees the Lead assigned shards to; the quorum is
+    2/3 + 1 of them (not of the N x N cells: one bee may hold several).
+    Reports for a step are verified in a thread pool as they arrive, in
+    micro-batches; once the quorum has valid signatures the step's quorum
+    future resolves with an aggregate the Lead reports upward.
+    expected ({beeId: root}, optional) is what each bee should have signed:
+    a valid signature over any other root counts as rejected.
+    """
+    def __init__(self, lymphocyte, signers, executor=None, expected=None):
+        self.lymphocyte = lymphocyte
+        self.signers = set(signers)
+        self.expected = expected or {}
+        self.cell_size = len(self.signers)
+        self.quorum = (2 * self.cell_size) // 3 + 1
+        self.executor = executor # None -> loop's default ThreadPoolExecutor
+
+        self.pending = [] # reports awaiting verification
+        self.verifier = None # task draining self.pending
+        self.valid = {} # step -> {beeId: root}
+        self.rejected = {} # step -> set(beeId)
+        self.quorums = {} # step -> Future(aggregate)
+
+    def _future(self, step):
+        if step not in self.quorums:
+            self.quorums[step] = asyncio.get_running_loop().create_future()
+        return self.quorums[step]
+
+    async def submit(self, report):
+        """Queues one report; verification happens off the event loop."""
+        self._future(report['step'])
+        self.pending.append(report)
+        if self.verifier is None or self.verifier.done():
+            self.verifier = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while self.pending:
+            batch, self.pending = self.pending, []
+            results = await loop.run_in_executor(self.executor, self.lymphocyte.verify_batch, batch)
+            for report, ok in zip(batch, results):
+                self._record(report, ok)
+
+    def _record(self, report, ok):
+        step, bee_id = report['step'], report['beeId']
+        if bee_id not in self.signers:
+            print(f"[IMMUNE] Ignoring result signature from {bee_id}: not assigned to this cell")
+            return
+        if not ok:
+            self.rejected.setdefault(step, set()).add(bee_id)
+            print(f"[IMMUNE] Invalid result signature from {bee_id} (step {step})")
+            return
+        if bee_id in self.expected and report['root'] != self.expected[bee_id]:
+            self.rejected.setdefault(step, set()).add(bee_id)
+            print(f"[IMMUNE] {bee_id} signed root {report['root'][:8]}..., not the shards it was sent (step {step})")
+            return
+
+        signers = self.valid.setdefault(step, {})
+        signers[bee_id] = report['root']
+        future = self._future(step)
+        if len(signers) >= self.quorum and not future.done():
+            future.set_result(self.aggregate(step))
+
+    def aggregate(self, step):
+        signers = self.valid.get(step, {})
+        ordered = sorted(signers.items())
+        return {
+            "step": step,
+            "signers": [bee_id for bee_id, _ in ordered],
+            "root": merkle_root([f"{bee_id}:{root}".encode() for bee_id, root in ordered]),
+            "quorum": self.quorum,
+            "cellSize": self.cell_size
+        }
+
+    def missing(self, step):
+        """Assigned bees with no valid signature for step yet."""
+        return self.signers - set(self.valid.get(step, {}))
+
+    async def wait_for_quorum(self, step, timeout=None):
+        return await asyncio.wait_for(asyncio.shield(self._future(step)), timeout)
+
 class FlagManager:
     """
     Manages Gossip about malicious nodes.
+
+    Epidemic layer over the mesh:
+    - every flag carries a msgId and a hop TTL; a seen-cache stops loops
+    - new flags are queued per neighbor and flushed as one GOSSIP_BATCH
+      per neighbor every GOSSIP_INTERVAL_SEC
+    - every ANTI_ENTROPY_INTERVAL_SEC each neighbor gets a Bloom digest of the
+      targets we know; it answers with only the flags missing from it
     """
+    GOSSIP_TTL = 10 # Diameter of the 10x10 torus
+    GOSSIP_INTERVAL_SEC = 0.5
+    ANTI_ENTROPY_INTERVAL_SEC = 10
+    MAX_BATCH = 256
+    SEEN_CACHE_SIZE = 10_000
+    FLAG_TTL_SEC = 3600
+
     def __init__(self, mesh, bloom_filter):
         self.mesh = mesh
         self.bloom = bloom_filter
-        
+
+        self.seen = OrderedDict() # msgId -> None (bounded LRU)
+        self.known = {} # targetId -> (flag, first_seen)
+        self.pending = {direction: OrderedDict() for direction in DIRECTIONS} # direction -> msgId -> flag
+        self.tasks = []
+
+    def start(self):
+        self.tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._anti_entropy_loop())
+        ]
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    def _mark_seen(self, msg_id):
+        if msg_id in self.seen:
+            self.seen.move_to_end(msg_id)
+            return False
+        self.seen[msg_id] = None
+        if len(self.seen) > self.SEEN_CACHE_SIZE:
+            self.seen.popitem(last=False)
+        return True
+
+    def _prune_known(self):
+        cutoff = time.time() - self.FLAG_TTL_SEC
+        for target_id in [t for t, (_, seen_at) in self.known.items() if seen_at < cutoff]:
+            del self.known[target_id]
+
+    def _enqueue(self, flag, exclude=None):
+        for direction in DIRECTIONS:
+            if direction != exclude:
+                self.pending[direction][flag['msgId']] = flag
+
     async def report_malice(self, target_id, reason):
         print(f"[IMMUNE] DETECTED MALICE from {target_id}: {reason}")
         self.bloom.add(target_id)
-        
-        # Gossip to neighbors
+
         flag = {
-            "type": "GOSSIP_FLAG",
+            "msgId": uuid.uuid4().hex,
             "targetId": target_id,
-            "reason": reason
+            "reason": reason,
+            "origin": self.mesh.bee_id,
+            "ttl": self.GOSSIP_TTL
         }
-        
-        # Broadcast to all connected neighbors
-        for direction in ["NORTH", "SOUTH", "EAST", "WEST"]:
-            await self.mesh.pulse(direction, flag)
+        self._mark_seen(flag['msgId'])
+        self.known[target_id] = (flag, time.time())
+
+        # Gossip to neighbors on the next flush
+        self._enqueue(flag)
+
+    def _accept(self, flag, from_side=None):
+        """Applies one incoming flag; forwards it if it is news."""
+        msg_id = flag.get('msgId') or hashlib.sha256(f"{flag['targetId']}:{flag.get('reason')}".encode()).hexdigest()
+        if not self._mark_seen(msg_id):
+            return
+
+        target_id = flag['targetId']
+        self.bloom.add(target_id)
+        if target_id in self.known:
+            # Already propagated through us; another report of it adds nothing
+            return
+
+        print(f"[IMMUNE] Received GOSSIP about {target_id}: {flag.get('reason')}")
+        self.known[target_id] = (flag, time.time())
+
+        ttl = flag.get('ttl', 1) - 1
+        if ttl > 0:
+            self._enqueue(dict(flag, msgId=msg_id, ttl=ttl), exclude=from_side)
+
+    async def handle_message(self, data):
+        """Entry point for GOSSIP_FLAG / GOSSIP_BATCH / GOSSIP_DIGEST."""
+        # Sender pulses WEST -> arrives on our EAST side
+        from_side = OPPOSITE.get(data.get('direction'))
+
+        if data['type'] == 'GOSSIP_FLAG':
+            self._accept(data, from_side)
+
+        elif data['type'] == 'GOSSIP_BATCH':
+            for flag in data['flags']:
+                self._accept(flag, from_side)
+
+        elif data['type'] == 'GOSSIP_DIGEST':
+            digest = BloomFilter.from_bytes(base64.b64decode(data['digest']))
+            self._prune_known()
+            missing = [flag for flag, _ in self.known.values() if flag['targetId'] not in digest]
+            if missing and from_side:
+                # Repairs travel one hop; the peer's own rounds spread them further
+                for flag in missing:
+                    self.pending[from_side][flag['msgId']] = dict(flag, ttl=1)
+
+    async def flush(self):
+        """Sends one batch per neighbor with everything pending for it."""
+        sends = []
+        for direction, queue in self.pending.items():
+            if not queue:
+                continue
+            batch = []
+            while queue and len(batch) < self.MAX_BATCH:
+                batch.append(queue.popitem(last=False)[1])
+            sends.append(self.mesh.pulse(direction, {
+                "type": "GOSSIP_BATCH",
+                "beeId": self.mesh.bee_id,
+                "direction": direction,
+                "flags": batch
+            }))
+        if sends:
+            await asyncio.gather(*sends)
+
+    def digest(self):
+        """Compact summary of the targets we know, for anti-entropy."""
+        self._prune_known()
+        bloom = BloomFilter(capacity=max(64, len(self.known) * 2), error_rate=0.01)
+        for target_id in self.known:
+            bloom.add(target_id)
+        return base64.b64encode(bloom.to_bytes()).decode('ascii')
+
+    async def anti_entropy(self):
+        digest = self.digest()
+        await asyncio.gather(*[
+            self.mesh.pulse(direction, {
+                "type": "GOSSIP_DIGEST",
+                "beeId": self.mesh.bee_id,
+                "direction": direction,
+                "digest": digest
+            })
+            for direction in DIRECTIONS
+        ])
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.GOSSIP_INTERVAL_SEC)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[IMMUNE] Gossip flush failed: {e}")
+
+    async def _anti_entropy_loop(self):
+        while True:
+            await asyncio.sleep(self.ANTI_ENTROPY_INTERVAL_SEC)
+            try:
+                await self.anti_entropy()
+            except Exception as e:
+                print(f"[IMMUNE] Anti-entropy round failed: {e}")
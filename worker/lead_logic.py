@@ -1,62 +1,419 @@
-import random
+import functools
+import itertools
+import math
+import numpy as np
+
+# (n - 3, 4; 1, 1; 3) quasi-difference matrices over Z_(n-3), None = blank.
+# They cover the orders 2 (mod 4) that don't factor into smaller squares.
+# Found offline by backtracking; orthogonality is checked on construction.
+_QDM = {
+    10: [
+        [None, None, None, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [1, 4, 0, None, None, None, 4, 2, 5, 3, 6, 1, 0],
+        [2, 1, 0, 2, 1, 6, None, None, None, 5, 4, 0, 3],
+        [1, 3, 4, 2, 4, 0, 6, 5, 3, None, None, None, 1],
+    ],
+    14: [
+        [None, None, None, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [10, 4, 9, None, None, None, 4, 1, 3, 6, 5, 7, 0, 9, 2, 8, 10],
+        [1, 1, 7, 10, 9, 8, None, None, None, 7, 1, 6, 0, 4, 5, 2, 3],
+        [5, 9, 7, 2, 8, 6, 7, 5, 3, None, None, None, 1, 0, 10, 4, 9],
+    ],
+    18: [
+        [None, None, None, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [8, 1, 4, None, None, None, 13, 0, 6, 4, 12, 9, 8, 5, 11, 3, 1, 10, 14, 2, 7],
+        [2, 5, 4, 14, 8, 10, None, None, None, 6, 7, 5, 11, 13, 1, 9, 0, 2, 12, 3, 4],
+        [0, 12, 1, 0, 1, 9, 11, 4, 5, None, None, None, 14, 13, 6, 3, 2, 12, 8, 7, 10],
+    ],
+    22: [
+        [None, None, None, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 4, 1, None, None, None, 10, 1, 6, 12, 9, 16, 3, 2, 0, 11, 17, 7, 13, 5, 4, 18, 15, 14, 8],
+        [5, 11, 18, 8, 14, 5, None, None, None, 1, 11, 15, 18, 6, 3, 12, 17, 13, 7, 2, 16, 9, 10, 4, 0],
+        [16, 16, 14, 8, 9, 4, 14, 0, 6, None, None, None, 12, 7, 1, 3, 5, 17, 15, 11, 18, 2, 13, 10, 16],
+    ],
+    26: [
+        [None, None, None, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [4, 8, 14, None, None, None, 16, 4, 19, 8, 7, 6, 3, 21, 0, 2, 18, 22, 13, 17, 5, 1, 9, 14, 11, 20, 12, 15, 10],
+        [3, 10, 21, 9, 20, 18, None, None, None, 6, 12, 7, 0, 8, 13, 2, 4, 16, 5, 10, 17, 19, 15, 22, 14, 1, 3, 11, 21],
+        [14, 5, 18, 19, 11, 2, 14, 5, 9, None, None, None, 22, 20, 18, 8, 12, 10, 21, 6, 7, 17, 1, 0, 16, 4, 3, 15, 13],
+    ],
+}
+
+MIN_GLS_ORDER = 3
+
+def _prime_power(n):
+    """(p, k) with n == p**k, or None."""
+    for p in range(2, math.isqrt(n) + 1):
+        if n % p == 0:
+            k = 0
+            while n % p == 0:
+                n //= p
+                k += 1
+            return (p, k) if n == 1 else None
+    return (n, 1) if n > 1 else None
+
+@functools.lru_cache(maxsize=None)
+def _field_tables(p, k):
+    """
+    Addition and multiplication tables of GF(p^k). Element e stands for the
+    polynomial whose coefficients are the base-p digits of e.
+    """
+    q = p ** k
+    powers = p ** np.arange(k)
+    digits = (np.arange(q)[:, None] // powers) % p
+    add = ((digits[:, None, :] + digits[None, :, :]) % p) @ powers
+
+    # Try monic moduli x^k + low until one is irreducible (no zero divisors)
+    for low in itertools.product(range(p), repeat=k):
+        low = np.array(low)
+        shifted = [digits] # shifted[d] = x^d * b for every b
+        for _ in range(k - 1):
+            top = shifted[-1][:, -1]
+            nxt = np.roll(shifted[-1], 1, axis=1)
+            nxt[:, 0] = 0
+            shifted.append((nxt - top[:, None] * low) % p)
+        mul = (np.einsum('ad,dbk->abk', digits, np.stack(shifted)) % p) @ powers
+        if np.all(mul[1:, 1:] != 0):
+            return add, mul
+    raise ValueError(f"No irreducible polynomial of degree {k} over GF({p})")
+
+def _field_pair(p, k):
+    # L1(i, j) = i + j, L2(i, j) = a*i + j for a field element a != 0, 1
+    add, mul = _field_tables(p, k)
+    return add, add[mul[2]]
+
+def _product_pair(first, second):
+    """MacNeish product: cell ((i1, i2), (j1, j2)) -> (x1 * n2 + x2)."""
+    (A1, B1), (A2, B2) = first, second
+    n = len(A1) * len(A2)
+    combine = lambda X1, X2: (X1[:, None, :, None] * len(X2) + X2[None, :, None, :]).reshape(n, n)
+    return combine(A1, A2), combine(B1, B2)
+
+def _qdm_pair(n, u=3):
+    """
+    Bose-Shrikhande-Parker: a (m,4;1,1;u) quasi-difference matrix over Z_m,
+    m = n - u, developed mod m plus a Greco-Latin square on the u points at
+    infinity gives an orthogonal array OA(4, n), i.e. a pair of order n.
+    """
+    m = n - u
+    rows = [[] for _ in range(4)]
+    for r, row in enumerate(_QDM[n]):
+        # Blanks in a row become the points at infinity, fixed under development
+        blanks = iter(range(m, n))
+        infinity = {c: next(blanks) for c, v in enumerate(row) if v is None}
+        for c, v in enumerate(row):
+            rows[r].extend([infinity[c]] * m if v is None else ((v + np.arange(m)) % m).tolist())
+    A_inf, B_inf = GrecoLatinGenerator.orthogonal_pair(u)
+    i, j = np.divmod(np.arange(u * u), u)
+    for r, values in enumerate((i, j, A_inf[i, j], B_inf[i, j])):
+        rows[r].extend((values + m).tolist())
+
+    oa = np.array(rows)
+    A = np.empty((n, n), dtype=np.intp)
+    B = np.empty((n, n), dtype=np.intp)
+    A[oa[0], oa[1]] = oa[2]
+    B[oa[0], oa[1]] = oa[3]
+    if len(np.unique(A * n + B)) != n * n:
+        raise ValueError(f"Quasi-difference matrix for order {n} is not orthogonal")
+    return A, B
 
 class GrecoLatinGenerator:
     """
     Generates Mutually Orthogonal Latin Squares (MOLS) for Recursive Sharding.
-    Uses prime field modulo arithmetic for N=3, 5, 7.
+
+    Finite fields GF(p^k) for prime powers, MacNeish products for composites,
+    and quasi-difference matrices for orders 2 (mod 4) that do not factor
+    (10 ... 26). None exist for 2 and 6; twice a prime from 34 up has no
+    construction here yet. Squares are memoized per order.
     """
     @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def is_supported(n):
+        if n < 1 or n in (2, 6):
+            return False
+        if n == 1 or _prime_power(n):
+            return True
+        if any(n % d == 0 and GrecoLatinGenerator.is_supported(d) and GrecoLatinGenerator.is_supported(n // d)
+               for d in range(3, math.isqrt(n) + 1)):
+            return True
+        return n in _QDM
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def orthogonal_pair(n):
+        """(A, B): two orthogonal n x n Latin squares as read-only numpy arrays."""
+        if not GrecoLatinGenerator.is_supported(n):
+            raise ValueError(f"No Greco-Latin square construction for order {n}")
+
+        power = _prime_power(n)
+        if n == 1:
+            pair = (np.zeros((1, 1), dtype=np.intp),) * 2
+        elif power:
+            pair = _field_pair(*power)
+        else:
+            d = next((d for d in range(3, math.isqrt(n) + 1)
+                      if n % d == 0 and GrecoLatinGenerator.is_supported(d) and GrecoLatinGenerator.is_supported(n // d)), None)
+            if d:
+                pair = _product_pair(GrecoLatinGenerator.orthogonal_pair(d), GrecoLatinGenerator.orthogonal_pair(n // d))
+            else:
+                pair = _qdm_pair(n)
+
+        pair = tuple(np.ascontiguousarray(square, dtype=np.intp) for square in pair)
+        for square in pair:
+            square.setflags(write=False)
+        return pair
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
     def generate_gls(n):
         """
-        Returns a Grid of tuples (Task, Data) for an N x N matrix.
+        Returns an (N, N, 2) array of (Task, Data) pairs for an N x N matrix.
         Requirement: No (T, D) pair repeats. T and D appear once per row/col.
         """
-        grid = [[None for _ in range(n)] for _ in range(n)]
-        
-        # Latin Square 1 (Tasks): L1(i, j) = (i + j) % n
-        # Latin Square 2 (Data):  L2(i, j) = (i + 2*j) % n  (For N=odd prime)
-        
-        # Valid for prime N.
-        
-        for i in range(n):
-            for j in range(n):
-                task_id = (i + j) % n
-                data_id = (i + 2 * j) % n
-                grid[i][j] = (task_id, data_id)
-                
+        grid = np.stack(GrecoLatinGenerator.orthogonal_pair(n), axis=-1)
+        grid.setflags(write=False)
         return grid
 
+    @staticmethod
+    def choose_n(live_workers):
+        """Largest constructible N with one worker per cell of the N x N square."""
+        n = math.isqrt(max(live_workers, 0))
+        while n > MIN_GLS_ORDER and not GrecoLatinGenerator.is_supported(n):
+            n -= 1
+        return max(n, MIN_GLS_ORDER)
+
+def _gf256_tables():
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int32)
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= 0x11d
+    exp[255:510] = exp[:255]
+
+    # mul[a] is the 256-entry table for "multiply by a"
+    mul = exp[(log[:, None] + log[None, :]) % 255]
+    mul[0, :] = 0
+    mul[:, 0] = 0
+    return exp, log, mul
+
+class GF256:
+    """
+    Arithmetic over GF(2^8) (polynomial 0x11d) with lookup tables, so shard
+    bytes can be multiplied by a constant with one numpy gather.
+    """
+    EXP, LOG, MUL = _gf256_tables()
+
+    @staticmethod
+    def mul(a, b):
+        return int(GF256.MUL[a, b])
+
+    @staticmethod
+    def inv(a):
+        if a == 0:
+            raise ZeroDivisionError("0 has no inverse in GF(256)")
+        return int(GF256.EXP[255 - GF256.LOG[a]])
+
+    @staticmethod
+    def cauchy_matrix(rows, cols):
+        """
+        m x k Cauchy matrix 1 / (x_r + y_c), columns scaled so row 0 is all
+        ones (plain XOR). Every square sub-matrix stays invertible, which is
+        what lets any m lost shards be recovered.
+        """
+        if rows + cols > 256:
+            raise ValueError("GF(256) Reed-Solomon supports at most 256 shards")
+        matrix = [[GF256.inv(r ^ (rows + c)) for c in range(cols)] for r in range(rows)]
+        for c in range(cols):
+            scale = GF256.inv(matrix[0][c])
+            for r in range(rows):
+                matrix[r][c] = GF256.mul(matrix[r][c], scale)
+        return matrix
+
+    @staticmethod
+    def invert_matrix(matrix):
+        """Gauss-Jordan inversion of a small square matrix over GF(256)."""
+        n = len(matrix)
+        aug = [list(row) + [int(r == c) for c in range(n)] for r, row in enumerate(matrix)]
+        for col in range(n):
+            pivot = next((r for r in range(col, n) if aug[r][col]), None)
+            if pivot is None:
+                raise ValueError("Singular matrix")
+            aug[col], aug[pivot] = aug[pivot], aug[col]
+            scale = GF256.inv(aug[col][col])
+            aug[col] = [GF256.mul(v, scale) for v in aug[col]]
+            for r in range(n):
+                factor = aug[r][col]
+                if r != col and factor:
+                    aug[r] = [v ^ GF256.mul(factor, p) for v, p in zip(aug[r], aug[col])]
+        return [row[n:] for row in aug]
+
+def _xor_into(dst, src):
+    """dst ^= src over len(src) bytes, a machine word at a time."""
+    words = len(src) // 8 * 8
+    if words:
+        target = dst[:words].view(np.uint64)
+        np.bitwise_xor(target, src[:words].view(np.uint64), out=target)
+    if words < len(src):
+        np.bitwise_xor(dst[words:len(src)], src[words:], out=dst[words:len(src)])
+
 class ParityBuffer:
     """
     Manages redundancy via XOR Parity.
+
+    With parity_shards=1 this is the classic XOR parity (any one shard can be
+    lost). With parity_shards=m > 1 it becomes a systematic Reed-Solomon code
+    over GF(256): k data shards + m parity shards, any m losses recoverable.
+    Parity row 0 is always the plain XOR, so the single-loss path stays cheap.
     """
-    def __init__(self, n_shards):
+    def __init__(self, n_shards, parity_shards=1):
         self.shards = {} # shard_id -> bytes
-        self.parity = 0
         self.n_shards = n_shards
-        
+        self.parity_shards = parity_shards
+        self.coefficients = GF256.cauchy_matrix(parity_shards, n_shards)
+
+        self.index = {} # shard_id -> data row in the code
+        self.lengths = {} # shard_id -> original length (shards are zero padded)
+        self.parity = [np.zeros(0, dtype=np.uint8) for _ in range(parity_shards)]
+
+    def _grow(self, size):
+        if size > len(self.parity[0]):
+            # Zero padding leaves existing parity unchanged
+            self.parity = [np.concatenate([p, np.zeros(size - len(p), dtype=np.uint8)]) for p in self.parity]
+
+    def _accumulate(self, row, data):
+        _xor_into(self.parity[0], data)
+        for j in range(1, self.parity_shards):
+            _xor_into(self.parity[j], GF256.MUL[self.coefficients[j][row]][data])
+
     def add_shard(self, shard_id, data_bytes):
+        """
+        Stores the shard and folds it into the parity incrementally.
+        data_bytes may be bytes, bytearray or a memoryview slice.
+        """
+        if shard_id in self.index:
+            old = self.shards.get(shard_id)
+            if old is None:
+                raise ValueError(f"Shard {shard_id} is lost; reconstruct it before replacing")
+            # XOR the old contribution back out
+            self._accumulate(self.index[shard_id], np.frombuffer(old, dtype=np.uint8))
+        elif len(self.index) >= self.n_shards:
+            raise ValueError(f"ParityBuffer already holds {self.n_shards} shards")
+        else:
+            self.index[shard_id] = len(self.index)
+
+        data = np.frombuffer(data_bytes, dtype=np.uint8)
+        self._grow(len(data))
+        self._accumulate(self.index[shard_id], data)
+
         self.shards[shard_id] = data_bytes
-        
-        # Incremental XOR
-        # Simply XORing first byte/int logic for simulation, 
-        # or assuming data_bytes is int for this POC.
-        # For real bytes, we'd zip and xor.
-        
-        # Simplified: XORing checksums or integer representations
-        # Real implementation: bitwise XOR of byte arrays
-        pass 
+        self.lengths[shard_id] = len(data)
+
+    def mark_lost(self, shard_id):
+        """Drops the local copy of a shard (e.g. its bee disconnected)."""
+        self.shards.pop(shard_id, None)
 
     def reconstruct(self, missing_id):
         """
-        If we implemented full byte-array XOR, we would iterate all existing shards 
-        and the parity_shard to recover the missing one.
-        
+        Rebuilds a missing shard from the remaining shards and the parity.
+
         Parity = S1 ^ S2 ^ S3
         S1 = Parity ^ S2 ^ S3
+
+        With Reed-Solomon, every currently lost shard is solved together from
+        as many parity rows as there are losses.
         """
-        print(f"[RELIABILITY] Reconstructing shard {missing_id} using Parity XOR...")
-        return b"RECONSTRUCTED_DATA"
+        if missing_id in self.shards:
+            return bytes(self.shards[missing_id])
+        if missing_id not in self.index:
+            raise KeyError(f"Unknown shard {missing_id}")
+
+        lost = [sid for sid in self.index if sid not in self.shards]
+        if len(lost) > self.parity_shards:
+            raise ValueError(f"{len(lost)} shards lost but only {self.parity_shards} parity shards available")
+
+        # Syndromes: parity row j minus every surviving shard's contribution
+        rows = range(len(lost))
+        syndromes = [self.parity[j].copy() for j in rows]
+        for sid, data_bytes in self.shards.items():
+            data = np.frombuffer(data_bytes, dtype=np.uint8)
+            col = self.index[sid]
+            _xor_into(syndromes[0], data)
+            for j in rows[1:]:
+                _xor_into(syndromes[j], GF256.MUL[self.coefficients[j][col]][data])
+
+        if len(lost) == 1:
+            recovered = syndromes[0]
+        else:
+            # Solve sub-matrix(rows, lost) * D_lost = syndromes
+            inverse = GF256.invert_matrix(
+                [[self.coefficients[j][self.index[sid]] for sid in lost] for j in rows]
+            )
+            target = lost.index(missing_id)
+            recovered = np.zeros_like(syndromes[0])
+            for j in rows:
+                _xor_into(recovered, GF256.MUL[inverse[target][j]][syndromes[j]])
+
+        code = "XOR parity" if len(lost) == 1 else f"Reed-Solomon ({len(lost)} lost)"
+        print(f"[RELIABILITY] Recovered shard {missing_id} from {code}.")
+        return recovered[:self.lengths[missing_id]].tobytes()
+
+def micro_shards(view, gls):
+    """
+    Cuts a block into N*N shards following the GLS layout: N data partitions
+    of N task pieces each, and cell (r, c) holding pair (task, data) gets
+    piece data * N + task. Shards are memoryview slices; nothing is copied.
+    Returns {(r, c): (task_id, data_id, slice)}.
+    """
+    n = len(gls)
+    pieces = n * n
+    bounds = [k * len(view) // pieces for k in range(pieces + 1)]
+    shards = {}
+    for r in range(n):
+        for c in range(n):
+            task_id, data_id = (int(x) for x in gls[r, c])
+            piece = data_id * n + task_id
+            shards[(r, c)] = (task_id, data_id, view[bounds[piece]:bounds[piece + 1]])
+    return shards
+
+class AssignmentTable:
+    """Lead-side record of a block's micro-shards: cell -> bee, hash, state."""
+    PENDING = "PENDING"
+    SENT = "SENT"
+    ACKED = "ACKED"
+    FAILED = "FAILED"
+    LOCAL = "LOCAL" # No worker available; the Lead keeps the shard
+
+    def __init__(self, job_id, block_id):
+        self.job_id = job_id
+        self.block_id = block_id
+        self.cells = {} # (r, c) -> entry
+
+    def assign(self, cell, bee_id, task_id, data_id, digest, size):
+        self.cells[cell] = {
+            "beeId": bee_id,
+            "taskId": task_id,
+            "dataId": data_id,
+            "hash": digest,
+            "size": size,
+            "state": self.PENDING
+        }
+
+    def mark(self, cell, state):
+        self.cells[cell]['state'] = state
+
+    def cells_of(self, bee_id):
+        """Cells held by one bee, e.g. to reassign them when it drops out."""
+        return [cell for cell, entry in self.cells.items() if entry['beeId'] == bee_id]
+
+    def counts(self):
+        counts = {}
+        for entry in self.cells.values():
+            counts[entry['state']] = counts.get(entry['state'], 0) + 1
+        return counts
 
 if __name__ == "__main__":
     # Test GLS
@@ -64,4 +421,4 @@ if __name__ == "__main__":
     print(f"--- {N}x{N} Greco-Latin Square ---")
     gls = GrecoLatinGenerator.generate_gls(N)
     for row in gls:
-        print(row)
+        print([tuple(cell) for cell in row.tolist()])
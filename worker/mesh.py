@@ -2,11 +2,359 @@ import asyncio
 import websockets
 import json
 import logging
+import random
+import struct
+import time
+import warnings
+import torch
+from collections import deque
+
+from shared.codec import EncodedTensor
+from shared.telemetry import Telemetry
+
+OPPOSITE = {
+    "NORTH": "SOUTH",
+    "SOUTH": "NORTH",
+    "EAST": "WEST",
+    "WEST": "EAST"
+}
+
+# Binary Tensor Frames
+# Control messages stay JSON (text frames). Tensor pulses use a binary frame:
+#   magic | direction | dtype | ndim | step | job_len | job | shape... | raw bytes
+FRAME_MAGIC = b"GBT1"
+# Same header, ndim 0, followed by a codec blob (a tensor under a job's Transport)
+ENCODED_MAGIC = b"GBQ1"
+FRAME_HEADER = struct.Struct("<4sBBBxIH")
+DIRECTIONS = ["NORTH", "SOUTH", "EAST", "WEST"]
+DTYPES = [
+    torch.float32, torch.float16, torch.bfloat16, torch.float64,
+    torch.int8, torch.uint8, torch.int32, torch.int64
+]
+DTYPE_CODES = {dtype: code for code, dtype in enumerate(DTYPES)}
+
+# P2P blocks are far larger than the websockets 1 MiB default
+MAX_MESSAGE_BYTES = 512 * 1024 * 1024
+# One-shot request/reply to a non-neighbour peer (e.g. Raft votes)
+REQUEST_TIMEOUT_SEC = 0.5
+# Lead -> worker micro-shard: magic, JSON header length, header, raw bytes
+SHARD_MAGIC = b"GBS1"
+SHARD_HEADER = struct.Struct("<4sI")
+
+# Per-neighbour send queues
+SEND_QUEUE_DEPTH = 64
+# Advisory messages (offers, gossip) wait this long for queue space, then are
+# dropped; everything else waits for space (backpressure) and is never dropped
+SEND_BLOCK_TIMEOUT_SEC = 1.0
+ADVISORY_TYPES = {"STEAL_OFFER", "GOSSIP_FLAG", "GOSSIP_BATCH", "GOSSIP_DIGEST"}
+# Small JSON messages queued together go out as one MESH_BATCH frame
+COALESCE_MAX_BYTES = 64 * 1024
+COALESCE_MAX_MESSAGES = 64
+CONNECT_TIMEOUT_SEC = 2.0
+RECONNECT_MIN_SEC = 0.1
+RECONNECT_MAX_SEC = 5.0
+# Sends at least this large time the link's throughput; smaller ones are latency
+THROUGHPUT_MIN_BYTES = 64 * 1024
+THROUGHPUT_ALPHA = 0.3
+
+def encode_frame(job_id, step, direction, tensor):
+    """
+    Returns [header, body] where body is a memoryview over the tensor storage.
+    Passing the list to ws.send() writes it as one fragmented binary message,
+    so the tensor bytes are never joined into an intermediate bytes object.
+    An EncodedTensor goes out as a GBQ1 frame carrying its codec blob.
+    """
+    if isinstance(tensor, EncodedTensor):
+        job = (job_id or "").encode()
+        header = FRAME_HEADER.pack(ENCODED_MAGIC, DIRECTIONS.index(direction), 0, 0, step, len(job)) + job
+        return [header, tensor.blob]
+
+    tensor = tensor.detach()
+    if tensor.device.type != 'cpu':
+        tensor = tensor.to('cpu')
+    tensor = tensor.contiguous()
+
+    job = (job_id or "").encode()
+    shape = tuple(tensor.shape)
+    header = FRAME_HEADER.pack(
+        FRAME_MAGIC, DIRECTIONS.index(direction), DTYPE_CODES[tensor.dtype],
+        len(shape), step, len(job)
+    ) + job + struct.pack(f"<{len(shape)}Q", *shape)
+
+    body = memoryview(tensor.reshape(-1).view(torch.uint8).numpy())
+    return [header, body]
+
+def encode_shard(header, data):
+    """
+    SHARD_ASSIGNMENT as one binary message. data (a memoryview slice of the
+    Lead's block) is sent as its own fragment, without being copied.
+    """
+    meta = json.dumps(header).encode()
+    prefix = SHARD_HEADER.pack(SHARD_MAGIC, len(meta)) + meta
+    return [prefix, data] if len(data) else prefix
+
+def decode_shard(message):
+    """Header dict plus 'data', a memoryview over the received message."""
+    view = memoryview(message)
+    magic, meta_len = SHARD_HEADER.unpack_from(view)
+    if magic != SHARD_MAGIC:
+        raise ValueError("Not a Gridbee shard frame")
+    offset = SHARD_HEADER.size + meta_len
+    header = json.loads(bytes(view[SHARD_HEADER.size:offset]))
+    header['data'] = view[offset:]
+    return header
+
+def encode_tensors(header, tensors):
+    """
+    One GBS1 frame carrying several tensors after the JSON header: their
+    dtypes and shapes go into header['tensors'], the bytes follow as
+    separate fragments, uncopied.
+    """
+    views = []
+    header = {**header, "tensors": []}
+    for tensor in tensors:
+        tensor = tensor.detach().to('cpu').contiguous()
+        header['tensors'].append([DTYPE_CODES[tensor.dtype], list(tensor.shape)])
+        views.append(memoryview(tensor.reshape(-1).view(torch.uint8).numpy()))
+    return [encode_shard(header, b""), *views]
+
+def decode_tensors(message):
+    """Tensors of a decoded GBS1 frame (header dict with 'data'), as views over the message."""
+    tensors, offset = [], 0
+    for code, shape in message.get('tensors', []):
+        dtype = DTYPES[code]
+        size = dtype.itemsize
+        for dim in shape:
+            size *= dim
+        with warnings.catch_warnings():
+            # Received messages are immutable bytes; the tensors are only read
+            warnings.simplefilter("ignore", UserWarning)
+            if size:
+                tensor = torch.frombuffer(message['data'][offset:offset + size], dtype=dtype).reshape(shape)
+            else:
+                tensor = torch.empty(shape, dtype=dtype)
+        tensors.append(tensor)
+        offset += size
+    return tensors
+
+def decode_frame(message):
+    """
+    Parses a binary frame into a PULSE_DATA dict. The tensor is a view over
+    the received message (torch.frombuffer), not a copy. A GBQ1 payload
+    stays encoded until the engine needs it.
+    """
+    view = memoryview(message)
+    magic, direction, dtype_code, ndim, step, job_len = FRAME_HEADER.unpack_from(view)
+    if magic not in (FRAME_MAGIC, ENCODED_MAGIC):
+        raise ValueError("Not a Gridbee tensor frame")
+
+    offset = FRAME_HEADER.size
+    job_id = bytes(view[offset:offset + job_len]).decode()
+    offset += job_len
+    if magic == ENCODED_MAGIC:
+        return {
+            "type": "PULSE_DATA",
+            "jobId": job_id or None,
+            "step": step,
+            "direction": DIRECTIONS[direction],
+            "payload": EncodedTensor(view[offset:])
+        }
+    shape = struct.unpack_from(f"<{ndim}Q", view, offset)
+    offset += 8 * ndim
+
+    dtype = DTYPES[dtype_code]
+    if len(view) == offset:
+        tensor = torch.empty(shape, dtype=dtype)
+    else:
+        with warnings.catch_warnings():
+            # Received messages are immutable bytes; the tensor is only read
+            warnings.simplefilter("ignore", UserWarning)
+            tensor = torch.frombuffer(view[offset:], dtype=dtype).reshape(shape)
+
+    return {
+        "type": "PULSE_DATA",
+        "jobId": job_id or None,
+        "step": step,
+        "direction": DIRECTIONS[direction],
+        "payload": tensor
+    }
+
+def frame_size(frame):
+    """Bytes in an outgoing frame: JSON text, bytes or a list of binary fragments."""
+    if isinstance(frame, str):
+        return len(frame)
+    if isinstance(frame, list):
+        return sum(memoryview(part).nbytes for part in frame)
+    return len(frame)
+
+def coalesce(messages):
+    """Joins already-encoded JSON messages into one MESH_BATCH, without re-encoding them."""
+    if len(messages) == 1:
+        return messages[0]
+    return '{"type": "MESH_BATCH", "messages": [' + ", ".join(messages) + ']}'
+
+class NeighborLink:
+    """
+    Outbound connection to one torus neighbour: a bounded send queue drained
+    by its own writer task, so a slow neighbour only ever stalls its own
+    queue. The writer reconnects with jittered exponential backoff; messages
+    still queued (or mid-send) go out on the new connection.
+    """
+    def __init__(self, mesh, direction, ip, port):
+        self.mesh = mesh
+        self.direction = direction
+        self.ip = ip
+        self.port = port
+        self.queue = asyncio.Queue(maxsize=SEND_QUEUE_DEPTH)
+        self.outbox = deque() # encoded frames taken off the queue, not yet sent
+        self.ws = None
+        self.task = None
+
+        self.sent = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.reconnects = 0
+        self.throughput = None # bytes/s, EWMA over large sends
+
+    @property
+    def uri(self):
+        return f"ws://{self.ip}:{self.port}"
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def retarget(self, ip, port):
+        """Neighbour moved (e.g. after a grid reshuffle): reconnect to its new address."""
+        self.ip, self.port = ip, port
+        if self.ws is not None:
+            asyncio.create_task(self.ws.close())
+
+    async def put(self, message, timeout=None):
+        """
+        Queues an encoded message, waiting for space as long as it takes
+        (backpressure). With a timeout, gives up after it and counts a drop:
+        only for advisory messages that a later one supersedes.
+        """
+        if timeout is None:
+            await self.queue.put(message)
+            return True
+        try:
+            await asyncio.wait_for(self.queue.put(message), timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            return False
+
+    def stats(self):
+        return {
+            "connected": self.ws is not None,
+            "queueDepth": self.queue.qsize() + len(self.outbox),
+            "sent": self.sent,
+            "sentBytes": self.sent_bytes,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "reconnects": self.reconnects,
+            "throughput": self.throughput
+        }
+
+    async def _connect(self):
+        delay = RECONNECT_MIN_SEC
+        while True:
+            try:
+                ws = await asyncio.wait_for(
+                    websockets.connect(self.uri, max_size=MAX_MESSAGE_BYTES, compression=None),
+                    CONNECT_TIMEOUT_SEC
+                )
+                # Tell the peer which side of it we are on
+                await ws.send(json.dumps({
+                    "type": "P2P_HANDSHAKE",
+                    "beeId": self.mesh.bee_id,
+                    "direction": self.direction
+                }))
+                return ws
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                print(f"[MESH] Failed to connect {self.direction} ({e}); retrying in <{delay:.1f}s")
+                # Full jitter: neighbours of a dropped bee don't retry in lockstep
+                await asyncio.sleep(random.uniform(0, delay))
+                delay = min(delay * 2, RECONNECT_MAX_SEC)
+
+    async def _run(self):
+        while True:
+            ws = await self._connect()
+            self.ws = ws
+            self.mesh.neighbors[self.direction] = ws
+            print(f"[MESH] Connected to Neighbor {self.direction} at {self.uri}")
+            reader = asyncio.create_task(self.mesh._read_loop(ws, self.direction))
+            writer = asyncio.create_task(self._drain(ws))
+            try:
+                # Whichever ends first (peer closed, send failed) ends this connection
+                await asyncio.wait([reader, writer], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                reader.cancel()
+                writer.cancel()
+                await asyncio.gather(reader, writer, return_exceptions=True)
+                self.ws = None
+                if self.mesh.neighbors.get(self.direction) is ws:
+                    self.mesh.neighbors[self.direction] = None
+                asyncio.create_task(ws.close())
+            self.reconnects += 1
+            print(f"[MESH] Neighbor {self.direction} disconnected. Reconnecting ({len(self.outbox) + self.queue.qsize()} queued).")
+
+    async def _drain(self, ws):
+        while True:
+            if not self.outbox:
+                await self._fill()
+            frame = self.outbox[0]
+            started = time.perf_counter()
+            await ws.send(frame)
+            elapsed = time.perf_counter() - started
+            self.mesh.transfer_time.observe(elapsed)
+            self.outbox.popleft()
+            size = frame_size(frame)
+            if size >= THROUGHPUT_MIN_BYTES and elapsed > 0:
+                rate = size / elapsed
+                self.throughput = rate if self.throughput is None else THROUGHPUT_ALPHA * rate + (1 - THROUGHPUT_ALPHA) * self.throughput
+            self.sent += 1
+            self.sent_bytes += size
+            self.mesh.tx_bytes[self.direction].inc(size)
+
+    async def _fill(self):
+        """Takes the next frame off the queue, folding queued small JSON messages into it."""
+        first = await self.queue.get()
+        if not isinstance(first, str) or len(first) > COALESCE_MAX_BYTES:
+            self.outbox.append(first)
+            return
+        batch, size = [first], len(first)
+        while not self.queue.empty() and len(batch) < COALESCE_MAX_MESSAGES and size < COALESCE_MAX_BYTES:
+            message = self.queue.get_nowait()
+            if not isinstance(message, str) or len(message) > COALESCE_MAX_BYTES:
+                # Keeps order: the batch goes first, then this frame
+                self.outbox.append(coalesce(batch))
+                self.outbox.append(message)
+                self.coalesced += len(batch) - 1
+                return
+            batch.append(message)
+            size += len(message)
+        self.outbox.append(coalesce(batch))
+        self.coalesced += len(batch) - 1
 
 class BitchatMesh:
-    def __init__(self, bee_id, message_handler):
+    def __init__(self, bee_id, message_handler, telemetry=None):
         self.bee_id = bee_id
         self.message_handler = message_handler
+        # Bytes per neighbour and time per frame send (how long the link takes it)
+        telemetry = telemetry or Telemetry()
+        self.transfer_time = telemetry.histogram("transfer")
+        self.tx_bytes = {direction: telemetry.counter(f"mesh.txBytes.{direction}") for direction in DIRECTIONS}
+        self.rx_bytes = {direction: telemetry.counter(f"mesh.rxBytes.{direction}") for direction in DIRECTIONS}
         self.neighbors = {
             "NORTH": None,
             "SOUTH": None,
@@ -15,61 +363,159 @@ class BitchatMesh:
         }
         self.p2p_port = 0 # Ephemeral
         self.server = None
+        self.peers = {} # (ip, port) -> (ws, lock), for request()
+        self.links = {} # direction -> NeighborLink (outbound)
+        self.inbound = {} # our side -> (beeId, ws) of the neighbour connected to us
 
     async def start_server(self):
         # Bind to ephemeral port
-        self.server = await websockets.serve(self._handle_incoming, "0.0.0.0", 0)
+        # Tensor payloads are incompressible; skip permessage-deflate
+        self.server = await websockets.serve(
+            self._handle_incoming, "0.0.0.0", 0,
+            max_size=MAX_MESSAGE_BYTES, compression=None
+        )
         self.p2p_port = self.server.sockets[0].getsockname()[1]
         print(f"[MESH] P2P Listener active on port {self.p2p_port}")
         return self.p2p_port
 
     async def connect_to(self, direction, ip, port):
-        uri = f"ws://{ip}:{port}"
-        try:
-            ws = await websockets.connect(uri)
-            self.neighbors[direction] = ws
-            print(f"[MESH] Connected to Neighbor {direction} at {uri}")
-            
-            # Send Handshake
-            handshake = {
-                "type": "P2P_HANDSHAKE",
-                "beeId": self.bee_id
-            }
-            await ws.send(json.dumps(handshake))
-            
-            # Start Reader logic
-            asyncio.create_task(self._read_loop(ws, direction))
-            
-        except Exception as e:
-            print(f"[MESH] Failed to connect {direction}: {e}")
+        """Starts (or re-points) the link to a neighbour; it connects and reconnects on its own."""
+        link = self.links.get(direction)
+        if link is None:
+            link = NeighborLink(self, direction, ip, port)
+            self.links[direction] = link
+            link.start()
+        elif (link.ip, link.port) != (ip, port):
+            link.retarget(ip, port)
+
+    async def close(self):
+        # Stopped links stay in self.links so their final counters remain readable
+        await asyncio.gather(*(link.stop() for link in self.links.values()))
+
+    def stats(self):
+        """Per-neighbour queue depth and counters."""
+        return {direction: link.stats() for direction, link in self.links.items()}
+
+    def throughput(self, direction):
+        """
+        Measured bytes/s towards a neighbour, or None. A link that has not
+        carried a large frame yet (in Cannon only WEST and NORTH carry
+        pulses) borrows the slowest measured one: same host, same network.
+        """
+        link = self.links.get(direction)
+        if link is None or link.ws is None:
+            return None
+        if link.throughput is not None:
+            return link.throughput
+        measured = [other.throughput for other in self.links.values() if other.throughput is not None]
+        return min(measured) if measured else None
+
+    @staticmethod
+    def _parse(message):
+        if isinstance(message, (bytes, bytearray)):
+            if message[:4] == SHARD_MAGIC:
+                return decode_shard(message)
+            return decode_frame(message)
+        return json.loads(message)
+
+    async def _dispatch(self, data):
+        """Hands one parsed message (or each one of a MESH_BATCH) to the handler; returns the replies."""
+        if data['type'] == 'MESH_BATCH':
+            messages = data['messages']
+        else:
+            messages = [data]
+        replies = []
+        for message in messages:
+            reply = await self.message_handler(message)
+            if reply is not None:
+                replies.append(reply)
+        return replies
 
     async def _handle_incoming(self, ws):
-        # For simplicity in this POC, we just read. 
-        # In real logic, we'd map this WS to a direction based on handshake.
+        side = None
         try:
             async for message in ws:
-                data = json.loads(message)
-                if data['type'] == 'P2P_HANDSHAKE':
-                    # Determine direction if possible, or just log
-                    pass 
-                else:
-                    await self.message_handler(data)
-        except:
+                if side:
+                    self.rx_bytes[side].inc(len(message))
+                try:
+                    data = self._parse(message)
+                    if data['type'] == 'P2P_HANDSHAKE':
+                        # A neighbour that connected to us going EAST sits on our WEST side
+                        side = OPPOSITE.get(data.get('direction'))
+                        if side:
+                            self.inbound[side] = (data.get('beeId'), ws)
+                    else:
+                        # Handlers may answer on the same connection
+                        for reply in await self._dispatch(data):
+                            await ws.send(json.dumps(reply))
+                except websockets.exceptions.ConnectionClosed:
+                    raise
+                except Exception as e:
+                    print(f"[MESH] Bad message from {f'Neighbor {side}' if side else 'peer'}: {e}")
+        except websockets.exceptions.ConnectionClosed:
             pass
+        finally:
+            if side and self.inbound.get(side, (None, None))[1] is ws:
+                del self.inbound[side]
+
+    async def request(self, ip, port, message, timeout=REQUEST_TIMEOUT_SEC):
+        """
+        Sends message to any peer's P2P port and returns its JSON reply, or
+        None if it could not be reached in time. Connections are kept for reuse.
+        A dict goes out as JSON; bytes or a list of fragments as binary.
+        """
+        key = (ip, port)
+        if key not in self.peers:
+            self.peers[key] = (None, asyncio.Lock())
+        ws, lock = self.peers[key]
+        async with lock:
+            try:
+                ws = self.peers[key][0]
+                if ws is None:
+                    ws = await asyncio.wait_for(
+                        websockets.connect(f"ws://{ip}:{port}", max_size=MAX_MESSAGE_BYTES, compression=None),
+                        timeout
+                    )
+                    self.peers[key] = (ws, lock)
+                await ws.send(json.dumps(message) if isinstance(message, dict) else message)
+                return json.loads(await asyncio.wait_for(ws.recv(), timeout))
+            except (OSError, asyncio.TimeoutError, asyncio.CancelledError, websockets.exceptions.WebSocketException) as e:
+                # A late reply would desynchronise the stream: start over next time
+                self.peers[key] = (None, lock)
+                if ws is not None:
+                    asyncio.create_task(ws.close())
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                return None
 
     async def _read_loop(self, ws, direction):
         try:
             async for message in ws:
-                data = json.loads(message)
-                await self.message_handler(data)
-        except:
-            print(f"[MESH] Neighbor {direction} disconnected.")
-            self.neighbors[direction] = None
+                self.rx_bytes[direction].inc(len(message))
+                try:
+                    await self._dispatch(self._parse(message))
+                except Exception as e:
+                    print(f"[MESH] Bad message from Neighbor {direction}: {e}")
+        except websockets.exceptions.ConnectionClosed:
+            pass
 
     async def pulse(self, direction, payload):
-        ws = self.neighbors.get(direction)
-        if ws:
-            try:
-                await ws.send(json.dumps(payload))
-            except:
-                pass
+        """
+        Queues a message for a neighbor. PULSE_DATA whose payload is a tensor
+        goes out as a binary frame; everything else is JSON. Waits while the
+        neighbor's queue is full. Only advisory messages (ADVISORY_TYPES) are
+        ever dropped, after SEND_BLOCK_TIMEOUT_SEC; returns False if so.
+        """
+        link = self.links.get(direction)
+        if link is None:
+            return False
+        if isinstance(payload.get('payload'), (torch.Tensor, EncodedTensor)):
+            message = encode_frame(
+                payload.get('jobId'), payload.get('step', 0),
+                payload.get('direction', direction), payload['payload']
+            )
+        else:
+            message = json.dumps(payload)
+        timeout = SEND_BLOCK_TIMEOUT_SEC if payload.get('type') in ADVISORY_TYPES else None
+        return await link.put(message, timeout)
+
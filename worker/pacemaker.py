@@ -1,32 +1,127 @@
 import asyncio
+import time
+from collections import deque
+
+from shared.telemetry import Telemetry
 
 class Pacemaker:
     """
     Manages synchronization of the Systolic Pulse.
-    Implements 2/3 functional majority triggering.
+
+    Inputs are buffered per step. A step is released the moment every
+    required direction has delivered: Cannon's round needs both the A block
+    (from the East) and the B block (from the South), so there is no partial
+    release. A step that is still incomplete after step_timeout raises
+    instead of waiting forever on a neighbour that is gone.
+
+    Steps are keyed by (jobId, step): a neighbour that starts its next job
+    early sends that job's first pulses while we are still on our last
+    round, and they must wait for us rather than be taken for ours.
     """
-    def __init__(self):
-        self.buffer = {
-            "EAST": [],
-            "SOUTH": []
-        }
-        self.step_event = asyncio.Event()
-        
+    WINDOW = 256 # samples kept for percentiles
+    STEP_TIMEOUT_SEC = 30.0
+
+    def __init__(self, required=("EAST", "SOUTH"), telemetry=None, step_timeout=STEP_TIMEOUT_SEC):
+        self.required = tuple(required)
+        self.step_timeout = step_timeout
+
+        self.buffer = {} # (jobId, step) -> {direction: payload}
+        self.first_arrival = {} # (jobId, step) -> monotonic time of first input
+        self.events = {} # (jobId, step) -> asyncio.Event
+        self.last_released = {} # jobId -> highest released step
+
+        self.spreads = deque(maxlen=self.WINDOW) # first -> later input, seconds
+        self.wait_times = deque(maxlen=self.WINDOW) # wait_for_step() duration
+        self.timeouts = 0
+        self.wait_time = (telemetry or Telemetry()).histogram("wait")
+
+    def reset(self):
+        """Forget all buffered steps, of every job."""
+        self.buffer.clear()
+        self.first_arrival.clear()
+        self.events.clear()
+        self.last_released.clear()
+
+    def finish(self, job_id):
+        """
+        Forget one job's steps once its run is over (or abandoned). Other
+        jobs' early inputs stay buffered.
+        """
+        for key in [key for key in self.buffer if key[0] == job_id]:
+            del self.buffer[key]
+            self.first_arrival.pop(key, None)
+        for key in [key for key in self.events if key[0] == job_id]:
+            del self.events[key]
+        self.last_released.pop(job_id, None)
+
+    def _event(self, key):
+        if key not in self.events:
+            self.events[key] = asyncio.Event()
+        return self.events[key]
+
     def enqueue(self, direction, payload):
-        if direction in self.buffer:
-            self.buffer[direction].append(payload)
-            self._check_quorum()
-            
-    def _check_quorum(self):
-        # Cannon's algo needs inputs from East (for A) and South (for B).
-        # We trigger if BOTH are present (ideal) or based on timeout (straggler).
-        
-        # Simplified: If we have data from both required directions for the current step
-        if len(self.buffer["EAST"]) > 0 and len(self.buffer["SOUTH"]) > 0:
-            self.step_event.set()
-            
-    async def wait_for_pulse(self):
-        # In this POC, we just wait for a moment to simulate sync window
-        # Real logic: await self.step_event.wait()
-        await asyncio.sleep(0.5) 
-        return True
+        if direction not in self.required:
+            return
+        job_id, step = payload.get('jobId'), payload.get('step', 0)
+        if step <= self.last_released.get(job_id, -1):
+            return # Late duplicate for a step we already released
+
+        key = (job_id, step)
+        now = time.monotonic()
+        inputs = self.buffer.setdefault(key, {})
+        if not inputs:
+            self.first_arrival[key] = now
+        else:
+            self.spreads.append(now - self.first_arrival[key])
+        inputs[direction] = payload
+
+        if len(inputs) == len(self.required):
+            self._event(key).set()
+
+    @staticmethod
+    def _percentile(samples, q):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    async def wait_for_step(self, step, max_wait=None, job_id=None):
+        """
+        Blocks until every required input for `step` of `job_id` has arrived
+        and returns {direction: payload}. Raises asyncio.TimeoutError after
+        max_wait seconds (default: step_timeout).
+        """
+        max_wait = self.step_timeout if max_wait is None else max_wait
+        key = (job_id, step)
+        start = time.monotonic()
+        event = self._event(key)
+        if len(self.buffer.get(key, {})) == len(self.required):
+            event.set()
+        try:
+            await asyncio.wait_for(event.wait(), max_wait)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            missing = [d for d in self.required if d not in self.buffer.get(key, {})]
+            raise asyncio.TimeoutError(f"Step {step} still missing {', '.join(missing)} after {max_wait:g}s") from None
+        finally:
+            self.events.pop(key, None)
+
+        self.last_released[job_id] = max(self.last_released.get(job_id, -1), step)
+        self.first_arrival.pop(key, None)
+        waited = time.monotonic() - start
+        self.wait_times.append(waited)
+        self.wait_time.observe(waited)
+        return self.buffer.pop(key)
+
+    def stats(self):
+        """Per-step wait statistics (seconds) over the rolling window."""
+        waits = list(self.wait_times)
+        return {
+            "steps": len(waits),
+            "waitMean": sum(waits) / len(waits) if waits else 0.0,
+            "waitP50": self._percentile(waits, 0.50),
+            "waitP99": self._percentile(waits, 0.99),
+            "waitMax": max(waits) if waits else 0.0,
+            "spreadP95": self._percentile(self.spreads, 0.95),
+            "timeouts": self.timeouts
+        }
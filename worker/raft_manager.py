@@ -4,93 +4,418 @@ import random
 import socket
 import json
 
+# Applied log entries kept after folding them into shadow_state
+LOG_RETAIN = 1024
+# Applied entries between persisted snapshots
+SNAPSHOT_EVERY = 256
+
+# Election timing (seconds)
+ELECTION_TIMEOUT_MIN = 0.150
+ELECTION_TIMEOUT_MAX = 0.300
+LEADER_HEARTBEAT_SEC = 0.05
+VOTE_TIMEOUT_SEC = 0.1
+# One heartbeat or vote request to one peer; well below ELECTION_TIMEOUT_MIN,
+# so a dead Prince can't hold up anything for an election timeout
+RPC_TIMEOUT_SEC = 0.05
+
 class RaftState:
     FOLLOWER = "FOLLOWER"
     CANDIDATE = "CANDIDATE"
     LEADER = "LEADER"
 
 class RaftConsensus:
-    def __init__(self, bee_id):
+    def __init__(self, bee_id, store=None):
         self.bee_id = bee_id
+        self.store = store
         self.state = RaftState.FOLLOWER
         self.current_term = 0
         self.voted_for = None
         self.leader_id = None
         
+        # Replicated hive state: shadow_state is the snapshot plus every
+        # applied membership delta. Entries at or below snapshot_index have
+        # been folded into it and dropped from the log.
         self.shadow_state = {}
+        self.log = []
+        self.snapshot_index = 0
+        self.snapshot_term = 0
+        self.commit_index = 0
+        self.last_applied = 0
+        self.snapshots_installed = 0
+        self.applied_since_snapshot = 0
+        self.catchups = 0
         self.last_heartbeat = time.time()
         
-        # Random election timeout between 150-300ms (scaled to seconds for python)
-        self.election_timeout = random.uniform(0.150, 0.300)
+        # Elections: a one-shot loop timer, re-armed on every heartbeat
+        self.election_timeout = random.uniform(ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX)
+        self.election_timer = None
+        self.election_task = None
+        self.leader_task = None
+        self.send_fn = None
+        self.promote_fn = None
+        self.elections_started = 0
         
     def reset_election_timer(self):
         self.last_heartbeat = time.time()
-        self.election_timeout = random.uniform(0.150, 0.300)
+        self.election_timeout = random.uniform(ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX)
+        if self.send_fn is None or self.state == RaftState.LEADER:
+            return
+        if self.election_timer:
+            self.election_timer.cancel()
+        self.election_timer = asyncio.get_running_loop().call_later(self.election_timeout, self._on_election_timeout)
+
+    def last_log_index(self):
+        return self.snapshot_index + len(self.log)
+
+    def last_log_term(self):
+        return self.log[-1]['term'] if self.log else self.snapshot_term
+
+    def term_at(self, index):
+        """Term of the entry at index, or None if unknown / already compacted."""
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        pos = index - self.snapshot_index - 1
+        if 0 <= pos < len(self.log):
+            return self.log[pos]['term']
+        return None
+
+    def restore(self, recovered):
+        """Adopts state loaded by RaftStore.load() and re-applies the committed tail."""
+        self.current_term = recovered['term']
+        self.voted_for = recovered['votedFor']
+        self.shadow_state = recovered['shadowState']
+        self.log = recovered['entries']
+        self.snapshot_index = recovered['snapshotIndex']
+        self.snapshot_term = recovered['snapshotTerm']
+        self.last_applied = self.snapshot_index
+        self.commit_index = min(max(recovered['commitIndex'], self.snapshot_index), self.last_log_index())
+        self._apply_committed()
+        # Also records the bee identity, so a restarted Prince rejoins as itself
+        self._persist_meta()
+        if self.current_term or self.last_log_index():
+            print(f"[HA] Recovered Raft state: term {self.current_term}, log index {self.last_log_index()}, "
+                  f"{recovered['replayed']} records replayed in {recovered['recoverySeconds'] * 1000:.1f}ms")
+
+    def _persist_meta(self):
+        if self.store:
+            self.store.save_meta(self.bee_id, self.current_term, self.voted_for)
+
+    def _persist_snapshot(self):
+        self.applied_since_snapshot = 0
+        if self.store:
+            tail_start = self.last_applied - self.snapshot_index
+            self.store.snapshot({
+                "beeId": self.bee_id,
+                "term": self.current_term,
+                "votedFor": self.voted_for,
+                "snapshotIndex": self.last_applied,
+                "snapshotTerm": self.term_at(self.last_applied),
+                "commitIndex": self.commit_index,
+                "shadowState": self.shadow_state,
+                "entries": self.log[tail_start:]
+            })
+
+    def _truncate_log(self, index):
+        del self.log[max(index - self.snapshot_index - 1, 0):]
+        if self.store:
+            self.store.truncate(index)
+
+    def install_snapshot(self, hive_state, index, term):
+        self.shadow_state = hive_state
+        self.shadow_state.setdefault('bees', {})
+        self.log = []
+        self.snapshot_index = index
+        self.snapshot_term = term
+        self.commit_index = index
+        self.last_applied = index
+        self.snapshots_installed += 1
+        self._persist_snapshot()
+
+    def apply_entry(self, entry):
+        """Applies one membership delta to shadow_state."""
+        grid = self.shadow_state.setdefault('grid', [])
+        bees = self.shadow_state.setdefault('bees', {})
+        op = entry.get('op')
+        if op in ('JOIN', 'LEAVE'):
+            i, j = entry['i'], entry['j']
+            while len(grid) <= i:
+                grid.append([])
+            while len(grid[i]) <= j:
+                grid[i].append(None)
+
+            if op == 'JOIN':
+                grid[i][j] = entry['beeId']
+                bees[entry['beeId']] = {k: entry.get(k) for k in ('i', 'j', 'role', 'ip', 'p2pPort')}
+            else:
+                if grid[i][j] == entry['beeId']:
+                    grid[i][j] = None
+                bees.pop(entry['beeId'], None)
+            self.shadow_state['beeCount'] = len(bees)
+
+    def _apply_committed(self):
+        while self.last_applied < self.commit_index:
+            self.last_applied += 1
+            self.apply_entry(self.log[self.last_applied - self.snapshot_index - 1])
+            self.applied_since_snapshot += 1
+        if self.applied_since_snapshot >= SNAPSHOT_EVERY:
+            self._persist_snapshot()
+
+        # Applied entries live on in shadow_state; keep a bounded tail
+        excess = self.last_applied - self.snapshot_index - LOG_RETAIN
+        if excess > 0:
+            self.snapshot_term = self.log[excess - 1]['term']
+            self.snapshot_index += excess
+            del self.log[:excess]
+
+    def _append_reply(self, success):
+        return {
+            "type": "APPEND_ACK",
+            "beeId": self.bee_id,
+            "term": self.current_term,
+            "success": success,
+            "matchIndex": self.last_log_index()
+        }
 
     def process_append_entries(self, payload):
+        """
+        Follower side of AppendEntries. Returns the APPEND_ACK for the leader:
+        on a failed consistency check matchIndex tells it where to resume.
+        """
         term = payload['term']
         leader_id = payload['leaderId']
         
-        if term >= self.current_term:
-            self.state = RaftState.FOLLOWER
+        if term < self.current_term:
+            return self._append_reply(False)
+
+        if term > self.current_term or self.state != RaftState.FOLLOWER:
+            self._step_down(term)
+        self.leader_id = leader_id
+        self.reset_election_timer()
+
+        prev_index = payload.get('prevLogIndex')
+        if prev_index is None:
+            # Legacy leader: full grid on every heartbeat
+            self.shadow_state = payload['hiveState']
+            return self._append_reply(True)
+        prev_term = payload.get('prevLogTerm', 0)
+
+        if 'hiveState' in payload:
+            # Occasional full snapshot (new prince, or too far behind the leader's log)
+            self.install_snapshot(payload['hiveState'], prev_index, prev_term)
+        elif prev_index >= self.snapshot_index and self.term_at(prev_index) != prev_term:
+            # Consistency check failed: drop a conflicting suffix, ask for catch-up
+            if prev_index <= self.last_log_index():
+                self._truncate_log(prev_index)
+            self.catchups += 1
+            return self._append_reply(False)
+
+        for entry in payload.get('entries', []):
+            index = entry['index']
+            if index <= self.snapshot_index:
+                continue
+            pos = index - self.snapshot_index - 1
+            if pos < len(self.log):
+                if self.log[pos]['term'] == entry['term']:
+                    continue
+                self._truncate_log(index)
+            self.log.append(entry)
+            if self.store:
+                self.store.append_entry(entry)
+
+        leader_commit = payload.get('leaderCommit', 0)
+        if leader_commit > self.commit_index:
+            self.commit_index = min(leader_commit, self.last_log_index())
+            if self.store:
+                self.store.commit(self.commit_index)
+            self._apply_committed()
+        return self._append_reply(True)
+
+    # --- Elections ---
+
+    def start_election_timer(self, send_fn, promote_fn):
+        """
+        Arms the election timer; no polling, it only fires after a full
+        timeout without heartbeats.
+        send_fn: async function(peer, message, timeout) -> reply or None, where
+                 peer is a Prince entry from shadow_state['bees'] and timeout
+                 bounds that one request (seconds)
+        promote_fn: async function to become Queen
+        """
+        self.send_fn = send_fn
+        self.promote_fn = promote_fn
+        self.reset_election_timer()
+
+    def stop_election_timer(self):
+        if self.election_timer:
+            self.election_timer.cancel()
+            self.election_timer = None
+        for task in (self.election_task, self.leader_task):
+            if task:
+                task.cancel()
+        self.send_fn = None
+
+    def _on_election_timeout(self):
+        self.election_timer = None
+        if self.state == RaftState.LEADER:
+            return
+        if self.election_task is None or self.election_task.done():
+            self.election_task = asyncio.create_task(self.start_election())
+
+    def peers(self):
+        """Other Princes, taken from the replicated hive state."""
+        return {
+            bee_id: info for bee_id, info in self.shadow_state.get('bees', {}).items()
+            if info.get('role') == 'PRINCE' and bee_id != self.bee_id
+        }
+
+    @staticmethod
+    def majority(n_peers):
+        return (n_peers + 1) // 2 + 1
+
+    def _step_down(self, term):
+        if term > self.current_term:
             self.current_term = term
-            self.leader_id = leader_id
+            self.voted_for = None
+            self._persist_meta()
+        was_leader = self.state == RaftState.LEADER
+        self.state = RaftState.FOLLOWER
+        if was_leader:
+            if self.leader_task:
+                self.leader_task.cancel()
             self.reset_election_timer()
-            
-            # Replicate State
-            self.shadow_state = payload['hiveState']
-            # print(f"[HA] Prince Synced State. Term: {term}")
+
+    async def _collect_votes(self, message, peers):
+        """Sends message to every peer at once; True as soon as a majority grants."""
+        votes = 1 # Our own
+        needed = self.majority(len(peers))
+        if votes >= needed:
             return True
-            
+
+        requests = [asyncio.create_task(self.send_fn(info, message, RPC_TIMEOUT_SEC)) for info in peers.values()]
+        try:
+            for next_reply in asyncio.as_completed(requests, timeout=VOTE_TIMEOUT_SEC):
+                try:
+                    reply = await next_reply
+                except asyncio.TimeoutError:
+                    break
+                if not reply:
+                    continue
+                if reply['term'] > self.current_term:
+                    self._step_down(reply['term'])
+                    return False
+                if reply.get('voteGranted'):
+                    votes += 1
+                    if votes >= needed:
+                        return True
+        finally:
+            for request in requests:
+                request.cancel()
         return False
 
-    async def run_election_loop(self, broadcast_vote_request_fn, promote_fn):
-        """
-        Monitors heartbeat. If timeout, starts election.
-        broadcast_vote_request_fn: async function to send REQUEST_VOTE to peers
-        promote_fn: async function to become Leader
-        """
-        while True:
-            await asyncio.sleep(0.05) # Check frequently
-            
-            if self.state == RaftState.LEADER:
-                continue
+    async def start_election(self):
+        peers = self.peers()
+        request = {
+            "type": "REQUEST_VOTE",
+            "candidateId": self.bee_id,
+            "lastLogIndex": self.last_log_index(),
+            "lastLogTerm": self.last_log_term()
+        }
 
-            # Check for Timeout
-            if time.time() - self.last_heartbeat > self.election_timeout:
-                await self.start_election(broadcast_vote_request_fn, promote_fn)
+        # Pre-vote: only bump the term if a majority would vote for us, so a
+        # partitioned Prince can't inflate terms and depose a healthy leader
+        if not await self._collect_votes({**request, "term": self.current_term + 1, "preVote": True}, peers):
+            self.reset_election_timer()
+            return
 
-    async def start_election(self, broadcast_vote_request_fn, promote_fn):
-        print(f"[HA] Queen Heartbeat Lost! Starting Election (Term {self.current_term + 1})")
-        
+        print(f"[HA] Queen Heartbeat Lost! Starting Election (Term {self.current_term + 1}, {len(peers)} peers)")
         self.state = RaftState.CANDIDATE
         self.current_term += 1
         self.voted_for = self.bee_id
-        self.votes_received = 1 # Vote for self
+        self._persist_meta()
+        self.elections_started += 1
+        # Split vote: the re-armed timer starts the next round
         self.reset_election_timer()
-        
-        # In a real P2P mesh, we'd broadcast to all known peers (from shadow_state)
-        # For Phase 1.2, since we are simulating "Taking Over", if we assume we are the only eligible Prince
-        # or we just "win" the simulation:
-        
-        # Simulating winning immediately for the POC if connected peers > 0
-        # In full mesh we need to wait for VOTE_ACKs
-        
-        # Mocking a "Win" for single-Prince failover scenario
-        # Real logic:
-        # await broadcast_vote_request_fn()
-        # if self.votes_received > majority:
-        #    self.become_leader(promote_fn)
-        
-        # For this simulation Step:
-        await self.become_leader(promote_fn)
 
-    async def become_leader(self, promote_fn):
+        term = self.current_term
+        won = await self._collect_votes({**request, "term": term, "preVote": False}, peers)
+        if won and self.state == RaftState.CANDIDATE and self.current_term == term:
+            await self.become_leader()
+
+    def process_request_vote(self, payload):
+        """Voter side of REQUEST_VOTE (and pre-vote); returns the VOTE_ACK."""
+        term = payload['term']
+        candidate = payload['candidateId']
+        log_ok = (payload.get('lastLogTerm', 0), payload.get('lastLogIndex', 0)) >= (self.last_log_term(), self.last_log_index())
+
+        if payload.get('preVote'):
+            # Pre-votes change no state. Deny while a leader is still heard from.
+            leader_alive = self.state == RaftState.LEADER or time.time() - self.last_heartbeat < ELECTION_TIMEOUT_MIN
+            granted = term > self.current_term and log_ok and not leader_alive
+        else:
+            if term > self.current_term:
+                self._step_down(term)
+            granted = term == self.current_term and self.voted_for in (None, candidate) and log_ok
+            if granted:
+                self.voted_for = candidate
+                self._persist_meta()
+                self.reset_election_timer()
+
+        return {
+            "type": "VOTE_ACK",
+            "beeId": self.bee_id,
+            "term": self.current_term,
+            "voteGranted": granted,
+            "preVote": bool(payload.get('preVote'))
+        }
+
+    async def become_leader(self):
         if self.state != RaftState.CANDIDATE:
             return
             
         self.state = RaftState.LEADER
         self.leader_id = self.bee_id
+        if self.election_timer:
+            self.election_timer.cancel()
+            self.election_timer = None
         print(f"[HA] Won Election! Term {self.current_term}. I am the Captain now.")
-        await promote_fn()
+        self.leader_task = asyncio.create_task(self._lead())
+        await self.promote_fn()
+
+    async def _lead(self):
+        # One heartbeat loop per peer: a dead or slow Prince delays only its
+        # own heartbeats, never the others'. Peers come and go with shadow_state.
+        loops = {}
+        try:
+            while self.state == RaftState.LEADER:
+                peers = self.peers()
+                for bee_id in peers.keys() - loops.keys():
+                    loops[bee_id] = asyncio.create_task(self._heartbeat(bee_id))
+                for bee_id in loops.keys() - peers.keys():
+                    loops.pop(bee_id).cancel()
+                await asyncio.sleep(LEADER_HEARTBEAT_SEC)
+        finally:
+            for task in loops.values():
+                task.cancel()
 
+    async def _heartbeat(self, bee_id):
+        # Empty AppendEntries keep that Prince's election timer quiet
+        loop = asyncio.get_running_loop()
+        while self.state == RaftState.LEADER:
+            info = self.peers().get(bee_id)
+            if info is None:
+                return
+            sent = loop.time()
+            reply = await self.send_fn(info, {
+                "type": "APPEND_ENTRIES",
+                "term": self.current_term,
+                "leaderId": self.bee_id,
+                "prevLogIndex": self.last_log_index(),
+                "prevLogTerm": self.last_log_term(),
+                "entries": [],
+                "leaderCommit": self.commit_index
+            }, RPC_TIMEOUT_SEC)
+            if reply and reply['term'] > self.current_term:
+                self._step_down(reply['term'])
+                return
+            # Every LEADER_HEARTBEAT_SEC from the last send, however long the reply took
+            await asyncio.sleep(max(0.0, LEADER_HEARTBEAT_SEC - (loop.time() - sent)))
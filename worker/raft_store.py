@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows: no slot locking
+    fcntl = None
+
+SNAPSHOT_FILE = "snapshot.json"
+LOG_FILE = "raft.log"
+LOCK_FILE = "LOCK"
+MAX_SLOTS = 64
+
+class RaftStore:
+    """
+    Durable Raft state for a Prince: a compacted snapshot plus an append-only
+    log of the records written since (meta, entry, truncate, commit), one
+    JSON object per line.
+
+    Writes are queued and flushed by a background task in a worker thread,
+    so the election loop never waits on disk. Records queued together are
+    written with a single fsync.
+    """
+    def __init__(self, directory=None):
+        self.lock = None
+        self.directory = directory or self._claim_slot(os.path.join(tempfile.gettempdir(), "gridbee_raft"))
+        os.makedirs(self.directory, exist_ok=True)
+        self.snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        self.log_path = os.path.join(self.directory, LOG_FILE)
+
+        self.pending = []
+        self.wake = asyncio.Event()
+        self.writer = None
+        self.stopping = False
+        self.write_lock = asyncio.Lock() # one batch on disk at a time, in order
+
+        self.records_written = 0
+        self.snapshots_written = 0
+
+    def _claim_slot(self, base):
+        # Several bees may run on one host: each one holds a lock on its own
+        # slot directory, and a restarted bee reclaims the first free slot.
+        for slot in range(MAX_SLOTS):
+            directory = os.path.join(base, str(slot))
+            if fcntl is None:
+                return directory
+            os.makedirs(directory, exist_ok=True)
+            lock = open(os.path.join(directory, LOCK_FILE), "w")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                continue
+            self.lock = lock
+            return directory
+        raise RuntimeError(f"All {MAX_SLOTS} Raft state slots under {base} are in use")
+
+    def start(self):
+        if self.writer is None:
+            self.stopping = False
+            self.writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        # Not cancelled: a batch half way through its write would be torn,
+        # or written again by the final flush. The writer finishes the batch
+        # in flight and exits; the flush then catches anything queued since.
+        if self.writer:
+            self.stopping = True
+            self.wake.set()
+            await self.writer
+            self.writer = None
+        await self.flush()
+
+    # --- Recording (non-blocking) ---
+
+    def _enqueue(self, record):
+        self.pending.append(record)
+        self.wake.set()
+
+    def save_meta(self, bee_id, term, voted_for):
+        self._enqueue({"k": "meta", "beeId": bee_id, "term": term, "votedFor": voted_for})
+
+    def append_entry(self, entry):
+        self._enqueue({"k": "entry", "e": entry})
+
+    def truncate(self, index):
+        """Drops logged entries at index and above (conflicting suffix)."""
+        self._enqueue({"k": "truncate", "index": index})
+
+    def commit(self, index):
+        self._enqueue({"k": "commit", "index": index})
+
+    def snapshot(self, snapshot):
+        # Serialised now: shadow_state keeps changing after this call
+        self._enqueue({"k": "snapshot", "data": json.dumps(snapshot).encode()})
+
+    # --- Writing ---
+
+    async def _write_loop(self):
+        while not self.stopping:
+            await self.wake.wait()
+            await self.flush()
+
+    async def flush(self):
+        async with self.write_lock:
+            self.wake.clear()
+            batch, self.pending = self.pending, []
+            if batch:
+                await asyncio.to_thread(self._write_batch, batch)
+
+    def _write_batch(self, batch):
+        lines = []
+        for record in batch:
+            if record['k'] == 'snapshot':
+                # Everything logged so far is covered by the snapshot
+                self._write_snapshot(record['data'])
+                lines = []
+                continue
+            lines.append(json.dumps(record))
+        if lines:
+            with open(self.log_path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.records_written += len(batch)
+
+    def _write_snapshot(self, data):
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        open(self.log_path, "w").close()
+        self.snapshots_written += 1
+
+    # --- Recovery ---
+
+    def load(self):
+        """
+        Reads the latest snapshot and replays the log tail on top of it.
+        Returns the recovered state, with recoverySeconds and the number of
+        replayed records.
+        """
+        start = time.perf_counter()
+        state = {
+            "beeId": None,
+            "term": 0,
+            "votedFor": None,
+            "snapshotIndex": 0,
+            "snapshotTerm": 0,
+            "commitIndex": 0,
+            "shadowState": {},
+            "entries": []
+        }
+
+        if os.path.exists(self.snapshot_path) and os.path.getsize(self.snapshot_path):
+            # One read: json parses whole bytes, so a memory map would only add a copy
+            with open(self.snapshot_path, "rb") as f:
+                state.update(json.loads(f.read()))
+
+        replayed = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final write from a crash
+                        break
+                    self._replay(state, record)
+                    replayed += 1
+
+        state['replayed'] = replayed
+        state['recoverySeconds'] = time.perf_counter() - start
+        return state
+
+    @staticmethod
+    def _replay(state, record):
+        kind = record['k']
+        if kind == 'meta':
+            state['beeId'] = record['beeId']
+            state['term'] = record['term']
+            state['votedFor'] = record['votedFor']
+        elif kind == 'entry':
+            entries = state['entries']
+            index = record['e']['index']
+            if index <= state['snapshotIndex']:
+                return
+            del entries[max(index - state['snapshotIndex'] - 1, 0):]
+            entries.append(record['e'])
+        elif kind == 'truncate':
+            del state['entries'][max(record['index'] - state['snapshotIndex'] - 1, 0):]
+        elif kind == 'commit':
+            state['commitIndex'] = max(state['commitIndex'], record['index'])
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import torch
+import warnings
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError: # Windows: no slot locking
+    fcntl = None
+
+# Fraction of free RAM / VRAM the cache may hold in its memory tier
+MEMORY_FRACTION = 0.25
+DEFAULT_DISK_BUDGET = 8 * 1024 * 1024 * 1024
+LOCK_FILE = "LOCK"
+MAX_SLOTS = 64
+
+class ShardMissingError(KeyError):
+    """A hash-only assignment referenced a block this bee does not hold."""
+    def __init__(self, digest):
+        super().__init__(digest)
+        self.digest = digest
+
+def tensor_digest(tensor):
+    """Content hash of a tensor: dtype, shape and raw bytes."""
+    tensor = tensor.detach().to('cpu').contiguous()
+    h = hashlib.sha256(f"{tensor.dtype}:{tuple(tensor.shape)}:".encode())
+    if tensor.numel():
+        h.update(memoryview(tensor.reshape(-1).view(torch.uint8).numpy()))
+    return h.hexdigest()
+
+def _nbytes(tensor):
+    return tensor.numel() * tensor.element_size()
+
+class ShardCache:
+    """
+    Worker-side, content-addressed cache of weight blocks.
+
+    Tier 1: tensors in memory, LRU ordered, bounded by a budget derived from
+    SpikeMonitor's ramFree (or vramFree when the engine runs on a GPU).
+    Tier 2: blocks evicted from memory are spilled to raw files on local
+    disk and come back as lazily paged memory-mapped tensors. Without a
+    spill_dir each bee claims its own slot directory (as RaftStore does),
+    so bees sharing a host never evict or read each other's files.
+    """
+    def __init__(self, memory_budget=256 * 1024 * 1024, spill_dir=None, disk_budget=DEFAULT_DISK_BUDGET, device='cpu'):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.device = device
+        self.lock = None
+        self.spill_dir = spill_dir or self._claim_slot(os.path.join(tempfile.gettempdir(), "gridbee_shards"))
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        self.memory = OrderedDict() # digest -> tensor
+        self.memory_bytes = 0
+        self.disk = OrderedDict() # digest -> {"dtype", "shape", "nbytes"}
+        self.disk_bytes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.spills = 0
+
+        self._scan_spilled()
+
+    def _claim_slot(self, base):
+        # A restarted bee reclaims the first free slot, and the blocks in it
+        for slot in range(MAX_SLOTS):
+            directory = os.path.join(base, str(slot))
+            if fcntl is None:
+                return directory
+            os.makedirs(directory, exist_ok=True)
+            lock = open(os.path.join(directory, LOCK_FILE), "w")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                continue
+            self.lock = lock
+            return directory
+        raise RuntimeError(f"All {MAX_SLOTS} shard cache slots under {base} are in use")
+
+    def _scan_spilled(self):
+        # Spilled blocks survive a bee restart
+        for name in sorted(os.listdir(self.spill_dir)):
+            if not name.endswith(".bin.json"):
+                continue
+            digest = name[:-len(".bin.json")]
+            try:
+                with open(os.path.join(self.spill_dir, name)) as f:
+                    meta = json.load(f)
+                nbytes = os.path.getsize(self._path(digest))
+            except (FileNotFoundError, ValueError):
+                continue # half-written spill, or its data file is gone
+            self.disk[digest] = {"dtype": getattr(torch, meta['dtype']), "shape": tuple(meta['shape']), "nbytes": nbytes}
+            self.disk_bytes += nbytes
+
+    def set_budget_from_metrics(self, metrics):
+        """Re-derives the memory budget from a SpikeMonitor metrics dict (MB)."""
+        free_mb = metrics.get('vramFree') if self.device != 'cpu' else metrics.get('ramFree')
+        if free_mb:
+            self.memory_budget = int(free_mb * 1024 * 1024 * MEMORY_FRACTION)
+            self._evict()
+
+    def __contains__(self, digest):
+        return digest in self.memory or digest in self.disk
+
+    def put(self, digest, tensor):
+        if digest in self.memory:
+            self.memory.move_to_end(digest)
+            return self.memory[digest]
+        tensor = tensor.to(self.device)
+        self.memory[digest] = tensor
+        self.memory_bytes += _nbytes(tensor)
+        self._evict(keep=digest)
+        return tensor
+
+    def put_bytes(self, digest, buffer):
+        """Caches a raw byte block (e.g. a Lead's micro-shard) as a uint8 tensor over buffer."""
+        if not len(buffer):
+            return self.put(digest, torch.empty(0, dtype=torch.uint8))
+        with warnings.catch_warnings():
+            # Received messages are immutable bytes; cached blocks are only read
+            warnings.simplefilter("ignore", UserWarning)
+            return self.put(digest, torch.frombuffer(buffer, dtype=torch.uint8))
+
+    def get(self, digest):
+        """Returns the cached tensor or None."""
+        tensor = self.memory.get(digest)
+        if tensor is not None:
+            self.memory.move_to_end(digest)
+            self.hits += 1
+            return tensor
+        if digest in self.disk:
+            tensor = self._load_spilled(digest)
+            if tensor is not None:
+                self.disk.move_to_end(digest)
+                self.disk_hits += 1
+                return tensor.to(self.device)
+        self.misses += 1
+        return None
+
+    def _evict(self, keep=None):
+        while self.memory_bytes > self.memory_budget and self.memory:
+            digest = next(iter(self.memory))
+            if digest == keep and len(self.memory) == 1:
+                break
+            tensor = self.memory.pop(digest)
+            self.memory_bytes -= _nbytes(tensor)
+            self._spill(digest, tensor)
+
+    def _path(self, digest):
+        return os.path.join(self.spill_dir, f"{digest}.bin")
+
+    def _spill(self, digest, tensor):
+        if digest in self.disk:
+            return
+        nbytes = _nbytes(tensor)
+        if nbytes > self.disk_budget:
+            return
+        while self.disk_bytes + nbytes > self.disk_budget and self.disk:
+            old, meta = self.disk.popitem(last=False)
+            self.disk_bytes -= meta['nbytes']
+            self._unlink(old)
+
+        tensor = tensor.detach().to('cpu').contiguous()
+        with open(self._path(digest), "wb") as f:
+            if nbytes:
+                f.write(memoryview(tensor.reshape(-1).view(torch.uint8).numpy()))
+        with open(self._path(digest) + ".json", "w") as f:
+            json.dump({"dtype": str(tensor.dtype).replace("torch.", ""), "shape": list(tensor.shape)}, f)
+        self.disk[digest] = {"dtype": tensor.dtype, "shape": tuple(tensor.shape), "nbytes": nbytes}
+        self.disk_bytes += nbytes
+        self.spills += 1
+
+    def _unlink(self, digest):
+        for path in (self._path(digest), self._path(digest) + ".json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _load_spilled(self, digest):
+        """The spilled tensor, or None if its file is gone or cut short (it is forgotten)."""
+        meta = self.disk[digest]
+        if not meta['nbytes']:
+            return torch.empty(meta['shape'], dtype=meta['dtype'])
+        mapped = None
+        try:
+            with open(self._path(digest), "rb") as f:
+                if os.fstat(f.fileno()).st_size == meta['nbytes']:
+                    # Copy-on-write map: pages load lazily on first touch
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except FileNotFoundError:
+            pass
+        if mapped is None:
+            del self.disk[digest]
+            self.disk_bytes -= meta['nbytes']
+            self._unlink(digest)
+            return None
+        return torch.frombuffer(mapped, dtype=meta['dtype']).reshape(meta['shape'])
+
+    def stats(self):
+        return {
+            "memoryBytes": self.memory_bytes,
+            "memoryBudget": self.memory_budget,
+            "diskBytes": self.disk_bytes,
+            "entries": len(self.memory) + len(self.disk),
+            "hits": self.hits,
+            "diskHits": self.disk_hits,
+            "misses": self.misses,
+            "spills": self.spills
+        }
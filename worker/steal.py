@@ -0,0 +1,290 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+import torch
+
+from shared.telemetry import Telemetry
+
+try:
+    from mesh import OPPOSITE, DIRECTIONS, encode_tensors, decode_tensors
+except ImportError:
+    from worker.mesh import OPPOSITE, DIRECTIONS, encode_tensors, decode_tensors
+
+# GRIDBEE_STEAL=0 keeps every round's matmul on its own bee
+ENABLED = os.environ.get("GRIDBEE_STEAL", "1") != "0"
+
+OFFER_TTL_SEC = 2.0 # an offer older than this is not acted on
+MIN_IDLE_SEC = 0.005 # spare time worth advertising
+IDLE_SHARE = 0.8 # fraction of a helper's advertised spare time we plan to use
+MIN_GAIN = 0.1 # a split must shorten our round by at least this fraction
+MIN_ROWS = 8
+OVERHEAD_SEC = 0.005 # per hand-over: framing, scheduling, a LAN round trip
+MIN_TIMEOUT_SEC = 0.05
+COOLDOWN_SEC = 5.0 # a helper that failed or timed out is left alone this long
+SPARE_ALPHA = 0.3
+# Freivalds check on returned rows: allowed error, in units of expected rounding
+VERIFY_SLACK = 10.0
+
+def plan_split(rows, local_sec, helper_sec, b_sec, ac_sec, busy_sec, spare_sec):
+    """
+    Cost model for handing the leading rows of one round to a neighbour.
+
+    rows: rows of A (and C); local_sec / helper_sec: the whole round's
+    matmul here / on the helper; b_sec: sending B; ac_sec: sending all of
+    A plus receiving all of C; busy_sec: the helper's own round, which our
+    rows queue behind (our blocks reach it as our round starts); spare_sec:
+    the helper's usable idle time after that.
+
+    A fraction f of the rows costs max(b_sec, busy_sec) + f * (ac_sec +
+    helper_sec) over there and saves f * local_sec here. f is chosen so
+    both halves finish together, capped by the helper's spare time.
+    Returns (rows to hand over, seconds saved), or (0, 0.0) unless the
+    round gets at least MIN_GAIN shorter and the time on the wire stays
+    below the time saved.
+    """
+    fixed = max(b_sec, busy_sec) + OVERHEAD_SEC
+    per_row = ac_sec + helper_sec
+    if local_sec <= 0 or per_row <= 0:
+        return 0, 0.0
+    f = min((local_sec - fixed) / (local_sec + per_row), (spare_sec - OVERHEAD_SEC) / per_row)
+    count = min(int(f * rows), rows - 1)
+    if count < MIN_ROWS:
+        return 0, 0.0
+    f = count / rows
+    saved = local_sec - max(local_sec * (1 - f), fixed + f * per_row)
+    wire = b_sec + f * ac_sec
+    if saved < MIN_GAIN * local_sec or saved <= wire:
+        return 0, 0.0
+    return count, saved
+
+class WorkStealer:
+    """
+    Neighbour work stealing inside a Cannon round.
+
+    Lockstep rounds run at the speed of the slowest bee. A bee whose matmul
+    finishes early and then waits for its next blocks advertises the spare
+    time (STEAL_OFFER) to its four neighbours. A bee that is behind hands
+    the leading rows of its round to an idle neighbour (STEAL_TASK: those
+    rows of A, all of B, the step), computes the rest itself and adds the
+    rows of A @ B that come back (STEAL_RESULT) into its local C. The owner
+    keeps C and still signs it; returned rows are spot-checked (Freivalds)
+    before they are added.
+
+    Whether to split, and where, follows plan_split: measured seconds per
+    GFLOP on both ends against the link's measured throughput. A refused,
+    failed, wrong or late slice is computed locally.
+    """
+    def __init__(self, bee_id, mesh, engine, telemetry=None, enabled=ENABLED):
+        self.bee_id = bee_id
+        self.mesh = mesh
+        self.engine = engine
+        self.enabled = enabled
+
+        self.offers = {} # our link direction -> latest offer from that neighbour
+        self.cooldown = {} # direction -> monotonic time it may be used again
+        self.pending = {} # taskId -> Future for the returned rows
+        self.serving = False
+        self.served_seconds = 0.0 # spent on neighbours' rows since our last offer
+        self.spare_seconds = 0.0 # EWMA of what we advertise
+        self.advertised = False
+
+        telemetry = telemetry or Telemetry()
+        self.handed_over = telemetry.counter("steal.handedOver")
+        self.handed_rows = telemetry.counter("steal.rows")
+        self.fallbacks = telemetry.counter("steal.fallbacks")
+        self.served = telemetry.counter("steal.served")
+        self.refused = telemetry.counter("steal.refused")
+        self.round_trip = telemetry.histogram("steal")
+
+    # Helper side
+
+    async def advertise(self, job_id, step):
+        """After each round: tell the neighbours how long we sat idle (withdrawn with 0 once it's gone)."""
+        if not self.enabled:
+            return
+        spare = max(0.0, self.engine.idle_seconds - self.served_seconds)
+        self.served_seconds = 0.0
+        self.spare_seconds = SPARE_ALPHA * spare + (1 - SPARE_ALPHA) * self.spare_seconds
+        if self.spare_seconds < MIN_IDLE_SEC:
+            if not self.advertised:
+                return
+            self.advertised = False
+            spare = 0.0
+        else:
+            self.advertised = True
+            spare = self.spare_seconds
+        await asyncio.gather(*(
+            self.mesh.pulse(direction, {
+                "type": "STEAL_OFFER",
+                "beeId": self.bee_id,
+                "jobId": job_id,
+                "step": step,
+                "direction": direction,
+                "spareSeconds": spare,
+                "busySeconds": self.engine.round_seconds,
+                "secondsPerGflop": self.engine.seconds_per_gflop
+            })
+            for direction in DIRECTIONS
+        ))
+
+    def handle_offer(self, data):
+        # An offer sent EAST came from our WEST neighbour
+        side = OPPOSITE[data['direction']]
+        if data.get('spareSeconds', 0.0) > 0 and data.get('secondsPerGflop'):
+            self.offers[side] = {**data, "at": time.monotonic()}
+        else:
+            self.offers.pop(side, None)
+
+    def handle_task(self, data):
+        """
+        Computes a neighbour's rows right after our own matmul (one slice at
+        a time; a second is refused straight away). The reply goes back on
+        our link to it.
+        """
+        if self.serving or not self.enabled:
+            self.refused.inc()
+            asyncio.create_task(self._reply(data, {"type": "STEAL_RESULT", "beeId": self.bee_id, "taskId": data['taskId'], "refused": True}))
+            return
+        self.serving = True
+        asyncio.create_task(self._serve(data))
+
+    async def _serve(self, data):
+        try:
+            A, B = decode_tensors(data)
+            device = self.engine.device
+            async with self.engine.compute_lock:
+                started = time.perf_counter()
+                product = await asyncio.to_thread(lambda: torch.matmul(A.to(device), B.to(device)).to('cpu'))
+                # Comes out of the spare time we advertise next
+                self.served_seconds += time.perf_counter() - started
+            self.served.inc()
+            reply = encode_tensors({"type": "STEAL_RESULT", "beeId": self.bee_id, "taskId": data['taskId']}, [product])
+        except Exception as e:
+            print(f"[STEAL] Could not compute rows for {data.get('beeId')}: {e}")
+            reply = {"type": "STEAL_RESULT", "beeId": self.bee_id, "taskId": data['taskId'], "refused": True}
+        finally:
+            self.serving = False
+        await self._reply(data, reply)
+
+    async def _reply(self, data, reply):
+        link = self.mesh.links.get(OPPOSITE[data['direction']])
+        if link is not None:
+            await link.put(reply if isinstance(reply, list) else json.dumps(reply))
+
+    # Owner side
+
+    def offload(self, step):
+        """
+        SystolicEngine offload_fn: picks the best neighbour for this round
+        and sends it the leading rows. Returns (rows, task) or None.
+        """
+        engine = self.engine
+        A, B, C = engine.local_A, engine.local_B, engine.local_C
+        if not self.enabled or not self.offers or A is None or engine.seconds_per_gflop is None:
+            return None
+        now = time.monotonic()
+        gflop = 2 * A.numel() * B.shape[-1] / 1e9
+        local_sec = gflop * engine.seconds_per_gflop
+        best = None
+        for direction, offer in list(self.offers.items()):
+            if now - offer['at'] > OFFER_TTL_SEC:
+                del self.offers[direction]
+                continue
+            rate = self.mesh.throughput(direction)
+            if rate is None or self.cooldown.get(direction, 0.0) > now:
+                continue
+            b_sec = B.numel() * B.element_size() / rate
+            ac_sec = (A.numel() * A.element_size() + C.numel() * C.element_size()) / rate
+            rows, saved = plan_split(
+                A.shape[-2], local_sec, gflop * offer['secondsPerGflop'], b_sec, ac_sec,
+                offer.get('busySeconds', 0.0), IDLE_SHARE * offer['spareSeconds']
+            )
+            if rows and (best is None or saved > best[2]):
+                best = (direction, rows, saved)
+        if best is None:
+            return None
+
+        direction, rows, _ = best
+        # One hand-over per offer: the helper re-advertises after its next round
+        del self.offers[direction]
+        task_id = str(uuid.uuid4())
+        A_rows = A.narrow(-2, 0, rows)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[task_id] = future
+        frame = encode_tensors({
+            "type": "STEAL_TASK",
+            "beeId": self.bee_id,
+            "taskId": task_id,
+            "jobId": engine.job_id,
+            "step": step,
+            "direction": direction
+        }, [A_rows, B])
+        # Waiting longer than the whole round would take here is never worth
+        # it: past that, the rows are computed locally and a late slice has
+        # cost at most their own compute time
+        timeout = max(MIN_TIMEOUT_SEC, local_sec)
+        return rows, asyncio.create_task(self._hand_over(direction, task_id, future, frame, A_rows, B, timeout))
+
+    async def _hand_over(self, direction, task_id, future, frame, A_rows, B, timeout):
+        started = time.perf_counter()
+        try:
+            link = self.mesh.links.get(direction)
+            # Optional work: a congested link is a reason to compute locally, not to wait
+            if link is None or not await link.put(frame, timeout):
+                return self._fall_back(direction, "link unavailable")
+            product = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return self._fall_back(direction, f"no result within {timeout * 1000:.0f} ms")
+        finally:
+            self.pending.pop(task_id, None)
+        if product is None:
+            # Refused: busy with its own round, nothing wrong with it
+            self.fallbacks.inc()
+            return None
+        if product.shape != (*A_rows.shape[:-1], B.shape[-1]) or not self._verify(A_rows, B, product):
+            print(f"[IMMUNE] Rows returned by the {direction} neighbour failed verification.")
+            return self._fall_back(direction, "wrong result")
+        self.round_trip.observe(time.perf_counter() - started)
+        self.handed_over.inc()
+        self.handed_rows.inc(A_rows.shape[-2])
+        return product.to(self.engine.device)
+
+    def _fall_back(self, direction, reason):
+        print(f"[STEAL] Hand-over to {direction} failed ({reason}); computing locally.")
+        self.fallbacks.inc()
+        self.cooldown[direction] = time.monotonic() + COOLDOWN_SEC
+        return None
+
+    @staticmethod
+    def _verify(A_rows, B, product):
+        """Freivalds: product @ r == A_rows @ (B @ r) for a random r, at O(n^2) instead of O(n^3)."""
+        r = torch.randn(B.shape[-1], 1, dtype=torch.float64)
+        expected = A_rows.cpu().double() @ (B.cpu().double() @ r)
+        actual = product.double() @ r
+        if not expected.numel():
+            return True
+        # Rounding in the helper's matmul grows with the dtype's epsilon and sqrt(k)
+        eps = torch.finfo(product.dtype).eps if product.dtype.is_floating_point else 0.0
+        tolerance = VERIFY_SLACK * eps * A_rows.shape[-1] ** 0.5 * expected.abs().max().item()
+        return (actual - expected).abs().max().item() <= tolerance
+
+    def handle_result(self, data):
+        future = self.pending.get(data.get('taskId'))
+        if future is None or future.done():
+            return # late: already computed locally
+        if data.get('refused'):
+            future.set_result(None)
+            return
+        tensors = decode_tensors(data)
+        future.set_result(tensors[0] if tensors else None)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "offers": sorted(self.offers),
+            "spareSeconds": self.spare_seconds,
+            "pending": len(self.pending)
+        }
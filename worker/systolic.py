@@ -1,49 +1,481 @@
+import asyncio
+import os
+import time
 import torch
 import base64
-import pickle
-import copy
+
+import psutil
+
+from shared.codec import Transport, ErrorFeedback, EncodedTensor
+from shared.telemetry import Telemetry
+
+try:
+    from shard_cache import ShardMissingError, tensor_digest
+except ImportError:
+    from worker.shard_cache import ShardMissingError, tensor_digest
+
+def encode_tensor(tensor):
+    """
+    Packs a tensor into a JSON-safe dict (dtype, shape, base64 raw bytes).
+    """
+    tensor = tensor.detach().to('cpu').contiguous()
+    raw = tensor.view(torch.uint8).numpy().tobytes() if tensor.numel() else b""
+    return {
+        "dtype": str(tensor.dtype).replace("torch.", ""),
+        "shape": list(tensor.shape),
+        "data": base64.b64encode(raw).decode('ascii')
+    }
+
+def decode_tensor(packed, device='cpu'):
+    """
+    Inverse of encode_tensor. Tensors from binary mesh frames pass through.
+    """
+    if isinstance(packed, torch.Tensor):
+        return packed.to(device)
+    dtype = getattr(torch, packed['dtype'])
+    raw = bytearray(base64.b64decode(packed['data']))
+    if not raw:
+        return torch.empty(packed['shape'], dtype=dtype, device=device)
+    return torch.frombuffer(raw, dtype=dtype).reshape(packed['shape']).to(device)
+
+# CPU compute: intra-op threads default to the cores we may actually use;
+# GRIDBEE_THREADS overrides. GRIDBEE_COMPUTE_PROCESSES > 1 moves matmuls
+# into a process pool (one torch pool per process, threads split between them).
+THREADS_ENV = "GRIDBEE_THREADS"
+PROCESSES_ENV = "GRIDBEE_COMPUTE_PROCESSES"
+# Smoothing for the measured matmul rate (seconds per GFLOP)
+RATE_ALPHA = 0.3
+
+def usable_cores():
+    """
+    Physical cores this process can run on: the smallest of the physical
+    core count, the CPU affinity mask and any cgroup CPU quota.
+    """
+    cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    if hasattr(os, 'sched_getaffinity'):
+        cores = min(cores, len(os.sched_getaffinity(0)))
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cores)
+
+def configure_threads(threads=None):
+    """Sets torch's intra-op thread count (GRIDBEE_THREADS, else usable_cores()) and returns it."""
+    threads = threads or int(os.environ.get(THREADS_ENV, 0)) or usable_cores()
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+    return threads
+
+def _multiply_add(C, A, B):
+    if A.dim() == 3:
+        C.baddbmm_(A, B)
+    else:
+        C.addmm_(A, B)
+
+def _pool_worker(conn, threads):
+    # Holds the shared-memory operands bound by the parent; each command is one slice of C += A @ B
+    torch.set_num_threads(threads)
+    C = A = B = None
+    while True:
+        command = conn.recv()
+        if command is None:
+            return
+        try:
+            if command[0] == "bind":
+                _, C, A, B = command
+            else:
+                _, dim, start, length, split_batch = command
+                part_B = B.narrow(0, start, length) if split_batch else B
+                _multiply_add(C.narrow(dim, start, length), A.narrow(dim, start, length), part_B)
+            conn.send(None)
+        except Exception as e:
+            conn.send(repr(e))
+
+class ComputePool:
+    """
+    C += A @ B across worker processes, for hosts where a single torch
+    thread pool (or the GIL around the callers) leaves cores idle.
+
+    The result (zeros()) and two operand buffers live in shared memory and
+    are handed to the workers once per shape (bind); after that a round
+    costs one memcpy of the new A and B into the buffers plus one small
+    command per worker.
+    Every worker adds its slice of the product into C in place: batches
+    split along the batch, a single product along A's rows.
+    """
+    def __init__(self, processes, threads_per_process=1):
+        context = torch.multiprocessing.get_context("spawn")
+        self.workers = []
+        for _ in range(processes):
+            parent, child = context.Pipe()
+            process = context.Process(target=_pool_worker, args=(child, threads_per_process), daemon=True)
+            process.start()
+            self.workers.append((process, parent))
+        self.C = self.A = self.B = None
+        self.bound = False
+
+    @property
+    def processes(self):
+        return len(self.workers)
+
+    def _broadcast(self, commands):
+        for (_, conn), command in zip(self.workers, commands):
+            conn.send(command)
+        errors = [conn.recv() for (_, conn), _ in zip(self.workers, commands)]
+        errors = [error for error in errors if error]
+        if errors:
+            raise RuntimeError(f"Compute pool worker failed: {errors[0]}")
+
+    def zeros(self, shape, dtype):
+        """The shared result buffer, zeroed; reused for as long as the shape holds."""
+        if self.C is None or self.C.shape != shape or self.C.dtype != dtype:
+            self.C = torch.zeros(shape, dtype=dtype).share_memory_()
+            self.bound = False
+        else:
+            self.C.zero_()
+        return self.C
+
+    def _bind(self, A, B):
+        if self.bound and self.A.shape == A.shape and self.B.shape == B.shape and self.A.dtype == A.dtype and self.B.dtype == B.dtype:
+            return
+        self.A = torch.empty_like(A).share_memory_()
+        self.B = torch.empty_like(B).share_memory_()
+        self._broadcast([("bind", self.C, self.A, self.B)] * self.processes)
+        self.bound = True
+
+    def multiply_add(self, C, A, B):
+        """C += A @ B; C must be the buffer from zeros()."""
+        if C is not self.C:
+            raise ValueError("ComputePool.multiply_add needs the result buffer from zeros()")
+        self._bind(A, B)
+        self.A.copy_(A)
+        self.B.copy_(B)
+        split_batch = A.dim() == 3 and A.shape[0] >= self.processes
+        dim = 0 if split_batch else A.dim() - 2
+        size = A.shape[dim]
+        chunk = -(-size // self.processes)
+        self._broadcast([
+            ("run", dim, start, min(chunk, size - start), split_batch)
+            for start in range(0, size, chunk)
+        ])
+
+    def close(self):
+        for process, conn in self.workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+        self.workers = []
+
+def pack_shard(tensor, peer_holds=()):
+    """
+    Packs an assignment operand with its content hash. If the receiving bee
+    already holds the block (hash in peer_holds) only the hash is sent.
+    """
+    digest = tensor_digest(tensor)
+    if digest in peer_holds:
+        return {"hash": digest}
+    packed = encode_tensor(tensor)
+    packed['hash'] = digest
+    return packed
 
 class SystolicEngine:
-    def __init__(self):
+    """
+    Cannon's Algorithm on a q x q torus of bees.
+
+    Each bee holds one block of A and one block of B. Blocks arrive already
+    skewed (see skew_indices), then for q rounds every bee computes
+    C += A @ B, pulses A West / B North and takes the next blocks from
+    East / South. The pulse for round k+1 is in flight while round k's
+    matmul runs (double buffering).
+
+    An assignment may carry several same-shaped shards (independent
+    products over the same torus). They are stacked into one (S, m, k) /
+    (S, k, n) pair, so each round is a single baddbmm and a single pulse
+    per direction instead of S of each.
+    """
+    def __init__(self, cache=None, telemetry=None, processes=None):
         self.device = 'cpu'
         if torch.backends.mps.is_available():
             self.device = 'mps'
         elif torch.cuda.is_available():
             self.device = 'cuda'
-            
-        print(f"[COMPUTE] Systolic Engine initialized on {self.device}")
-        
+
+        self.threads = torch.get_num_threads()
+        self.pool = None
+        if self.device == 'cpu':
+            self.threads = configure_threads()
+            if processes is None:
+                processes = int(os.environ.get(PROCESSES_ENV, 0))
+            if processes > 1:
+                self.pool = ComputePool(processes, max(1, self.threads // processes))
+
+        pool = f", {self.pool.processes} compute processes" if self.pool else ""
+        print(f"[COMPUTE] Systolic Engine initialized on {self.device} ({self.threads} threads{pool})")
+
         self.local_A = None
         self.local_B = None
         self.local_C = None
-        
+
+        # Content-addressed ShardCache; set by the bee (device known only here)
+        self.cache = cache
+
+        # Per-job pulse encoding (shared/codec.py); raw unless the job asks otherwise
+        self.transport = Transport()
+        self.feedback = ErrorFeedback()
+        # Blocks received encoded are forwarded as received, never re-encoded
+        self.wire_A = None
+        self.wire_B = None
+
+        self.compute_time = (telemetry or Telemetry()).histogram("compute")
+        # Measured here, for work stealing (steal.py): how fast our matmuls
+        # run, how long a round takes and how long the last one sat waiting
+        # for its next blocks. Rows taken from a neighbour queue behind our
+        # own matmuls on compute_lock.
+        self.seconds_per_gflop = None
+        self.round_seconds = 0.0
+        self.idle_seconds = 0.0
+        self.compute_done_at = 0.0
+        self.compute_lock = asyncio.Lock()
+
+        self.job_id = None
+        self.coords = (0, 0)
+        self.grid_size = 1
+        self.current_step = 0
+
+    def close(self):
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+
+    def free_vram_mb(self):
+        """Free accelerator memory in MB, or None where torch cannot tell."""
+        if self.device == 'cuda':
+            free, _ = torch.cuda.mem_get_info()
+            return free / (1024 * 1024)
+        if self.device == 'mps' and hasattr(torch.mps, 'recommended_max_memory'):
+            free = torch.mps.recommended_max_memory() - torch.mps.driver_allocated_memory()
+            return max(0, free) / (1024 * 1024)
+        return None
+
+    @staticmethod
+    def skew_indices(i, j, q):
+        """
+        Cannon's initial alignment: row i of A is shifted left by i and
+        column j of B is shifted up by j, so bee (i, j) starts with
+        A[i][(i+j) % q] and B[(i+j) % q][j].
+        Returns ((a_row, a_col), (b_row, b_col)).
+        """
+        k = (i + j) % q
+        return (i, k), (k, j)
+
+    @staticmethod
+    def partition(A, B, q):
+        """
+        Splits full A / B matrices into q x q blocks and returns
+        {(i, j): (A_block, B_block)} already skewed for Cannon.
+        """
+        a_rows = torch.chunk(A, q, dim=0)
+        b_rows = torch.chunk(B, q, dim=0)
+        A_blocks = [torch.chunk(r, q, dim=1) for r in a_rows]
+        B_blocks = [torch.chunk(r, q, dim=1) for r in b_rows]
+
+        layout = {}
+        for i in range(q):
+            for j in range(q):
+                (ar, ac), (br, bc) = SystolicEngine.skew_indices(i, j, q)
+                layout[(i, j)] = (A_blocks[ar][ac], B_blocks[br][bc])
+        return layout
+
     def load_shard(self, shard_data):
-        # Deserializing mocked byte data
-        # In real scenario: base64 decode -> pickle load -> tensor
-        # Mocking tensors for POC
-        self.local_A = torch.randn(10, 10, device=self.device) # Mock 10x10 shard
-        self.local_B = torch.randn(10, 10, device=self.device)
-        self.local_C = torch.zeros(10, 10, device=self.device)
-        
-    def step(self):
-        # C += A @ B
-        if self.local_A is not None and self.local_B is not None:
-            self.local_C += torch.matmul(self.local_A, self.local_B)
-            # print("[COMPUTE] Systolic Pulse: Matrix Mutiply Step Complete")
-            
+        """
+        shard_data: {"A": packed, "B": packed, "coords": {"i", "j"},
+                     "gridSize": q, "jobId": str, "transport": spec or None}
+        or, for a batch, "shards": [{"A": packed, "B": packed}, ...] in
+        place of A and B; every shard must have the same shapes.
+        A and B must already be aligned by skew_indices.
+        """
+        coords = shard_data.get('coords', {"i": 0, "j": 0})
+        self.coords = (coords['i'], coords['j'])
+        self.grid_size = shard_data.get('gridSize', 1)
+        if shard_data.get('jobId') != self.job_id:
+            self.feedback.reset()
+        self.job_id = shard_data.get('jobId')
+        self.transport = Transport.from_spec(shard_data.get('transport'))
+        self.current_step = 0
+        self.wire_A = self.wire_B = None
+
+        if 'shards' in shard_data:
+            blocks = [(self._resolve(shard['A']), self._resolve(shard['B'])) for shard in shard_data['shards']]
+            if len({(a.shape, b.shape, a.dtype, b.dtype) for a, b in blocks}) > 1:
+                raise ValueError("Shards batched into one assignment must share shapes and dtypes")
+            self.local_A = torch.stack([a for a, _ in blocks])
+            self.local_B = torch.stack([b for _, b in blocks])
+        else:
+            self.local_A = self._resolve(shard_data['A'])
+            self.local_B = self._resolve(shard_data['B'])
+        shape = (*self.local_A.shape[:-1], self.local_B.shape[-1])
+        dtype = torch.promote_types(self.local_A.dtype, self.local_B.dtype)
+        if self.pool:
+            # Shared with the pool's processes; valid until the next load_shard
+            self.local_C = self.pool.zeros(shape, dtype)
+        else:
+            self.local_C = torch.zeros(shape, dtype=dtype, device=self.device)
+
+    def _resolve(self, packed):
+        """
+        Operand from an assignment: full data (cached under its hash) or a
+        hash-only reference to a block already in the ShardCache.
+        """
+        digest = packed.get('hash') if isinstance(packed, dict) else None
+        if digest and 'data' not in packed:
+            tensor = self.cache.get(digest) if self.cache is not None else None
+            if tensor is None:
+                raise ShardMissingError(digest)
+            return tensor.to(self.device)
+
+        tensor = decode_tensor(packed, self.device)
+        if digest and self.cache is not None:
+            tensor = self.cache.put(digest, tensor)
+        return tensor
+
+    def step(self, start=0, rows=None):
+        # C += A @ B (in place, no temporary for the product); with rows,
+        # only rows [start, start + rows) of C (the others are being
+        # computed by a neighbour)
+        if self.local_A is None or self.local_B is None:
+            return
+        A, C = self.local_A, self.local_C
+        if rows is not None:
+            A, C = A.narrow(-2, start, rows), C.narrow(-2, start, rows)
+        started = time.perf_counter()
+        with self.compute_time.time():
+            self._multiply_add(C, A, self.local_B, whole=rows is None)
+            if self.device == 'cuda':
+                torch.cuda.synchronize()
+        gflop = 2 * A.numel() * self.local_B.shape[-1] / 1e9
+        if gflop:
+            rate = (time.perf_counter() - started) / gflop
+            self.seconds_per_gflop = rate if self.seconds_per_gflop is None else RATE_ALPHA * rate + (1 - RATE_ALPHA) * self.seconds_per_gflop
+
+    def _multiply_add(self, C, A, B, whole=True):
+        # The pool works on its own shared C; row slices run here
+        if self.pool and whole:
+            self.pool.multiply_add(C, A, B)
+        elif A.dim() == 3:
+            C.baddbmm_(A, B)
+        else:
+            C.addmm_(A, B)
+
     def get_pulse_payloads(self):
         # Prepare data for West (A) and North (B)
-        # Using base64 just to be safe with JSON
-        
-        # Simplified: Just sending checksums or small data for POC logs
-        payload_A = "TENSOR_A_CHUNK" 
-        payload_B = "TENSOR_B_CHUNK"
-        
-        return payload_A, payload_B
-        
+        # Raw tensors: BitchatMesh sends them as binary frames
+        if not self.transport.enabled:
+            return self.local_A, self.local_B
+        if self.current_step == 0:
+            # Our home blocks: encoded once, with the residual left over from
+            # this job's previous step (error feedback)
+            return (
+                self.feedback.encode(self.transport, (self.job_id, "A"), self.local_A),
+                self.feedback.encode(self.transport, (self.job_id, "B"), self.local_B)
+            )
+        return (
+            self.wire_A if self.wire_A is not None else self.transport.encode(self.local_A),
+            self.wire_B if self.wire_B is not None else self.transport.encode(self.local_B)
+        )
+
+    def result_blocks(self):
+        """Byte views of the local result blocks (for signing)."""
+        if self.local_C is None:
+            return []
+        C = self.local_C.detach().to('cpu').contiguous()
+        return [memoryview(C.reshape(-1).view(torch.uint8).numpy())]
+
     def update_buffers(self, from_east, from_south):
         # Cannon's Algorithm:
         # A comes from East (moving West)
         # B comes from South (moving North)
-        # Mock update
-        pass
+        # Swap the back buffers in once the current round's matmul is done.
+        self.wire_A = from_east if isinstance(from_east, EncodedTensor) else None
+        self.wire_B = from_south if isinstance(from_south, EncodedTensor) else None
+        self.local_A = self._receive(from_east)
+        self.local_B = self._receive(from_south)
+        self.current_step += 1
+
+    def _receive(self, packed):
+        if isinstance(packed, EncodedTensor):
+            return self.transport.decode(packed, self.device)
+        return decode_tensor(packed, self.device)
+
+    async def run_cannon(self, pulse_fn, receive_fn, offload_fn=None):
+        """
+        Drives the q shift-multiply rounds with compute/communication overlap.
+
+        pulse_fn(step, payload_A, payload_B): async, sends A West and B North.
+        receive_fn(step): async, returns (from_east, from_south) for step+1.
+        offload_fn(step): optional, see _compute_round.
+
+        The matmul for round k runs in a worker thread while the blocks for
+        round k+1 are sent and received on the event loop.
+        """
+        for step in range(self.grid_size):
+            last = step == self.grid_size - 1
+            if last:
+                await self._compute_round(step, offload_fn)
+                break
+
+            compute = asyncio.create_task(self._compute_round(step, offload_fn))
+            try:
+                if self.transport.enabled:
+                    # Encoding runs next to the matmul, off the event loop
+                    payload_A, payload_B = await asyncio.to_thread(self.get_pulse_payloads)
+                else:
+                    payload_A, payload_B = self.get_pulse_payloads()
+                await pulse_fn(step, payload_A, payload_B)
+                from_east, from_south = await receive_fn(step)
+                received_at = time.perf_counter()
+            finally:
+                await compute
+            # How long our matmul was done before the next blocks arrived
+            self.idle_seconds = max(0.0, received_at - self.compute_done_at)
+            if self.transport.enabled:
+                await asyncio.to_thread(self.update_buffers, from_east, from_south)
+            else:
+                self.update_buffers(from_east, from_south)
+
+        return self.local_C
+
+    async def _compute_round(self, step, offload_fn):
+        """
+        One round's C += A @ B in a worker thread. offload_fn(step) may
+        hand the leading rows to a neighbour: it returns None, or (rows,
+        task) where task resolves to those rows of A @ B, or to None if the
+        neighbour could not deliver them, in which case they are computed
+        here after all.
+        """
+        started = time.perf_counter()
+        try:
+            plan = offload_fn(step) if offload_fn else None
+            if plan is None:
+                async with self.compute_lock:
+                    await asyncio.to_thread(self.step)
+                return
+            rows, remote = plan
+            async with self.compute_lock:
+                await asyncio.to_thread(self.step, rows, self.local_A.shape[-2] - rows)
+            product = await remote
+            if product is None:
+                async with self.compute_lock:
+                    await asyncio.to_thread(self.step, 0, rows)
+            else:
+                self.local_C.narrow(-2, 0, rows).add_(product)
+        finally:
+            self.compute_done_at = time.perf_counter()
+            self.round_seconds = self.compute_done_at - started